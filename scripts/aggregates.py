@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+#      MERGEABLE PARTIAL AGGREGATES
+# ==========================================
+
+# Per measure kind: the state columns kept for it and how two states combine.
+# Every combine is associative, so chunks/partitions can be folded in any grouping
+# (the 'last' and 'distinct' kinds keep their own state, see PartialAggregate).
+STATE_COLUMNS = {
+    'count': [('count', 'sum')],
+    'sum': [('sum', 'sum')],
+    'sumsq': [('sumsq', 'sum')],
+    'mean': [('sum', 'sum'), ('count', 'sum')],
+    'std': [('sum', 'sum'), ('sumsq', 'sum'), ('count', 'sum')],
+    'min': [('min', 'min')],
+    'max': [('max', 'max')],
+}
+KINDS = list(STATE_COLUMNS) + ['last', 'distinct']
+
+# Kinds whose state can be undone by subtracting the state of the removed rows
+INVERTIBLE_KINDS = {'count', 'sum', 'sumsq', 'mean', 'std'}
+
+class PartialAggregate:
+    """
+    Per-key aggregate that can be computed chunk by chunk (or per partition) and merged.
+
+    measures: {output_column: (source_column, kind)} with kind one of
+      count / sum / sumsq / mean / std / min / max  -> from count, sum, sum-of-squares, min, max states
+      last     -> last non-missing value in order_by order (missing order values sort last,
+                  ties keep input order), like groupby 'last' after a stable sort
+      distinct -> number of distinct non-missing values (exact; keeps the distinct pairs)
+    Rows with a missing key are ignored, like groupby.
+    """
+
+    def __init__(self, key, measures, order_by=None):
+        for column, kind in measures.values():
+            if kind not in KINDS:
+                raise ValueError(f"Unknown aggregate kind '{kind}' for column '{column}'")
+            if kind == 'last' and order_by is None:
+                raise ValueError("'last' measures need an order_by column")
+        self.key = key
+        self.measures = measures
+        self.order_by = order_by
+        self.states = {}
+
+    # --- Building states ---
+
+    def _chunk_state(self, name, chunk):
+        column, kind = self.measures[name]
+        keys = chunk[self.key]
+        if kind == 'last':
+            rows = pd.DataFrame({'key': keys, 'value': chunk[column], 'order': chunk[self.order_by]})
+            rows = rows[rows['key'].notna() & rows['value'].notna()]
+            rows = rows.sort_values('order', kind='stable', na_position='last')
+            return rows.drop_duplicates('key', keep='last').set_index('key')[['value', 'order']]
+        if kind == 'distinct':
+            pairs = pd.DataFrame({'key': keys, 'value': chunk[column]}).dropna()
+            return pairs.drop_duplicates()
+
+        groups = chunk.groupby(self.key)[column]
+        parts = {}
+        for part, _ in STATE_COLUMNS[kind]:
+            if part == 'count':
+                parts[part] = groups.count()
+            elif part == 'sum':
+                parts[part] = groups.sum()
+            elif part == 'sumsq':
+                parts[part] = (chunk[column].astype('Float64') ** 2).groupby(keys).sum()
+            elif part == 'min':
+                parts[part] = groups.min()
+            elif part == 'max':
+                parts[part] = groups.max()
+        return pd.DataFrame(parts)
+
+    def _combine(self, name, first, second):
+        """ State of name over first's rows followed by second's rows """
+        kind = self.measures[name][1]
+        both = pd.concat([first, second])
+        if kind == 'last':
+            both = both.rename_axis('key').reset_index()
+            both = both.sort_values('order', kind='stable', na_position='last')
+            return both.drop_duplicates('key', keep='last').set_index('key')
+        if kind == 'distinct':
+            return both.drop_duplicates()
+        return both.groupby(level=0).agg(dict(STATE_COLUMNS[kind]))
+
+    def update(self, chunk):
+        """ Folds one chunk of rows into the state (chunks must arrive in row order for 'last') """
+        for name in self.measures:
+            state = self._chunk_state(name, chunk)
+            previous = self.states.get(name)
+            self.states[name] = state if previous is None else self._combine(name, previous, state)
+        return self
+
+    def merge(self, other):
+        """ Folds in another partial aggregate of the same measures (its rows count as coming after ours) """
+        for name, state in other.states.items():
+            previous = self.states.get(name)
+            self.states[name] = state if previous is None else self._combine(name, previous, state)
+        return self
+
+    @property
+    def invertible(self):
+        """ True when rows can be taken out again with remove() """
+        return all(kind in INVERTIBLE_KINDS for _, kind in self.measures.values())
+
+    def remove(self, rows):
+        """ Takes previously added rows out of the state (invertible measures only) """
+        if not self.invertible:
+            raise ValueError("min/max/last/distinct measures cannot be removed; use refresh() for the affected keys")
+        for name in self.measures:
+            state = self._chunk_state(name, rows)
+            previous = self.states.get(name)
+            if previous is None or state.empty:
+                continue
+            previous = previous.sub(state.reindex(previous.index, fill_value=0), fill_value=0)
+            # Keys left without rows disappear, as if they had never been added
+            if 'count' in previous.columns:
+                previous = previous[previous['count'] > 0]
+            self.states[name] = previous
+        return self
+
+    def refresh(self, keys, rows):
+        """ Rebuilds the state of the given keys from all of their current rows """
+        for name, state in self.states.items():
+            index = state['key'] if self.measures[name][1] == 'distinct' else state.index
+            self.states[name] = state[~pd.Index(index).isin(keys)]
+        return self.update(rows[rows[self.key].isin(keys)])
+
+    # --- Final values ---
+
+    def _finalize(self, name, state):
+        kind = self.measures[name][1]
+        if kind == 'last':
+            return state['value']
+        if kind == 'distinct':
+            return state.groupby('key').size()
+        if kind == 'mean':
+            return (state['sum'] / state['count']).where(state['count'] > 0)
+        if kind == 'std':
+            n = state['count']
+            variance = (state['sumsq'] - state['sum'] ** 2 / n) / (n - 1)
+            return np.sqrt(variance.clip(lower=0)).where(n > 1)
+        return state[kind]
+
+    def result(self, keys=None):
+        """ One row per key (the index), one column per measure (only the given keys, if any) """
+        if not self.states:
+            return pd.DataFrame(columns=list(self.measures))
+        columns = {}
+        for name in self.measures:
+            state = self.states[name]
+            if keys is not None:
+                index = state['key'] if self.measures[name][1] == 'distinct' else state.index
+                state = state[pd.Index(index).isin(keys)]
+            columns[name] = self._finalize(name, state)
+        result = pd.concat(columns, axis=1)
+        result.index.name = self.key
+        return result
@@ -0,0 +1,99 @@
+"""
+Load benchmark: row inserts vs. LOAD DATA LOCAL INFILE on a synthetic review-like table.
+
+    python scripts/benchmark_load.py --rows 200000 --host localhost --user root --password root
+    python scripts/benchmark_load.py --methods insert --rows-per-statement 500 --rows-per-commit 20000
+
+Needs a MySQL / MariaDB server with local_infile=ON for the bulk method (otherwise the bulk
+timing is the insert fallback). Loads into a scratch table (bench_load) that is dropped afterwards.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+import load
+
+BENCH_TABLE = 'bench_load'
+BENCH_DDL = f"""
+    CREATE TABLE {BENCH_TABLE} (
+        review_id INT,
+        employee_id INT,
+        review_date DATE,
+        rating DECIMAL(3,1),
+        performance_category VARCHAR(30),
+        is_self_review TINYINT(1)
+    )"""
+
+def make_frame(rows, seed=0):
+    """ Synthetic rows with the column kinds the pipeline loads (ints, dates, floats, strings, booleans, missing values) """
+    rng = np.random.default_rng(seed)
+    rating = np.round(rng.uniform(1, 5, rows), 1)
+    rating[rng.random(rows) < 0.02] = np.nan
+    return pd.DataFrame({
+        'review_id': np.arange(1, rows + 1),
+        'employee_id': pd.array(rng.integers(1, 5000, rows)),
+        'review_date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1500, rows), unit='D'),
+        'rating': rating,
+        'performance_category': pd.Categorical(rng.choice(['Low Performer', 'Average', 'High Performer'], rows)),
+        'is_self_review': pd.array(rng.random(rows) < 0.1, dtype='boolean'),
+    })
+
+def run_benchmark(connection, df, csv_path, methods, repeat, insert_settings=None):
+    """ Best time per load method; returns {method: (method actually used, seconds, rows per second)} """
+    results = {}
+    for method in methods:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            used, _ = load.load_table(connection, df, BENCH_TABLE, csv_path, method, insert_settings)
+            seconds = time.perf_counter() - start
+            if best is None or seconds < best[1]:
+                best = (used, seconds)
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {BENCH_TABLE}")
+        loaded = cursor.fetchone()[0]
+        if loaded != len(df):
+            print(f"X {method}: {loaded} rows in the table, expected {len(df)}")
+        results[method] = (best[0], best[1], len(df) / best[1])
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare row inserts with LOAD DATA LOCAL INFILE")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--methods', nargs='+', default=['insert', 'bulk'])
+    parser.add_argument('--rows-per-statement', type=int, default=load.INSERT_SETTINGS['rows_per_statement'])
+    parser.add_argument('--rows-per-commit', type=int, default=load.INSERT_SETTINGS['rows_per_commit'])
+    parser.add_argument('--max-packet-bytes', type=int, default=load.INSERT_SETTINGS['max_packet_bytes'])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='root')
+    parser.add_argument('--database', default='employee_analytics')
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = os.path.join(work_dir, f"{BENCH_TABLE}.csv")
+        df.to_csv(csv_path, index=False, header=True, date_format='%Y-%m-%d')
+
+        conn = load.create_db_connection(args.host, args.user, args.password, args.database,
+                                         local_infile_dir=work_dir)
+        if conn is None:
+            raise SystemExit(1)
+        cursor = conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        cursor.execute(BENCH_DDL)
+        try:
+            insert_settings = {'rows_per_statement': args.rows_per_statement, 'rows_per_commit': args.rows_per_commit,
+                               'max_packet_bytes': args.max_packet_bytes}
+            results = run_benchmark(conn, df, csv_path, args.methods, args.repeat, insert_settings)
+        finally:
+            cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            conn.close()
+
+    print(f"\n{'Method':<10} | {'Used':<8} | {'Seconds':<8} | {'Rows/s':<12}")
+    for method, (used, seconds, rows_per_second) in results.items():
+        print(f"{method:<10} | {used:<8} | {seconds:<8.2f} | {rows_per_second:<12,.0f}")
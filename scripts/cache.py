@@ -0,0 +1,108 @@
+import tracemalloc
+from contextlib import contextmanager
+
+# ==========================================
+#      RUN-SCOPED FRAME CACHE
+# ==========================================
+
+def frame_memory_bytes(df):
+    """ Deep memory footprint of a DataFrame in bytes """
+    if df is None:
+        return 0
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def format_bytes(num_bytes):
+    """ Human readable size (e.g. 12.3 MB) """
+    size = float(num_bytes)
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+class FrameCache:
+    """
+    Holds the DataFrames of one pipeline run so every phase reads them from memory
+    instead of re-parsing the source files.
+
+    Each frame can be registered with the names of the phases that still need it.
+    When the last consumer releases it (and evict_after_use is on) the frame is dropped.
+    """
+
+    def __init__(self, evict_after_use=True):
+        self.evict_after_use = evict_after_use
+        self._frames = {}
+        self._sizes = {}
+        self._consumers = {}
+        self.peak_bytes = 0
+
+    def put(self, name, df, consumers=None):
+        """ Stores a frame and the list of phases that will read it """
+        self._frames[name] = df
+        self._sizes[name] = frame_memory_bytes(df)
+        self._consumers[name] = set(consumers or [])
+        self.peak_bytes = max(self.peak_bytes, self.total_bytes())
+
+    def get(self, name):
+        if name not in self._frames:
+            raise KeyError(f"Table '{name}' is not in the frame cache (evicted or never extracted)")
+        return self._frames[name]
+
+    def __contains__(self, name):
+        return name in self._frames
+
+    def tables(self):
+        return list(self._frames.keys())
+
+    def release(self, name, consumer):
+        """ Marks a consumer as done with a frame; evicts it once nobody needs it """
+        pending = self._consumers.get(name)
+        if pending is None:
+            return
+        pending.discard(consumer)
+        if not pending and self.evict_after_use:
+            self.evict(name)
+
+    def release_all(self, consumer):
+        for name in list(self._frames.keys()):
+            self.release(name, consumer)
+
+    def evict(self, name):
+        self._frames.pop(name, None)
+        self._sizes.pop(name, None)
+        self._consumers.pop(name, None)
+
+    def total_bytes(self):
+        return sum(self._sizes.values())
+
+    def memory_report(self):
+        """ Bytes held per table, plus the total and the peak seen during the run """
+        report = dict(self._sizes)
+        report['_total'] = self.total_bytes()
+        report['_peak'] = self.peak_bytes
+        return report
+
+# ==========================================
+#      PER-STEP PEAK MEMORY
+# ==========================================
+
+@contextmanager
+def traced_peak(report, name):
+    """
+    Records in report[name] the peak memory allocated while the block runs (tracemalloc,
+    numpy buffers included), above what was allocated when it started.
+    Does nothing when report is None. Steps must not run concurrently with other work.
+    """
+    if report is None:
+        yield
+        return
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        yield
+    finally:
+        report[name] = max(0, tracemalloc.get_traced_memory()[1] - base)
+        if started:
+            tracemalloc.stop()
@@ -1,44 +1,231 @@
 import pandas as pd
 import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def extract_data(data_folder):
+import schema
+
+# Optional: pyarrow enables the columnar (Parquet) raw-zone cache
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# List of expected files
+EXPECTED_FILES = [
+    'departments.csv', 
+    'employees.csv', 
+    'performance_reviews.csv', 
+    'projects.csv', 
+    'project_assignments.csv'
+]
+
+# Bump when the cached representation of a raw table changes, so old cache files are ignored
+CACHE_FORMAT_VERSION = 2
+
+# Extraction threads share one fingerprint index file
+_FINGERPRINT_LOCK = threading.Lock()
+
+def extract_data(data_folder, max_workers=None, cache_dir=None, columns=None, tables=None):
     """
     Extract data from all CSV files in the specified folder.
+    The files are independent, so they are parsed concurrently by a thread pool
+    (max_workers=None -> one thread per file, max_workers=1 -> sequential).
+    With cache_dir set, unchanged files are loaded from their Parquet copy (see read_table).
+    columns optionally maps table name -> list of columns to read,
+    tables optionally restricts extraction to some tables.
     """
     extracted_data = {}
     
-    # List of expected files
-    expected_files = [
-        'departments.csv', 
-        'employees.csv', 
-        'performance_reviews.csv', 
-        'projects.csv', 
-        'project_assignments.csv'
-    ]
-    
     print("--- Starting Extraction Process ---")
     
-    for file_name in expected_files:
-        file_path = os.path.join(data_folder, file_name)
+    expected_files = [f for f in EXPECTED_FILES if tables is None or f.replace('.csv', '') in tables]
+    file_paths = {f: os.path.join(data_folder, f) for f in expected_files}
+    found = [f for f in expected_files if os.path.exists(file_paths[f])]
+    workers = max_workers or max(len(found), 1)
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Read CSVs into DataFrames
+        columns = columns or {}
+        futures = {
+            f: pool.submit(read_table, file_paths[f], cache_dir, columns.get(f.replace('.csv', '')))
+            for f in found
+        }
         
-        # Check if file exists
+        # Report in the usual file order, whichever read finished first
+        for file_name in expected_files:
+            file_path = file_paths[file_name]
+            
+            # Check if file exists
+            if file_name in futures:
+                try:
+                    df = futures[file_name].result()
+                    
+                    # Store in dictionary (remove .csv extension for key)
+                    table_name = file_name.replace('.csv', '')
+                    extracted_data[table_name] = df
+                    
+                    print(f"✓ Successfully extracted {table_name}: {len(df)} rows")
+                    
+                except Exception as e:
+                    print(f"X Error reading {file_name}: {e}")
+            else:
+                print(f"X File not found: {file_path}")
+            
+    return extracted_data
+
+def read_raw_csv(file_path, usecols=None, **kwargs):
+    """
+    pd.read_csv with the table's registered schema (see schema.py): explicit dtypes instead
+    of inference, and date columns parsed with their fixed format at read time.
+    """
+    table_name = os.path.basename(file_path).replace('.csv', '')
+    header = pd.read_csv(file_path, nrows=0).columns
+    wanted = set(usecols) if usecols else None
+    return pd.read_csv(
+        file_path,
+        usecols=(lambda c: c in wanted) if wanted else None,
+        **schema.read_csv_kwargs(table_name, header, wanted),
+        **kwargs
+    )
+
+# ==========================================
+#      COLUMNAR RAW-ZONE CACHE
+# ==========================================
+
+def _load_fingerprint_index(cache_dir):
+    index_path = os.path.join(cache_dir, 'fingerprints.json')
+    if os.path.exists(index_path):
+        try:
+            with open(index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def file_fingerprint(file_path, cache_dir=None, block_size=1 << 20):
+    """
+    SHA-256 of the file contents, streamed in blocks.
+    If cache_dir is given, the digest is remembered per (size, mtime) so an
+    untouched file is not re-hashed on every run.
+    """
+    stat = os.stat(file_path)
+    key = os.path.abspath(file_path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+
+    index = _load_fingerprint_index(cache_dir) if cache_dir else {}
+    entry = index.get(key)
+    if entry and entry['stamp'] == stamp:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    sha = digest.hexdigest()
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        with _FINGERPRINT_LOCK:
+            # Re-read before writing: other extraction threads may have added their entries
+            index = _load_fingerprint_index(cache_dir)
+            index[key] = {'stamp': stamp, 'sha256': sha}
+            tmp_path = os.path.join(cache_dir, 'fingerprints.json.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, os.path.join(cache_dir, 'fingerprints.json'))
+    return sha
+
+def read_table(file_path, cache_dir=None, columns=None):
+    """
+    Reads one raw CSV, going through a typed Parquet copy when possible.
+
+    The Parquet file is named after the table and the SHA-256 of the CSV, so it is
+    reused only while the source is byte-for-byte unchanged. Only the requested
+    columns are read back from it. Without cache_dir (or without pyarrow) this is a plain read_csv.
+    """
+    wanted = set(columns) if columns else None
+    if cache_dir is None or pq is None:
+        return read_raw_csv(file_path, usecols=wanted)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    table_name = os.path.basename(file_path).replace('.csv', '')
+    sha = file_fingerprint(file_path, cache_dir)
+    cache_path = os.path.join(cache_dir, f"{table_name}_{sha[:16]}_v{CACHE_FORMAT_VERSION}.{schema.SCHEMA_VERSION}.parquet")
+
+    if os.path.exists(cache_path):
+        available = pq.read_schema(cache_path).names
+        projection = [c for c in available if wanted is None or c in wanted]
+        return pd.read_parquet(cache_path, columns=projection)
+
+    # Cache miss: parse the CSV once, keep a typed columnar copy for the next runs
+    df = read_raw_csv(file_path)
+    tmp_path = cache_path + '.tmp'
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_path)
+
+    # Drop copies made from older versions of this file
+    for old_file in os.listdir(cache_dir):
+        if old_file.startswith(f"{table_name}_") and old_file.endswith('.parquet') and \
+                os.path.join(cache_dir, old_file) != cache_path:
+            os.remove(os.path.join(cache_dir, old_file))
+
+    if wanted:
+        df = df[[c for c in df.columns if c in wanted]]
+    return df
+
+# ==========================================
+#      STREAMING (CHUNKED) EXTRACTION
+# ==========================================
+
+def estimate_chunk_rows(file_path, chunk_bytes, sample_rows=1000):
+    """
+    Converts an in-memory byte budget into a row count by parsing a small
+    sample of the file and measuring its deep memory usage per row.
+    """
+    sample = read_raw_csv(file_path, nrows=sample_rows)
+    if sample.empty:
+        return sample_rows
+    bytes_per_row = sample.memory_usage(index=True, deep=True).sum() / len(sample)
+    return max(1, int(chunk_bytes // bytes_per_row))
+
+def stream_table(file_path, chunk_rows=None, chunk_bytes=None, columns=None):
+    """
+    Yields a CSV file as a sequence of DataFrames of bounded size.
+    Either chunk_rows (fixed row count) or chunk_bytes (memory budget per chunk) must be given.
+    columns: only these columns are parsed (None = all).
+    """
+    if chunk_rows is None and chunk_bytes is None:
+        raise ValueError("stream_table needs chunk_rows or chunk_bytes")
+    if chunk_rows is None:
+        chunk_rows = estimate_chunk_rows(file_path, chunk_bytes)
+
+    with read_raw_csv(file_path, usecols=columns, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk
+
+def extract_data_chunked(data_folder, chunk_rows=None, chunk_bytes=None):
+    """
+    Streaming version of extract_data: returns {table_name: chunk generator}.
+    Nothing is read until a generator is consumed, so only one chunk per table is resident.
+    """
+    streams = {}
+
+    print("--- Starting Streaming Extraction ---")
+
+    for file_name in EXPECTED_FILES:
+        file_path = os.path.join(data_folder, file_name)
+        table_name = file_name.replace('.csv', '')
+
         if os.path.exists(file_path):
-            try:
-                # Read CSV into DataFrame
-                df = pd.read_csv(file_path)
-                
-                # Store in dictionary (remove .csv extension for key)
-                table_name = file_name.replace('.csv', '')
-                extracted_data[table_name] = df
-                
-                print(f"✓ Successfully extracted {table_name}: {len(df)} rows")
-                
-            except Exception as e:
-                print(f"X Error reading {file_name}: {e}")
+            streams[table_name] = stream_table(file_path, chunk_rows=chunk_rows, chunk_bytes=chunk_bytes)
+            print(f"✓ Streaming {table_name} from {file_name}")
         else:
             print(f"X File not found: {file_path}")
-            
-    return extracted_data
+
+    return streams
 
 # --- Small Test Block ---
 # This allows us to run this script directly to test it
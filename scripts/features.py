@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+#      DERIVED FEATURE RULES
+# ==========================================
+
+# Bucketing rules: cases are checked in order and the first one that matches gives the label.
+# Rows matching no case (including missing values) get the default.
+# A new band (e.g. tenure or allocation bands) is a new entry here plus one apply_bucket call.
+BUCKET_RULES = {
+    'salary_bucket': {
+        'source': 'salary',
+        'cases': [('<', 50000, 'Low'), ('<=', 80000, 'Medium')],
+        'default': 'High',
+    },
+    'performance_category': {
+        'source': 'rating',
+        'cases': [('>=', 4.5, 'Excellent'), ('>=', 3.5, 'Good')],
+        'default': 'Needs Improvement',
+    },
+}
+
+# Ratio rules: numerator / denominator where the denominator is positive, otherwise the default
+RATIO_RULES = {
+    'daily_budget_alloc': {
+        'numerator': 'budget',
+        'denominator': 'project_duration_days',
+        'default': 0.0,
+        'decimals': 2,
+    },
+}
+
+_OPERATORS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+}
+
+# ==========================================
+#      VECTORIZED EVALUATION
+# ==========================================
+
+def _as_float_array(series):
+    """ Numeric column as a float array with NaN for missing values (nullable dtypes included) """
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+def apply_bucket(df, name, rules=BUCKET_RULES):
+    """ Evaluates a bucketing rule over a whole column at once (no per-row Python) """
+    rule = rules[name]
+    values = _as_float_array(df[rule['source']])
+    with np.errstate(invalid='ignore'):
+        conditions = [_OPERATORS[op](values, threshold) for op, threshold, _ in rule['cases']]
+    labels = [label for _, _, label in rule['cases']]
+    return pd.Series(np.select(conditions, labels, default=rule['default']), index=df.index)
+
+def apply_ratio(df, name, rules=RATIO_RULES):
+    """ Evaluates a ratio rule with a mask instead of a row-wise apply """
+    rule = rules[name]
+    numerator = _as_float_array(df[rule['numerator']])
+    denominator = _as_float_array(df[rule['denominator']])
+
+    result = np.full(len(df), rule['default'], dtype=float)
+    with np.errstate(invalid='ignore'):
+        valid = denominator > 0
+    result[valid] = numerator[valid] / denominator[valid]
+    return pd.Series(result, index=df.index).round(rule['decimals'])
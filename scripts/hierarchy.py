@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from key_index import KeySpace
+
+# ==========================================
+#      MANAGER HIERARCHY
+# ==========================================
+
+class OrgHierarchy:
+    """
+    The manager tree of one run (employee_id -> manager_id), built once.
+
+    Employees are numbered in an Euler tour (pre-order) of the tree, so every manager's
+    subtree is the contiguous range tin .. tin + size - 1 of that order. Any per-employee
+    figure then rolls up to every manager with one prefix sum and two lookups (subtree_sum).
+
+    Problems found while building (one pass over the employees each):
+      orphan_managers: manager ids that are not employees of the run (their reports become roots)
+      orphan_reports: the employees whose manager_id is one of those ids
+      cycles: groups of employees managing each other in a loop (broken at the lowest employee_id,
+              who becomes a root)
+    """
+
+    def __init__(self, emp_df, dept_df=None):
+        first = emp_df[emp_df['employee_id'].notna()].drop_duplicates('employee_id')
+        self.space = KeySpace(first['employee_id'])  # same order as `first`
+        self.employee_ids = first['employee_id'].to_numpy()
+        managers = first['manager_id'] if 'manager_id' in first.columns else pd.Series(pd.NA, index=first.index)
+        parent = self.space.positions(managers)
+
+        # Orphans: a manager id (of an employee or a department) that no employee has
+        known = pd.Series(self.employee_ids)
+        referenced = managers.dropna()
+        if dept_df is not None and 'manager_id' in dept_df.columns:
+            referenced = pd.concat([referenced, dept_df['manager_id'].dropna()])
+        self.orphan_managers = sorted(int(m) for m in pd.unique(referenced[~referenced.isin(known)]))
+        self.orphan_reports = sorted(int(e) for e in self.employee_ids[(managers.notna() & (parent < 0)).to_numpy()])
+
+        self.cycles = self._break_cycles(parent)
+        self.parent = parent
+        self._euler_tour()
+
+    def _break_cycles(self, parent):
+        """ Finds every manager cycle (each employee is walked once) and cuts it; returns the member ids """
+        n = len(parent)
+        state = np.zeros(n, dtype=np.int8)  # 0 = not seen, 1 = on the current walk, 2 = done
+        cycles = []
+        for start in range(n):
+            if state[start]:
+                continue
+            walk = []
+            node = start
+            while node != -1 and state[node] == 0:
+                state[node] = 1
+                walk.append(node)
+                node = parent[node]
+            if node != -1 and state[node] == 1:
+                members = walk[walk.index(node):]
+                root = min(members, key=lambda m: self.employee_ids[m])
+                parent[root] = -1
+                cycles.append(sorted(int(self.employee_ids[m]) for m in members))
+            state[walk] = 2
+        return cycles
+
+    def _euler_tour(self):
+        """ Pre-order numbering (tin), subtree sizes and depths, iteratively (no recursion limit) """
+        n = len(self.parent)
+        has_parent = self.parent >= 0
+        # Children of every node, grouped by parent, in employee order
+        parent_key = np.where(has_parent, self.parent, n)
+        by_parent = np.argsort(parent_key, kind='stable')
+        first_child = np.searchsorted(parent_key[by_parent], np.arange(n + 1), side='left')
+
+        self.order = np.empty(n, dtype=np.intp)
+        self.depth = np.zeros(n, dtype=np.intp)
+        self.direct_reports = np.diff(first_child)
+        position = 0
+        stack = list(np.flatnonzero(~has_parent)[::-1])
+        while stack:
+            node = stack.pop()
+            self.order[position] = node
+            position += 1
+            children = by_parent[first_child[node]:first_child[node + 1]]
+            self.depth[children] = self.depth[node] + 1
+            stack.extend(children[::-1])
+
+        self.tin = np.empty(n, dtype=np.intp)
+        self.tin[self.order] = np.arange(n)
+        # Subtree sizes: children before parents (reverse pre-order)
+        self.size = np.ones(n, dtype=np.intp)
+        for node in self.order[::-1]:
+            if self.parent[node] >= 0:
+                self.size[self.parent[node]] += self.size[node]
+
+    # --- Rollups ---
+
+    def subtree_sum(self, values):
+        """ Sum of values (one per employee, in employee order; missing = 0) over each employee's subtree """
+        values = np.nan_to_num(_floats(values))
+        prefix = np.concatenate([[0.0], np.cumsum(values[self.order])])
+        return prefix[self.tin + self.size] - prefix[self.tin]
+
+    def values_of(self, employee_ids, values):
+        """ values (per employee_id) in employee order; employees without a value get NaN """
+        values = _floats(values)
+        pos = self.space.positions(employee_ids)
+        out = np.full(len(self.space), np.nan)
+        known = pos >= 0
+        out[pos[known]] = values[known]
+        return out
+
+def _floats(values):
+    """ Any numeric values (nullable dtypes included) as a float array with NaN for missing """
+    return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
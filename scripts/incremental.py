@@ -0,0 +1,215 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+import extract
+import transform
+
+# ==========================================
+#      DELTA FEEDS
+# ==========================================
+
+# Tables a delta feed may change, with their primary key, cleaner and whether the cleaner takes the as-of date.
+# (Assignment changes are accepted by neither summary: no summary here reads assignments.)
+DELTA_TABLES = {
+    'employees': ('employee_id', transform.clean_employee_data, True),
+    'performance_reviews': ('review_id', transform.clean_review_data, False),
+    'projects': ('project_id', transform.clean_project_data, True),
+}
+DELTA_OPS = ('insert', 'update', 'delete')
+
+STATE_VERSION = 2
+
+def read_delta_feed(delta_dir):
+    """
+    Reads {table}.csv delta files from delta_dir. Each row is a raw-format row plus an 'op'
+    column: insert / update (full new row) / delete (only the primary key is needed).
+    """
+    deltas = {}
+    for table in DELTA_TABLES:
+        path = os.path.join(delta_dir, f"{table}.csv")
+        if not os.path.exists(path):
+            continue
+        df = extract.read_raw_csv(path)
+        unknown = set(df['op'].dropna().unique()) - set(DELTA_OPS) if 'op' in df.columns else {'<missing op column>'}
+        if unknown or df['op'].isna().any():
+            raise ValueError(f"Delta {table}.csv has invalid ops: {sorted(map(str, unknown)) or ['<empty>']}")
+        deltas[table] = df
+    return deltas
+
+# ==========================================
+#      PERSISTED SUMMARY STATE
+# ==========================================
+
+class SummaryState:
+    """
+    Everything needed to refresh summary_dept_metrics and summary_emp_performance from a delta
+    feed without recomputing them: the current cleaned rows (indexed by primary key), the
+    partial aggregates behind both summaries, and the summary tables themselves.
+
+    Counts and sums are maintained by adding/subtracting the changed rows. Measures that cannot
+    be subtracted (latest review) are rebuilt for the affected employees only.
+    The state is rebuilt by every full run; a delta refresh patches it until the next one.
+    """
+
+    def __init__(self, emp_df, rev_df, proj_df, dept_df, as_of):
+        self.as_of = as_of
+        self.dept_df = dept_df
+        self.tables = {
+            table: _indexed(df, DELTA_TABLES[table][0])
+            for table, df in [('employees', emp_df), ('performance_reviews', rev_df), ('projects', proj_df)]
+        }
+        self.dept_employees, self.dept_projects = transform.dept_summary_aggregates(emp_df, proj_df, as_of)
+        self.employee_reviews = transform.employee_review_aggregate(rev_df)
+        self.summaries = {
+            'summary_dept_metrics': transform.finish_dept_summary(
+                dept_df, self.dept_employees.result(), self.dept_projects.result()),
+            'summary_emp_performance': transform.finish_emp_performance(
+                emp_df, dept_df, self.employee_reviews.result()),
+        }
+
+    # --- Applying deltas ---
+
+    def _apply_table(self, table, delta):
+        """ Upserts/deletes the delta rows of one table; returns (removed rows, added rows) """
+        pk, cleaner, dated = DELTA_TABLES[table]
+        stored = self.tables[table]
+        changed_keys = pd.Index(delta[pk].dropna().unique())
+        removed = stored[stored.index.isin(changed_keys)]
+
+        upserts = delta[delta['op'] != 'delete'].drop(columns='op')
+        # Rows the cleaner drops (e.g. an employee turned inactive) leave the table
+        if upserts.empty:
+            added = stored.iloc[0:0]
+        else:
+            added = cleaner(upserts, as_of=self.as_of) if dated else cleaner(upserts)
+        added = _indexed(added.drop_duplicates(pk, keep='last'), pk)
+        if table == 'performance_reviews' and not added.empty:
+            added = self._drop_duplicate_reviews(added, removed)
+
+        # Updated rows keep their position, new rows go to the end
+        position = pd.Series(np.arange(len(stored)), index=stored.index)
+        position = position[~position.index.duplicated()]
+        kept = ~stored.index.isin(changed_keys)
+        added_position = position.reindex(added.index).to_numpy(dtype=float, copy=True)
+        new_rows = np.isnan(added_position)
+        added_position[new_rows] = len(stored) + np.arange(new_rows.sum())
+        order = np.concatenate([np.flatnonzero(kept), added_position]).argsort(kind='stable')
+
+        updated = pd.concat([stored[kept], added]).iloc[order]
+        for col, dtype in stored.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype) and col in updated.columns:
+                updated[col] = updated[col].astype('category')
+        self.tables[table] = updated
+        return removed, added
+
+    def _drop_duplicate_reviews(self, added, removed):
+        """ Like the full clean: one review per employee and date (the existing one is kept) """
+        stored = self.tables['performance_reviews']
+        others = stored[~stored.index.isin(removed.index)]
+        others = others[others['employee_id'].isin(added['employee_id'])]
+        existing = pd.MultiIndex.from_frame(others[['employee_id', 'review_date']])
+        new_pairs = pd.MultiIndex.from_frame(added[['employee_id', 'review_date']])
+        return added[~new_pairs.isin(existing)]
+
+    def apply(self, deltas):
+        """
+        Applies a delta feed ({table: rows with an 'op' column}) and patches only the summary
+        rows of the departments and employees it touches. Returns the affected keys.
+        """
+        affected_depts, affected_emps = set(), set()
+
+        if 'employees' in deltas:
+            removed, added = self._apply_table('employees', deltas['employees'])
+            self.dept_employees.remove(transform.hired_employees(removed, self.as_of)) \
+                .update(transform.hired_employees(added, self.as_of))
+            affected_depts.update(_keys(removed['department_id']))
+            affected_depts.update(_keys(added['department_id']))
+            affected_emps.update(_keys(deltas['employees']['employee_id']))
+
+        if 'projects' in deltas:
+            removed, added = self._apply_table('projects', deltas['projects'])
+            self.dept_projects.remove(transform.active_projects(removed, self.as_of)) \
+                .update(transform.active_projects(added, self.as_of))
+            affected_depts.update(_keys(removed['department_id']))
+            affected_depts.update(_keys(added['department_id']))
+
+        if 'performance_reviews' in deltas:
+            removed, added = self._apply_table('performance_reviews', deltas['performance_reviews'])
+            # Latest rating is not invertible: employees that lost a review are rebuilt from their rows
+            rebuilt = list(pd.unique(removed['employee_id'].dropna()))
+            if rebuilt:
+                self.employee_reviews.refresh(rebuilt, self.tables['performance_reviews'])
+            self.employee_reviews.update(added[~added['employee_id'].isin(rebuilt)])
+            affected_emps.update(_keys(removed['employee_id']))
+            affected_emps.update(_keys(added['employee_id']))
+
+        affected = {'departments': sorted(affected_depts), 'employees': sorted(affected_emps)}
+        self._patch_dept_summary(affected['departments'])
+        self._patch_emp_summary(affected['employees'])
+        return affected
+
+    def _patch_dept_summary(self, dept_ids):
+        if not dept_ids:
+            return
+        summary = self.summaries['summary_dept_metrics']
+        rows = self.dept_df[self.dept_df['department_id'].isin(dept_ids)]
+        fresh = transform.finish_dept_summary(
+            rows, self.dept_employees.result(dept_ids), self.dept_projects.result(dept_ids))
+        self.summaries['summary_dept_metrics'] = _patch_rows(summary, fresh, 'department_id', rows['department_id'],
+                                                            self.dept_df['department_id'])
+
+    def _patch_emp_summary(self, emp_ids):
+        if not emp_ids:
+            return
+        summary = self.summaries['summary_emp_performance']
+        employees = self.tables['employees']
+        rows = employees[employees.index.isin(emp_ids)]
+        fresh = transform.finish_emp_performance(rows, self.dept_df, self.employee_reviews.result(emp_ids))
+        self.summaries['summary_emp_performance'] = _patch_rows(summary, fresh, 'employee_id', emp_ids,
+                                                               employees['employee_id'])
+
+# ==========================================
+#      HELPERS
+# ==========================================
+
+def _keys(values):
+    """ Distinct non-missing ids as plain ints """
+    return {int(k) for k in pd.unique(values.dropna())}
+
+def _indexed(df, pk):
+    """ Rows indexed by their primary key (the key column is kept as well) """
+    return df.set_axis(pd.Index(df[pk].to_numpy()), axis=0)
+
+def _patch_rows(summary, fresh, key, replaced_keys, order):
+    """ Replaces the summary rows of replaced_keys by fresh rows and restores the table's row order """
+    kept = summary[~summary[key].isin(replaced_keys)]
+    if not summary.empty:
+        fresh = fresh.astype(summary.dtypes.to_dict())
+    patched = pd.concat([kept, fresh], ignore_index=True)
+    position = pd.Index(order.drop_duplicates().to_numpy()).get_indexer(patched[key])
+    return patched.iloc[position.argsort(kind='stable')].reset_index(drop=True)
+
+def save_state(state, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': STATE_VERSION, 'state': state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def load_state(path, as_of=None):
+    """ Saved summary state, or None if missing/unreadable/outdated or built for another as-of date """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            saved = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if saved.get('version') != STATE_VERSION:
+        return None
+    state = saved['state']
+    if as_of is not None and state.as_of != as_of:
+        return None
+    return state
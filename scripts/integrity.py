@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+#      KEY NORMALIZATION & HASHING
+# ==========================================
+
+def canonical_keys(df, columns):
+    """
+    Key columns in one comparable form: numbers as float64 (so 101, 101.0 and Int64 101 are the
+    same key), everything else as strings; missing values stay missing.
+    """
+    keys = {}
+    for out, col in enumerate(columns):
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+            keys[out] = values.to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            keys[out] = values.astype(object).where(values.notna(), None).map(
+                lambda v: v if v is None else str(v)).to_numpy(dtype=object)
+    return pd.DataFrame(keys, index=pd.RangeIndex(len(df)))
+
+def _key_index(keys):
+    """ Hash-based lookup structure over key rows (Index for one column, MultiIndex for several) """
+    if keys.shape[1] == 1:
+        return pd.Index(keys[0])
+    return pd.MultiIndex.from_frame(keys)
+
+def key_hashes(keys):
+    """ One uint64 hash per key row (equal keys always hash alike) """
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+# ==========================================
+#      BLOOM FILTER
+# ==========================================
+
+class BloomFilter:
+    """
+    Set membership in about 10 bits per key (1% false positives): might_contain() can say yes
+    for a key never added, never no for one that was. Bit positions come from double hashing
+    of the 64-bit key hashes.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.n_bits = max(int(-capacity * np.log(error_rate) / np.log(2) ** 2), 8)
+        self.n_hashes = max(int(round(self.n_bits / capacity * np.log(2))), 1)
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, hashes):
+        low = (hashes & np.uint64(0xFFFFFFFF)).astype(np.uint64)
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.n_hashes, dtype=np.uint64)
+        return (low[:, None] + steps[None, :] * high[:, None]) % np.uint64(self.n_bits)
+
+    def add(self, hashes):
+        positions = self._positions(hashes).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+    def might_contain(self, hashes):
+        positions = self._positions(hashes)
+        bytes_ = self.bits[positions >> np.uint64(3)]
+        return ((bytes_ >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+# ==========================================
+#      FOREIGN KEY CHECK
+# ==========================================
+
+class Violations:
+    """
+    Child rows whose foreign key has no parent row.
+    positions: row positions in the child frame; keys: their key values (one row each).
+    """
+
+    def __init__(self, positions, keys):
+        self.positions = positions
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.positions)
+
+    def distinct_keys(self):
+        return self.keys.drop_duplicates()
+
+def find_violations(child_df, child_cols, parent, parent_cols=None, key_space=None, unassigned=-1,
+                    max_exact_keys=None, bloom_capacity=None, error_rate=0.01):
+    """
+    Rows of child_df whose (multi-column) key child_cols is not a key of the parent.
+
+    parent: a DataFrame, or a function returning an iterable of DataFrame chunks (e.g.
+            lambda: extract.stream_table(path, chunk_rows=...)) for parents that do not fit in memory.
+    key_space: the parent's KeySpace for single-column keys, if already built (KeyIndex).
+    unassigned: child key value that means "no parent" and is not checked (missing keys are violations).
+
+    In memory, membership is one hash lookup per child row. A streamed parent (or one with more
+    than max_exact_keys rows) goes through a Bloom filter first: rows it rejects are violations
+    outright, and only the distinct keys it lets through are confirmed by a second pass over
+    the parent chunks.
+    """
+    child_cols = [child_cols] if isinstance(child_cols, str) else list(child_cols)
+    parent_cols = child_cols if parent_cols is None else \
+        ([parent_cols] if isinstance(parent_cols, str) else list(parent_cols))
+    keys = canonical_keys(child_df, child_cols)
+
+    checked = ~(keys == unassigned).any(axis=1).to_numpy() if unassigned is not None else np.ones(len(keys), bool)
+    missing = keys.isna().any(axis=1).to_numpy() & checked
+    lookup = checked & ~missing
+
+    if key_space is not None and len(child_cols) == 1:
+        found = key_space.positions(child_df[child_cols[0]]) >= 0
+    elif callable(parent) or (max_exact_keys is not None and len(parent) > max_exact_keys):
+        found = _found_streamed(keys, lookup, parent, parent_cols, bloom_capacity, max_exact_keys, error_rate)
+    else:
+        found = _key_index(keys).isin(_key_index(canonical_keys(parent, parent_cols)))
+
+    positions = np.flatnonzero(missing | (lookup & ~np.asarray(found, dtype=bool)))
+    offending = child_df[child_cols].iloc[positions].reset_index(drop=True)
+    return Violations(positions, offending)
+
+def _found_streamed(keys, lookup, parent, parent_cols, capacity, chunk_rows, error_rate):
+    """ Membership of the child keys in a parent read chunk by chunk (Bloom prefilter + exact confirmation) """
+    if callable(parent):
+        chunks = parent
+    else:
+        chunk_rows = chunk_rows or len(parent)
+        chunks = lambda: (parent.iloc[i:i + chunk_rows] for i in range(0, len(parent), chunk_rows))
+
+    # Pass 1: hash every parent key into the filter
+    bloom = BloomFilter(capacity or (len(parent) if not callable(parent) else 1_000_000), error_rate)
+    for chunk in chunks():
+        bloom.add(key_hashes(canonical_keys(chunk, parent_cols)))
+
+    found = np.zeros(len(keys), dtype=bool)
+    rows = np.flatnonzero(lookup)
+    maybe = rows[bloom.might_contain(key_hashes(keys.iloc[rows]))]
+    if len(maybe) == 0:
+        return found
+
+    # Pass 2: confirm the distinct candidate keys (false positives stay not found)
+    candidates = _key_index(keys.iloc[maybe].drop_duplicates().reset_index(drop=True))
+    confirmed = np.zeros(len(candidates), dtype=bool)
+    for chunk in chunks():
+        confirmed |= candidates.isin(_key_index(canonical_keys(chunk, parent_cols)))
+    found[maybe] = _key_index(keys.iloc[maybe].reset_index(drop=True)).isin(candidates[confirmed])
+    return found
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+#      DENSE KEY INDEX
+# ==========================================
+
+class KeySpace:
+    """
+    The ids of one table (e.g. all department_id values) numbered 0..n-1.
+    Any id column can be turned into positions in that numbering once, after which
+    lookups, joins and membership checks are plain array indexing.
+    """
+
+    def __init__(self, keys):
+        self.keys = pd.Index(pd.unique(pd.Series(keys).dropna()))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def positions(self, values):
+        """ Position of each value in the key space, -1 when the key does not exist """
+        return self.keys.get_indexer(pd.Series(values).to_numpy())
+
+    def missing_keys(self, values):
+        """ Distinct values that are not keys of this space (-1 'unassigned' ignored, NaN counts as missing) """
+        values = pd.Series(values)
+        values = values[(values != -1).fillna(True).astype(bool)]
+        distinct = pd.unique(values)
+        return distinct[self.keys.get_indexer(distinct) == -1]
+
+    def take(self, stats, values):
+        """
+        Rows of a per-key stats frame (indexed by key) lined up with `values`.
+        Keys without stats give missing values, like a left merge.
+        """
+        stat_pos = self.positions(stats.index)
+        row_of_key = np.full(len(self), -1, dtype=np.intp)
+        known = stat_pos >= 0
+        row_of_key[stat_pos[known]] = np.flatnonzero(known)
+
+        value_pos = self.positions(values)
+        rows = np.where(value_pos >= 0, row_of_key[np.maximum(value_pos, 0)], -1)
+        return pd.DataFrame({
+            col: pd.api.extensions.take(stats[col].array, rows, allow_fill=True)
+            for col in stats.columns
+        })
+
+class KeyIndex:
+    """ Key spaces for the department, employee and project ids of one run """
+
+    def __init__(self, dept_df=None, emp_df=None, proj_df=None):
+        self.spaces = {}
+        self.department_names = None
+        if dept_df is not None and 'department_id' in dept_df.columns:
+            self.spaces['department_id'] = KeySpace(dept_df['department_id'])
+            name_col = 'name' if 'name' in dept_df.columns else 'department_name'
+            if name_col in dept_df.columns:
+                # First row of each department, which is also the key space order
+                first_rows = dept_df[dept_df['department_id'].notna()].drop_duplicates('department_id')
+                self.department_names = first_rows[name_col].array
+        if emp_df is not None and 'employee_id' in emp_df.columns:
+            self.spaces['employee_id'] = KeySpace(emp_df['employee_id'])
+        if proj_df is not None and 'project_id' in proj_df.columns:
+            self.spaces['project_id'] = KeySpace(proj_df['project_id'])
+
+    def __contains__(self, key_column):
+        return key_column in self.spaces
+
+    def space(self, key_column):
+        return self.spaces[key_column]
+
+    def department_name(self, department_ids):
+        """
+        Department name for each id. 'Ghost' departments (ids missing from the
+        departments file, or departments without a name) map to 'Unknown'.
+        """
+        department_ids = pd.Series(department_ids)
+        if self.department_names is None or 'department_id' not in self.spaces:
+            return pd.Series('Unknown', index=department_ids.index, dtype=object)
+        pos = self.spaces['department_id'].positions(department_ids)
+        names = pd.api.extensions.take(self.department_names, pos, allow_fill=True)
+        return pd.Series(names, index=department_ids.index).fillna('Unknown')
@@ -3,48 +3,287 @@ import mysql.connector
 from mysql.connector import Error
 import os
 import sys
+import time
 import numpy as np
 
 # Import your transformation script
 import transform 
+import extract
 
 # ==========================================
 #      DATABASE HELPERS
 # ==========================================
 
-def create_db_connection(host_name, user_name, user_password, db_name):
+def create_db_connection(host_name, user_name, user_password, db_name, local_infile_dir=None):
+    """
+    local_infile_dir: directory the client may read files from for LOAD DATA LOCAL INFILE
+    (bulk loading); None = no local files at all
+    """
     connection = None
     try:
+        options = {'allow_local_infile_in_path': local_infile_dir} if local_infile_dir else {}
         connection = mysql.connector.connect(
             host=host_name,
             user=user_name,
             passwd=user_password,
-            database=db_name
+            database=db_name,
+            **options
         )
         print(f"✓ Connected to Database: {db_name}")
     except Error as err:
         print(f"X Connection Error: '{err}'")
     return connection
 
-def insert_data(connection, df, table_name):
+# Row inserts: rows per multi-row INSERT statement, rows per transaction (None = one transaction)
+# and the largest statement sent (keep it under the server's max_allowed_packet)
+INSERT_SETTINGS = {
+    'rows_per_statement': 1000,
+    'rows_per_commit': 50_000,
+    'max_packet_bytes': 16 * 1024 * 1024,
+}
+
+def _value_batches(df, batch_rows):
+    """ Object arrays of batch_rows rows with every missing value (NaN, NaT, NA) as None, one batch at a time """
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows]
+        values = batch.to_numpy(dtype=object)
+        values[batch.isna().to_numpy()] = None
+        yield values
+
+def sql_rows(df, batch_rows=10000):
+    """
+    Row tuples for executemany, batch by batch, with every missing value (NaN, NaT, NA) as None.
+    Only one batch is converted at a time, instead of a full converted copy of the frame.
+    """
+    for values in _value_batches(df, batch_rows):
+        yield [tuple(x) for x in values]
+
+def statement_rows(df, rows_per_statement, max_packet_bytes, sample_rows=1000):
+    """
+    Rows per INSERT statement: rows_per_statement, fewer when that many rows of df (sized
+    from a sample, with a 2x margin) would not fit in max_packet_bytes or would need more
+    placeholders than a prepared statement can take (65535)
+    """
+    rows_per_statement = min(rows_per_statement, 65535 // max(len(df.columns), 1))
+    sample = df.iloc[:sample_rows]
+    if sample.empty:
+        return rows_per_statement
+    # Text size of every value plus separators / binary protocol overhead
+    row_bytes = sum(sample[col].astype(str).str.len().fillna(0).mean() + 4 for col in sample.columns)
+    return int(max(1, min(rows_per_statement, max_packet_bytes // (2 * max(row_bytes, 1)))))
+
+def insert_rows(connection, df, table_name, rows_per_statement=None, rows_per_commit=None, max_packet_bytes=None):
+    """
+    Inserts df with multi-row INSERT statements of a fixed size, prepared once and re-executed
+    (a second one for the last, shorter statement). Rows are converted one statement at a time and
+    committed every rows_per_commit rows, so neither the client nor a transaction holds the whole table.
+    Returns {'rows', 'statements', 'commits', 'seconds'}; raises mysql.connector.Error (rows of
+    earlier commits stay in the table).
+    """
+    rows_per_statement = rows_per_statement or INSERT_SETTINGS['rows_per_statement']
+    max_packet_bytes = max_packet_bytes or INSERT_SETTINGS['max_packet_bytes']
+    batch_rows = statement_rows(df, rows_per_statement, max_packet_bytes)
+    if rows_per_commit:
+        # Commit at statement boundaries
+        rows_per_commit = max(batch_rows, rows_per_commit // batch_rows * batch_rows)
+
+    cols = ",".join(df.columns.tolist())
+    row_placeholders = "(" + ",".join(["%s"] * len(df.columns)) + ")"
+    cursor = connection.cursor(prepared=True)
+    stats = {'rows': 0, 'statements': 0, 'commits': 0}
+    start = time.perf_counter()
+    uncommitted = 0
+    for values in _value_batches(df, batch_rows):
+        # The same SQL text reuses the cursor's prepared statement
+        sql = f"INSERT INTO {table_name} ({cols}) VALUES " + ",".join([row_placeholders] * len(values))
+        cursor.execute(sql, values.ravel().tolist())
+        stats['rows'] += len(values)
+        stats['statements'] += 1
+        uncommitted += len(values)
+        if rows_per_commit and uncommitted >= rows_per_commit:
+            connection.commit()
+            stats['commits'] += 1
+            uncommitted = 0
+    if uncommitted or not stats['commits']:
+        connection.commit()
+        stats['commits'] += 1
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def insert_data(connection, df, table_name, rows_per_statement=None, rows_per_commit=None, max_packet_bytes=None):
+    """
+    Replaces the rows of table_name with df using batched inserts (insert_rows; None = INSERT_SETTINGS).
+    Rolls back and re-raises mysql.connector.Error on failure.
+    """
     cursor = connection.cursor()
-    # Handle NaNs for SQL
-    df = df.replace({np.nan: None})
     
     try:
         cursor.execute(f"TRUNCATE TABLE {table_name}")
         
-        cols = ",".join(df.columns.tolist())
-        placeholders = ",".join(["%s"] * len(df.columns))
-        sql = f"INSERT INTO {table_name} ({cols}) VALUES ({placeholders})"
+        stats = insert_rows(connection, df, table_name, rows_per_statement,
+                            rows_per_commit or INSERT_SETTINGS['rows_per_commit'], max_packet_bytes)
+        rate = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else float('inf')
+        print(f"✓ DB Load: {len(df)} rows -> '{table_name}' ({stats['statements']} statements, "
+              f"{stats['commits']} commits, {rate:,.0f} rows/s)")
+        return stats
         
-        data_tuples = [tuple(x) for x in df.to_numpy()]
-        cursor.executemany(sql, data_tuples)
+    except Error as err:
+        connection.rollback()
+        print(f"X DB Load Error {table_name}: {err}")
+        raise
+
+def _bulk_column_expression(column, variable, dtype):
+    """ SET expression turning one CSV field (@variable) back into its value: '' is NULL, True/False are 1/0 """
+    if pd.api.types.is_bool_dtype(dtype):
+        return f"{column} = CASE {variable} WHEN 'True' THEN 1 WHEN 'False' THEN 0 ELSE NULL END"
+    return f"{column} = NULLIF({variable}, '')"
+
+def bulk_load_file(connection, csv_path, df, table_name):
+    """
+    Replaces the content of table_name with csv_path, the export of df (export_to_csv), in one
+    LOAD DATA LOCAL INFILE statement: the server parses the file, no rows are built on the client.
+    Empty fields load as NULL (as missing values are exported), so empty strings do too.
+    The old rows are deleted in the same transaction (TRUNCATE would commit on its own), so a
+    failed load rolls back to them.
+    Raises mysql.connector.Error when the server or the connection does not allow local files.
+    """
+    cursor = connection.cursor()
+    variables = [f"@c{i}" for i in range(len(df.columns))]
+    assignments = ",\n            ".join(_bulk_column_expression(col, var, dtype)
+                                        for col, var, dtype in zip(df.columns, variables, df.dtypes))
+    file_name = os.path.abspath(csv_path).replace(os.sep, '/').replace("'", "''")
+    # to_csv ends lines with os.linesep
+    line_end = os.linesep.encode('unicode_escape').decode()
+    sql = f"""
+        LOAD DATA LOCAL INFILE '{file_name}'
+        INTO TABLE {table_name}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+        LINES TERMINATED BY '{line_end}'
+        IGNORE 1 LINES
+        ({", ".join(variables)})
+        SET {assignments}"""
+    cursor.execute(f"DELETE FROM {table_name}")
+    cursor.execute(sql)
+    connection.commit()
+    return cursor.rowcount
+
+def load_table(connection, df, table_name, csv_path=None, method='insert', insert_settings=None):
+    """
+    Loads df into table_name (replacing its rows).
+    method='bulk' loads the exported file csv_path with LOAD DATA LOCAL INFILE and falls back to
+    insert_data when that fails (no file, local_infile disabled on the server...); 'insert' always
+    uses insert_data, with insert_settings (keys of INSERT_SETTINGS) when given.
+    Returns the method actually used and the rows per second; raises mysql.connector.Error
+    when the table could not be loaded (including by the fallback).
+    """
+    start = time.perf_counter()
+    used = 'insert'
+    if method == 'bulk' and csv_path and os.path.exists(csv_path):
+        try:
+            bulk_load_file(connection, csv_path, df, table_name)
+            used = 'bulk'
+            print(f"✓ DB Bulk Load: {len(df)} rows -> '{table_name}'")
+        except Error as err:
+            connection.rollback()
+            print(f"! Bulk load of {table_name} failed ({err}), falling back to inserts")
+    if used == 'insert':
+        insert_data(connection, df, table_name, **(insert_settings or {}))
+    seconds = time.perf_counter() - start
+    return used, len(df) / seconds if seconds > 0 else float('inf')
+
+def upsert_rows(connection, df, table_name, key_column, keys):
+    """
+    Replaces the rows of the given keys (deleting keys that are not in df) in one transaction.
+    Rolls back and re-raises mysql.connector.Error on failure.
+    """
+    cursor = connection.cursor()
+    
+    try:
+        keys = [int(k) for k in keys]
+        if keys:
+            placeholders = ",".join(["%s"] * len(keys))
+            cursor.execute(f"DELETE FROM {table_name} WHERE {key_column} IN ({placeholders})", keys)
+        if not df.empty:
+            # No intermediate commits: the delete and the inserts stay one transaction
+            insert_rows(connection, df, table_name, rows_per_commit=None)
         connection.commit()
-        print(f"✓ DB Load: {len(df)} rows -> '{table_name}'")
+        print(f"✓ DB Upsert: {len(df)} rows ({len(keys)} keys) -> '{table_name}'")
         
     except Error as err:
-        print(f"X DB Load Error {table_name}: {err}")
+        connection.rollback()
+        print(f"X DB Upsert Error {table_name}: {err}")
+        raise
+
+# Tables added by the pipeline after the original schema; created on first load if missing
+TABLE_DDL = {
+    'fact_over_allocation': """
+        CREATE TABLE IF NOT EXISTS fact_over_allocation (
+            employee_id INT NOT NULL,
+            period_start DATE NOT NULL,
+            period_end DATE NULL,
+            peak_allocation DECIMAL(7,2) NOT NULL,
+            days INT NULL
+        )""",
+    'summary_emp_allocation': """
+        CREATE TABLE IF NOT EXISTS summary_emp_allocation (
+            employee_id INT PRIMARY KEY,
+            peak_allocation DECIMAL(7,2) NOT NULL,
+            peak_start_date DATE NOT NULL,
+            peak_end_date DATE NULL,
+            over_allocated_periods INT NOT NULL
+        )""",
+    'summary_manager_rollup': """
+        CREATE TABLE IF NOT EXISTS summary_manager_rollup (
+            manager_id INT PRIMARY KEY,
+            name VARCHAR(100),
+            department_id INT,
+            level INT NOT NULL,
+            direct_reports INT NOT NULL,
+            team_headcount INT NOT NULL,
+            team_salary_total DECIMAL(15,2) NOT NULL,
+            team_avg_rating DECIMAL(3,2) NULL,
+            team_allocation DECIMAL(9,2) NOT NULL,
+            team_avg_allocation DECIMAL(6,1) NOT NULL
+        )""",
+    'summary_review_cube': """
+        CREATE TABLE IF NOT EXISTS summary_review_cube (
+            grouping_id TINYINT NOT NULL,
+            department_id INT NULL,
+            salary_bucket VARCHAR(20) NULL,
+            performance_category VARCHAR(30) NULL,
+            review_month CHAR(7) NULL,
+            review_count INT NOT NULL,
+            rating_sum DECIMAL(12,2) NOT NULL,
+            avg_rating DECIMAL(3,2) NULL,
+            employee_count INT NOT NULL,
+            avg_salary DECIMAL(12,2) NULL
+        )""",
+    'summary_dept_snapshots': """
+        CREATE TABLE IF NOT EXISTS summary_dept_snapshots (
+            as_of DATE NOT NULL,
+            department_id INT NOT NULL,
+            department_name VARCHAR(100),
+            total_employees INT NOT NULL,
+            avg_salary DECIMAL(12,2) NULL,
+            active_projects INT NOT NULL,
+            total_budget DECIMAL(15,2) NOT NULL,
+            avg_tenure_years DECIMAL(5,1) NULL,
+            active_assignments INT NOT NULL,
+            PRIMARY KEY (as_of, department_id)
+        )""",
+}
+
+def create_table(connection, table_name):
+    """ Creates table_name from TABLE_DDL if it does not exist yet (other tables are left alone) """
+    if table_name not in TABLE_DDL:
+        return
+    cursor = connection.cursor()
+    try:
+        cursor.execute(TABLE_DDL[table_name])
+        connection.commit()
+    except Error as err:
+        print(f"X Create Table Error {table_name}: {err}")
 
 def create_index(connection, table_name, column_name):
     cursor = connection.cursor()
@@ -78,8 +317,29 @@ def export_to_csv(df, filename):
     try:
         df.to_csv(path, index=False, header=True, date_format='%Y-%m-%d')
         print(f"✓ File Saved: {filename}")
+        return path
+    except Exception as e:
+        print(f"X File Save Error {filename}: {e}")
+        return None
+
+def export_chunks_to_csv(chunks, filename):
+    """ Streams DataFrame chunks into one CSV in data/processed/ (header written once); returns the path, None on failure """
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    processed_dir = os.path.join(base_dir, 'data', 'processed')
+    os.makedirs(processed_dir, exist_ok=True)
+    
+    path = os.path.join(processed_dir, filename)
+    
+    total_rows = 0
+    try:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode='w' if i == 0 else 'a', index=False, header=(i == 0), date_format='%Y-%m-%d')
+            total_rows += len(chunk)
+        print(f"✓ File Saved: {filename} ({total_rows} rows, streamed)")
+        return path
     except Exception as e:
         print(f"X File Save Error {filename}: {e}")
+        return None
 
 # ==========================================
 #      MAIN ETL PROCESS
@@ -99,12 +359,14 @@ def run_load_process():
     raw_dir = os.path.join(base_dir, 'data', 'extractRawFiles')
     
     try:
-        # Load Raw
-        raw_emp = pd.read_csv(os.path.join(raw_dir, 'employees.csv'))
-        raw_rev = pd.read_csv(os.path.join(raw_dir, 'performance_reviews.csv'))
-        raw_proj = pd.read_csv(os.path.join(raw_dir, 'projects.csv'))
-        raw_ass = pd.read_csv(os.path.join(raw_dir, 'project_assignments.csv'))
-        raw_dept = pd.read_csv(os.path.join(raw_dir, 'departments.csv'))
+        # Load Raw (each file is parsed exactly once)
+        raw_data = extract.extract_data(raw_dir)
+        raw_emp = raw_data['employees']
+        raw_rev = raw_data['performance_reviews']
+        raw_proj = raw_data['projects']
+        raw_ass = raw_data['project_assignments']
+        raw_dept = raw_data['departments']
+        del raw_data
         
         # Transform
         clean_emp = transform.clean_employee_data(raw_emp)
@@ -166,7 +428,10 @@ def run_load_process():
     ]
     
     for df, table in tasks:
-        insert_data(conn, df, table)
+        try:
+            insert_data(conn, df, table)
+        except Error:
+            pass  # Reported by insert_data; the other tables still load
 
     cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
     
@@ -1,5 +1,6 @@
 import logging
 import time
+import functools
 import os
 import sys
 import pandas as pd
@@ -11,6 +12,15 @@ import transform
 import validation
 import load
 import reporting  # <--- NEW IMPORT
+import manifest
+import incremental
+import sharding
+import quarantine
+import profiling
+from cache import FrameCache, format_bytes
+from key_index import KeyIndex
+from hierarchy import OrgHierarchy
+from table_graph import TableGraph
 
 # ==========================================
 #      CONFIGURATION & LOGGING
@@ -27,6 +37,74 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+cache_root = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'cache')
+manifest_path = os.path.join(cache_root, 'manifest.json')
+summary_state_path = os.path.join(cache_root, 'summary_state.pkl')
+profile_dir = os.path.join(cache_root, 'profiles')
+quarantine_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'quarantine', 'quarantine.csv')
+
+PIPELINE_CONFIG = {
+    # Drop raw frames from the run cache as soon as the last phase that reads them is done
+    'evict_after_use': True,
+    # Threads used to parse the raw files concurrently (None = one per file)
+    'extract_workers': None,
+    # Keep a Parquet copy of each raw CSV in data/cache/raw/ and reuse it while the CSV is unchanged
+    'columnar_cache': True,
+    # Skip extracting, transforming and loading tables whose inputs did not change (data/cache/manifest.json)
+    'incremental': True,
+    # Convert low-cardinality strings to categoricals and downcast ids/flags after cleaning
+    'compact_tables': True,
+    # Threads running independent transformation nodes (None = Python's default)
+    'transform_workers': None,
+    # Clean without copying the raw frames (one combined filter mask per table)
+    'copy_free_cleaning': False,
+    # Parse and clean employees, projects and project_assignments in chunks of this many rows, and write the
+    # exports in chunks of this size; None = whole tables. Bounds the raw parse only: the cleaned tables are
+    # still held whole by the later phases. Turns off the sharded transform (it splits the raw tables).
+    'stream_chunk_rows': None,
+    # Log the peak memory of every cleaning step (tracemalloc; runs the transformation on one thread)
+    'trace_cleaning_memory': False,
+    # Worker processes for the sharded transform (cleaning + both summaries split by department); 0 = off.
+    # Used when a run builds both summaries from all inputs, instead of the summary state below.
+    'shard_workers': 0,
+    # Save the summary aggregates (data/cache/summary_state.pkl) so `main.py --delta <dir>` can refresh them
+    'summary_state': True,
+    # Reference date for tenure, headcount and active projects ('YYYY-MM-DD'); None = today.
+    # A past date recomputes only these figures as of then (also `python main.py --as-of <date>`): employees
+    # hired later have no tenure and are not counted, but every row is still loaded, reviews dated later included.
+    'as_of': None,
+    # Dates of summary_dept_snapshots (department figures as of each date, built in one batch), e.g.
+    # pd.date_range('2023-01-31', '2024-12-31', freq='ME') for monthly snapshots; None = not built
+    'snapshot_dates': None,
+    # Append the rows failing validation to data/quarantine/quarantine.csv (table, rule, row key, reason)
+    'quarantine': True,
+    # Load only the rows that passed validation (the others are in the quarantine file)
+    'load_clean_rows_only': False,
+    # Profile the loaded dimension / fact tables with sketches before loading (data/cache/profiles/)
+    # and report drift against the previous run's profile
+    'profiling': True,
+    # Rows per chunk fed to the profile sketches
+    'profile_chunk_rows': 100_000,
+    # 'bulk': load every table from its data/processed/ export with LOAD DATA LOCAL INFILE (needs
+    # local_infile=ON on the server; falls back to inserts otherwise), 'insert': row inserts only
+    'load_method': 'bulk',
+    # Row inserts (load_method 'insert', or the bulk fallback): rows per multi-row INSERT, rows per
+    # transaction (small transactions keep replicas from stalling) and the largest statement in bytes
+    'insert_rows_per_statement': 1000,
+    'insert_rows_per_commit': 50_000,
+    'max_packet_bytes': 16 * 1024 * 1024,
+}
+
+# Tables profiled before loading
+PROFILED_TABLES = ["dim_departments", "dim_employees", "fact_performance_reviews", "fact_project_assignments"]
+
+def configured_as_of():
+    return PIPELINE_CONFIG['as_of'] or datetime.now().strftime('%Y-%m-%d')
+
+def configured_snapshot_dates():
+    dates = PIPELINE_CONFIG['snapshot_dates']
+    return [] if dates is None else [pd.Timestamp(d).strftime('%Y-%m-%d') for d in dates]
+
 # ==========================================
 #      PIPELINE PHASES
 # ==========================================
@@ -44,100 +122,303 @@ def run_extraction():
     if missing:
         raise FileNotFoundError(f"Missing raw files: {missing}")
     
-    # Calculate Volume Stats for Report
+    # Work out which inputs changed since the last successful run
+    cache_dir = os.path.join(base_dir, 'data', 'cache', 'raw') if PIPELINE_CONFIG['columnar_cache'] else None
+    previous = manifest.load_manifest(manifest_path) if PIPELINE_CONFIG['incremental'] else {}
+    inputs = manifest.fingerprint_inputs(raw_dir, cache_dir)
+    as_of = configured_as_of()
+    snapshot_dates = configured_snapshot_dates()
+    plan = manifest.plan_run(previous, inputs, as_of, os.path.join(base_dir, 'data', 'processed'), snapshot_dates)
+    plan.update({'previous': previous, 'inputs': inputs, 'as_of': as_of, 'snapshot_dates': snapshot_dates,
+                 'manifest_path': manifest_path})
+    
+    if previous:
+        logger.info(f"Incremental run: changed inputs {plan['changed_inputs'] or 'none'}, "
+                    f"stale tables {plan['stale_tables'] or 'none'}")
+    
+    # Parse every needed file once and keep the frames for the later phases
+    # (streamed tables are cleaned while they are parsed and cached under their cleaned node)
+    frame_cache = FrameCache(evict_after_use=PIPELINE_CONFIG['evict_after_use'])
+    streamed = [t for t in plan['read_inputs'] if t in transform.CHUNK_CLEANERS] \
+        if PIPELINE_CONFIG['stream_chunk_rows'] else []
+    whole = [t for t in plan['read_inputs'] if t not in streamed]
+    extracted = extract.extract_data(
+        raw_dir,
+        max_workers=PIPELINE_CONFIG['extract_workers'],
+        cache_dir=cache_dir,
+        columns=transform.SOURCE_COLUMNS,
+        tables=whole
+    ) if whole else {}
+    cleaned = {t: stream_clean(os.path.join(raw_dir, f"{t}.csv"), t, as_of) for t in streamed}
+    
+    # Calculate Volume Stats for Report (skipped tables keep the counts of the run that built them)
     volume_counts = {}
     for f in required_files:
-        path = os.path.join(raw_dir, f)
-        count = len(pd.read_csv(path))
-        volume_counts[f.replace('.csv', '')] = {'extracted': count}
+        table_name = f.replace('.csv', '')
+        if table_name in extracted:
+            frame_cache.put(table_name, extracted[table_name], consumers=['transformation'])
+            volume_counts[table_name] = {'extracted': len(extracted[table_name])}
+        elif table_name in cleaned:
+            df, raw_rows = cleaned.pop(table_name)
+            frame_cache.put(CLEANED_NODES[table_name], df, consumers=['transformation'])
+            volume_counts[table_name] = {'extracted': raw_rows, 'cleaned': len(df)}
+        elif table_name in previous.get('volume_stats', {}):
+            volume_counts[table_name] = previous['volume_stats'][table_name]
 
     duration = time.time() - start
-    logger.info(f"Extraction completed in {duration:.2f}s")
+    logger.info(f"Extraction completed in {duration:.2f}s "
+                f"({len(frame_cache.tables())} tables cached, {format_bytes(frame_cache.total_bytes())})")
     
-    return raw_dir, duration, volume_counts
+    return frame_cache, duration, volume_counts, plan
+
+def stream_clean(file_path, table_name, as_of):
+    """ Parses and cleans one raw table stream_chunk_rows rows at a time; returns (cleaned frame, raw row count) """
+    raw_rows = 0
+    def counted(chunks):
+        nonlocal raw_rows
+        for chunk in chunks:
+            raw_rows += len(chunk)
+            yield chunk
+    chunks = extract.stream_table(file_path, chunk_rows=PIPELINE_CONFIG['stream_chunk_rows'],
+                                  columns=transform.SOURCE_COLUMNS.get(table_name))
+    return transform.concat_chunks(transform.clean_in_chunks(table_name, counted(chunks), as_of)), raw_rows
+
+# Tables run_transformation builds by default (dependency order, also the output order)
+TRANSFORM_TARGETS = ["dim_departments", "dim_employees", "fact_performance_reviews", "fact_project_assignments",
+                     "summary_dept_metrics", "summary_emp_performance", "fact_over_allocation",
+                     "summary_emp_allocation", "summary_manager_rollup", "summary_review_cube", "raw_proj"]
+
+# Cleaned table node -> raw table it is built from
+CLEANED_TABLES = {
+    'clean_employees': 'employees',
+    'clean_reviews': 'performance_reviews',
+    'clean_projects': 'projects',
+    'clean_assignments': 'project_assignments',
+    'clean_departments': 'departments',
+}
+# Raw table -> cleaned table node
+CLEANED_NODES = {raw: node for node, raw in CLEANED_TABLES.items()}
+
+def clean_department_data(raw_dept):
+    """ DEPARTMENTS: Title-case names + drop duplicate rows """
+    if 'name' in raw_dept.columns:
+        raw_dept = raw_dept.assign(name=raw_dept['name'].str.title())
+    return raw_dept.drop_duplicates()
+
+def select_columns(df, columns):
+    return df[[c for c in columns if c in df.columns]]
 
-def run_transformation(raw_dir, volume_stats):
-    """ Phase 2: Transform & Clean Data """
+def build_table_graph(as_of, use_summary_state=False, shard_workers=0, cleaning_memory=None, snapshot_dates=None):
+    """
+    Every table of the transformation as a node of a TableGraph (raw -> clean -> dim/fact -> summary),
+    with as_of ('YYYY-MM-DD') as the reference date of tenure, headcount and active projects.
+    snapshot_dates: dates of the summary_dept_snapshots node (None = no such node).
+    With use_summary_state both summaries come from one incremental.SummaryState, saved for delta refreshes.
+    With shard_workers the cleaned tables and both summaries come from sharding.transform_sharded.
+    cleaning_memory: dict receiving the peak bytes of each cleaning step (None = not traced).
+    """
+    graph = TableGraph()
+    def cleaner(func, **kwargs):
+        return functools.partial(func, copy_free=PIPELINE_CONFIG['copy_free_cleaning'], memory=cleaning_memory,
+                                 **kwargs)
+
+    # Clean
+    graph.add('clean_departments', clean_department_data, ['departments'])
+    if shard_workers:
+        graph.add('sharded', lambda emp, rev, proj, dept, ass: sharding.transform_sharded(
+                      emp, rev, proj, dept, ass, workers=shard_workers, as_of=as_of),
+                  ['employees', 'performance_reviews', 'projects', 'clean_departments'],
+                  optional=['project_assignments'])
+        for name in ['clean_employees', 'clean_reviews', 'clean_projects']:
+            graph.add(name, lambda shards, name=name: shards[name], ['sharded'])
+        graph.add('clean_assignments', lambda shards, raw: shards['clean_assignments'],
+                  ['sharded', 'project_assignments'])
+        graph.add('summary_dept_metrics', lambda shards: shards['summary_dept_metrics'], ['sharded'])
+        graph.add('summary_emp_performance', lambda shards: shards['summary_emp_performance'], ['sharded'])
+        graph.add('review_stats', transform.compute_review_stats, ['clean_reviews'])
+    else:
+        graph.add('clean_employees', cleaner(transform.clean_employee_data, as_of=as_of), ['employees'])
+        graph.add('review_cleaning', cleaner(transform.clean_reviews_with_stats), ['performance_reviews'])
+        graph.add('clean_reviews', lambda cleaning: cleaning[0], ['review_cleaning'])
+        graph.add('review_stats', lambda cleaning: cleaning[1], ['review_cleaning'])
+        graph.add('clean_projects', cleaner(transform.clean_project_data, as_of=as_of), ['projects'])
+        graph.add('clean_assignments', cleaner(transform.clean_assignment_data), ['project_assignments'])
+
+    # Dense id positions, shared by the aggregates and the FK checks (only from tables the run cleans anyway)
+    graph.add('key_index', lambda dept, emp, proj: KeyIndex(dept_df=dept, emp_df=emp, proj_df=proj),
+              optional=['clean_departments', 'clean_employees', 'clean_projects'])
+
+    # Dimensions & facts (column alignment)
+    def dim_departments(clean_dept):
+        if 'department_name' in clean_dept.columns:
+            clean_dept = clean_dept.rename(columns={'department_name': 'name'})
+        return clean_dept[['department_id', 'name']]
+    graph.add('dim_departments', dim_departments, ['clean_departments'])
+    graph.add('dim_employees', lambda df: select_columns(df, [
+        'employee_id', 'name', 'department_id', 'salary', 'hire_date', 'status', 'bonus_eligible',
+        'tenure_years', 'salary_bucket']), ['clean_employees'])
+    graph.add('fact_performance_reviews', lambda df: select_columns(df, [
+        'review_id', 'employee_id', 'review_date', 'rating', 'reviewer_id', 'performance_category',
+        'latest_rating', 'is_self_review']), ['clean_reviews'])
+    graph.add('fact_project_assignments', lambda df: select_columns(df, [
+        'employee_id', 'project_id', 'allocation_percentage', 'start_date', 'end_date']), ['clean_assignments'])
+    graph.add('raw_proj', lambda df: df, ['clean_projects'])  # kept for reporting metrics
+
+    # Summaries (already declared above in sharded mode)
+    if shard_workers:
+        pass
+    elif use_summary_state:
+        def summary_state(emp, rev, proj, dept):
+            state = incremental.SummaryState(emp, rev, proj, dept, as_of)
+            incremental.save_state(state, summary_state_path)
+            return state
+        graph.add('summary_state', summary_state,
+                  ['clean_employees', 'clean_reviews', 'clean_projects', 'clean_departments'])
+        graph.add('summary_dept_metrics', lambda state: state.summaries['summary_dept_metrics'], ['summary_state'])
+        graph.add('summary_emp_performance', lambda state: state.summaries['summary_emp_performance'],
+                  ['summary_state'])
+    else:
+        graph.add('summary_dept_metrics', functools.partial(transform.create_dept_summary, as_of=as_of),
+                  ['clean_employees', 'clean_projects', 'clean_departments', 'key_index'])
+        graph.add('summary_emp_performance', transform.create_emp_performance,
+                  ['clean_employees', 'clean_reviews', 'clean_departments', 'review_stats', 'key_index'])
+    graph.add('summary_project_workload', transform.create_project_workload,
+              ['clean_projects', 'clean_assignments', 'key_index'])
+    graph.add('allocation_timeline', transform.allocation_timeline, ['clean_assignments'])
+    graph.add('fact_over_allocation', transform.create_over_allocation, ['allocation_timeline'])
+    graph.add('summary_emp_allocation', transform.create_allocation_summary, ['allocation_timeline'])
+    graph.add('summary_review_cube', transform.create_review_cube, ['clean_employees', 'clean_reviews', 'key_index'])
+    # Manager tree (built once per run, also checked by validation) and the per-manager rollups
+    # (ratings from the review stats, so the rollup does not need the departments)
+    graph.add('org_hierarchy', lambda emp, dept: OrgHierarchy(emp, dept), ['clean_employees'],
+              optional=['clean_departments'])
+    graph.add('summary_manager_rollup', functools.partial(transform.create_manager_rollup, as_of=as_of),
+              ['clean_employees', 'review_stats', 'clean_assignments', 'org_hierarchy'])
+    if snapshot_dates:
+        graph.add('summary_dept_snapshots', lambda emp, proj, dept, ass: transform.create_dept_snapshots(
+                      emp, proj, dept, snapshot_dates, ass),
+                  ['clean_employees', 'clean_projects', 'clean_departments', 'clean_assignments'])
+    return graph
+
+def run_transformation(frame_cache, volume_stats, as_of=None, targets=None, snapshot_dates=None):
+    """
+    Phase 2: Transform & Clean Data.
+    Builds only the requested tables (default: TRANSFORM_TARGETS, plus summary_dept_snapshots when
+    snapshot_dates are given) that the extracted frames allow, plus the run's KeyIndex and OrgHierarchy
+    for validation.
+    """
     logger.info(">>> PHASE 2: TRANSFORMATION STARTED")
     start = time.time()
+    targets = list(targets or TRANSFORM_TARGETS + (['summary_dept_snapshots'] if snapshot_dates else []))
     
-    # Load
-    raw_emp = pd.read_csv(os.path.join(raw_dir, 'employees.csv'))
-    raw_rev = pd.read_csv(os.path.join(raw_dir, 'performance_reviews.csv'))
-    raw_proj = pd.read_csv(os.path.join(raw_dir, 'projects.csv'))
-    raw_ass = pd.read_csv(os.path.join(raw_dir, 'project_assignments.csv'))
-    raw_dept = pd.read_csv(os.path.join(raw_dir, 'departments.csv'))
+    # The graph holds the raw frames from here on (graph.run empties sources) and drops each one
+    # once it is cleaned; the cache lets go of them now unless it is set to keep them
+    sources = {name: frame_cache.get(name) for name in frame_cache.tables()}
+    frame_cache.release_all('transformation')
 
-    # Transform
-    clean_emp = transform.clean_employee_data(raw_emp)
-    clean_rev = transform.clean_review_data(raw_rev)
-    clean_proj = transform.clean_project_data(raw_proj)
-    clean_ass = transform.clean_assignment_data(raw_ass)
-    
-    if 'name' in raw_dept.columns:
-        raw_dept['name'] = raw_dept['name'].str.title()
-    clean_dept = raw_dept.drop_duplicates()
+    both_summaries = {'summary_dept_metrics', 'summary_emp_performance'} <= set(targets) and \
+        all(raw in sources or node in sources for node, raw in CLEANED_TABLES.items() if raw != 'project_assignments')
+    # The sharded transform splits the raw tables, so it is off when some arrive already cleaned (streamed)
+    streamed = set(CLEANED_TABLES).intersection(sources)
+    shard_workers = PIPELINE_CONFIG['shard_workers'] if both_summaries and not streamed else 0
+    use_summary_state = PIPELINE_CONFIG['summary_state'] and both_summaries and not shard_workers
+    cleaning_memory = {} if PIPELINE_CONFIG['trace_cleaning_memory'] else None
+    graph = build_table_graph(as_of or configured_as_of(), use_summary_state, shard_workers,
+                              cleaning_memory, snapshot_dates)
 
     # Update Volume Stats with Cleaned Counts
-    volume_stats['employees']['cleaned'] = len(clean_emp)
-    volume_stats['performance_reviews']['cleaned'] = len(clean_rev)
-    volume_stats['projects']['cleaned'] = len(clean_proj)
-    volume_stats['project_assignments']['cleaned'] = len(clean_ass)
-    volume_stats['departments']['cleaned'] = len(clean_dept)
-
-    # Aggregates
-    summ_dept = transform.create_dept_summary(clean_emp, clean_proj, clean_dept)
-    summ_emp = transform.create_emp_performance(clean_emp, clean_rev, clean_dept)
-    proj_work = transform.create_project_workload(clean_proj, clean_ass)
-
-    # Column Alignment
-    if 'department_name' in clean_dept.columns:
-            clean_dept = clean_dept.rename(columns={'department_name': 'name'})
-    clean_dept = clean_dept[['department_id', 'name']]
+    def on_result(name, value):
+        if name in CLEANED_TABLES:
+            volume_stats[CLEANED_TABLES[name]]['cleaned'] = len(value)
 
-    emp_cols = ['employee_id', 'name', 'department_id', 'salary', 'hire_date', 'status', 'bonus_eligible', 'tenure_years', 'salary_bucket']
-    clean_emp = clean_emp[[c for c in emp_cols if c in clean_emp.columns]]
-    
-    rev_cols = ['review_id', 'employee_id', 'review_date', 'rating', 'reviewer_id', 'performance_category', 'latest_rating', 'is_self_review']
-    clean_rev = clean_rev[[c for c in rev_cols if c in clean_rev.columns]]
+    # Traced steps must not overlap, so tracing runs the nodes one at a time
+    workers = 1 if cleaning_memory is not None else PIPELINE_CONFIG['transform_workers']
+    results = graph.run(targets + ['key_index', 'org_hierarchy'], sources, max_workers=workers, on_result=on_result)
+    for step, peak in (cleaning_memory or {}).items():
+        logger.info(f"Cleaning step {step}: peak {format_bytes(peak)}")
+    key_index = results.pop('key_index', None)
+    hierarchy = results.pop('org_hierarchy', None)
+    skipped = [t for t in targets if t not in results]
+    if skipped:
+        logger.info(f"Not built (inputs not extracted): {skipped}")
 
-    ass_cols = ['employee_id', 'project_id', 'allocation_percentage', 'start_date', 'end_date']
-    clean_ass = clean_ass[[c for c in ass_cols if c in clean_ass.columns]]
+    rebuilt_summaries = {'summary_dept_metrics', 'summary_emp_performance'} & set(results)
+    if not use_summary_state and rebuilt_summaries and os.path.exists(summary_state_path):
+        # A summary was rebuilt without the state, which no longer matches it
+        os.remove(summary_state_path)
+        logger.info("Summary state dropped (saved again by the next run that builds both summaries)")
 
-    data_dict = {
-        "dim_departments": clean_dept,
-        "dim_employees": clean_emp,
-        "fact_performance_reviews": clean_rev,
-        "fact_project_assignments": clean_ass,
-        "summary_dept_metrics": summ_dept,
-        "summary_emp_performance": summ_emp,
-        "raw_proj": clean_proj  # kept for reporting metrics
-    }
+    # Same table order as a full run
+    data_dict = {t: results[t] for t in targets if t in results}
+
+    # Memory Compaction
+    if PIPELINE_CONFIG['compact_tables']:
+        data_dict, memory_report = transform.compact_tables(data_dict)
+        for table, (before, after) in memory_report.items():
+            logger.info(f"Compacted {table}: {format_bytes(before)} -> {format_bytes(after)}")
     
     duration = time.time() - start
-    logger.info(f"Transformation completed in {duration:.2f}s")
-    return data_dict, duration
+    logger.info(f"Transformation completed in {duration:.2f}s "
+                f"(frame cache peak {format_bytes(frame_cache.peak_bytes)}, {format_bytes(frame_cache.total_bytes())} still resident)")
+    return data_dict, duration, key_index, hierarchy
 
-def run_validation(data_dict):
-    """ Phase 3: Validate """
+def run_validation(data_dict, key_index=None, hierarchy=None, sink=None):
+    """
+    Phase 3: Validate (tables skipped by an incremental run are not re-checked)
+    Failing rows go to the quarantine sink, if any. Returns the DQ stats, the duration and
+    {table: boolean frame of failing rows per rule} for the validated output tables.
+    """
     logger.info(">>> PHASE 3: VALIDATION STARTED")
     start = time.time()
     
     issues = []
     # Note: We need the raw_proj (clean version) for validation
-    proj = data_dict["raw_proj"] 
+    proj = data_dict.get("raw_proj")
+    emp = data_dict.get("dim_employees")
+    dept = data_dict.get("dim_departments")
+    rev = data_dict.get("fact_performance_reviews")
+    ass = data_dict.get("fact_project_assignments")
     
-    issues.extend(validation.validate_employees(data_dict["dim_employees"], data_dict["dim_departments"]))
-    issues.extend(validation.validate_reviews(data_dict["fact_performance_reviews"], data_dict["dim_employees"]))
-    issues.extend(validation.validate_assignments(data_dict["fact_project_assignments"], proj, data_dict["dim_employees"]))
-    issues.extend(validation.validate_projects(proj))
+    # Tables to check with the parents of their foreign keys (independent, validated concurrently)
+    tables = {}
+    if emp is not None and dept is not None:
+        tables['Employees'] = (emp, {'Departments': dept})
+    if rev is not None and emp is not None:
+        tables['Reviews'] = (rev, {'Employees': emp})
+    if ass is not None and proj is not None and emp is not None:
+        tables['Assignments'] = (ass, {'Projects': proj, 'Employees': emp})
+    if proj is not None:
+        tables['Projects'] = (proj, {})
+    
+    rule_results = []
+    failed_rows = {}
+    output_names = {'Employees': 'dim_employees', 'Reviews': 'fact_performance_reviews',
+                    'Assignments': 'fact_project_assignments', 'Projects': 'raw_proj'}
+    for name, (table_issues, results, failed) in validation.validate_tables(tables, key_index).items():
+        issues.extend(table_issues)
+        rule_results.extend(results)
+        failed_rows[output_names[name]] = failed
+        if sink is not None:
+            sink.write(name, tables[name][0], failed)
+    if hierarchy is not None:
+        hierarchy_issues, results = validation.evaluate_hierarchy(hierarchy)
+        issues.extend(hierarchy_issues)
+        rule_results.extend(results)
+    
+    for result in sorted(rule_results, key=lambda r: r['seconds'], reverse=True)[:3]:
+        logger.info(f"Slowest rule: {result['rule']} ({result['seconds'] * 1000:.1f} ms, {result['checked']} rows)")
 
+    failed_rules = sum(1 for r in rule_results if r['failed'])
     dq_stats = {
-        'total_checks': 4, # High level check types
-        'passed': 4 if not issues else 0, # Simple pass/fail logic
-        'failed': len(issues),
-        'critical_issues': issues
+        'total_checks': len(rule_results),
+        'passed': len(rule_results) - failed_rules,
+        'failed': failed_rules,
+        'critical_issues': issues,
+        'rules': rule_results,
+        'quarantined': dict(sink.counts) if sink is not None else {}
     }
+    if sink is not None and sink.counts:
+        logger.warning(f"Quarantine records per table: {sink.counts} ({sink.path})")
     
     if issues:
         logger.warning(f"Validation found {len(issues)} issues")
@@ -145,25 +426,98 @@ def run_validation(data_dict):
         logger.info("Validation Passed")
 
     duration = time.time() - start
-    return dq_stats, duration
+    return dq_stats, duration, failed_rows
+
+def run_profiling(data_dict):
+    """
+    Phase 3b: Profile the tables about to be loaded (mergeable sketches, chunk by chunk) and compare
+    them with the previous run's profile. Tables this run did not rebuild keep their previous profile.
+    Returns the drift alerts and the duration.
+    """
+    logger.info(">>> PROFILING STARTED")
+    start = time.time()
+    
+    previous = profiling.load_latest_profile(profile_dir)
+    current = {
+        table: profiling.profile_frame(data_dict[table], PIPELINE_CONFIG['profile_chunk_rows']).summary()
+        for table in PROFILED_TABLES if table in data_dict
+    }
+    alerts = profiling.drift_alerts(previous, current)
+    profiling.save_profile(profile_dir, {**previous, **current})
+    for alert in alerts:
+        logger.warning(f"Profile drift: {alert}")
+    
+    duration = time.time() - start
+    logger.info(f"Profiled {len(current)} tables in {duration:.2f}s, {len(alerts)} drift alerts")
+    return alerts, duration
+
+def as_of_ranges(data_dict, plan):
+    """
+    Saved as-of range per date-dependent table ([as_of, first date it would change]): tables built
+    by this run get a new one, the others keep the range of the run that built them.
+    """
+    horizons = transform.as_of_horizons(plan['as_of'], data_dict.get('dim_employees'), data_dict.get('raw_proj'),
+                                         data_dict.get('fact_project_assignments'))
+    ranges = dict(plan['previous'].get('as_of_ranges', {}))
+    for table, end in horizons.items():
+        if table in data_dict:
+            ranges[table] = [plan['as_of'], None if end is None else end.strftime('%Y-%m-%d')]
+    return ranges
 
-def run_loading(data_dict):
-    """ Phase 4: Load """
+def export_table(df, table):
+    """ Writes a table to data/processed/ (stream_chunk_rows rows at a time when set); returns the path or None """
+    rows = PIPELINE_CONFIG['stream_chunk_rows']
+    if not rows:
+        return load.export_to_csv(df, f"{table}.csv")
+    return load.export_chunks_to_csv((df.iloc[i:i + rows] for i in range(0, max(len(df), 1), rows)), f"{table}.csv")
+
+def run_loading(data_dict, plan):
+    """
+    Phase 4: Load (only tables whose content changed since the last run).
+    Returns the duration and the content hashes of the tables now in the database (loaded or
+    unchanged); a table that failed to load has no hash, so the next run loads it again.
+    """
     logger.info(">>> PHASE 4: LOADING STARTED")
     start = time.time()
     
-    conn = load.create_db_connection("localhost", "root", "root", "employee_analytics")
+    output_hashes = {t: manifest.table_hash(df) for t, df in data_dict.items() if t != "raw_proj"}
+    tables_to_load = manifest.tables_to_reload(plan['previous'], output_hashes)
+    skipped = [t for t in output_hashes if t not in tables_to_load]
+    if skipped:
+        logger.info(f"Unchanged since last load, skipped: {skipped}")
+    if not tables_to_load:
+        logger.info("Nothing to load")
+        return time.time() - start, output_hashes
+
+    processed_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'processed')
+    bulk = PIPELINE_CONFIG['load_method'] == 'bulk'
+    conn = load.create_db_connection("localhost", "root", "root", "employee_analytics",
+                                     local_infile_dir=processed_dir if bulk else None)
     if not conn: raise ConnectionError("DB Connection Failed")
 
     cursor = conn.cursor()
     cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
 
-    # Export & Load
-    tables_to_load = [k for k in data_dict.keys() if k != "raw_proj"]
+    insert_settings = {'rows_per_statement': PIPELINE_CONFIG['insert_rows_per_statement'],
+                       'rows_per_commit': PIPELINE_CONFIG['insert_rows_per_commit'],
+                       'max_packet_bytes': PIPELINE_CONFIG['max_packet_bytes']}
+
+    # Export & Load (the bulk path loads the exported file itself)
+    failed = []
     for table in tables_to_load:
         df = data_dict[table]
-        load.export_to_csv(df, f"{table}.csv")
-        load.insert_data(conn, df, table)
+        try:
+            csv_path = export_table(df, table)
+            load.create_table(conn, table)
+            method, rows_per_second = load.load_table(conn, df, table, csv_path, PIPELINE_CONFIG['load_method'],
+                                                      insert_settings)
+        except load.Error as err:
+            logger.error(f"Failed to load {table}: {err}")
+            failed.append(table)
+            continue
+        logger.info(f"Loaded {table}: {len(df)} rows ({method}, {rows_per_second:,.0f} rows/s)")
+    if failed:
+        logger.warning(f"Not loaded (retried by the next run): {failed}")
 
     cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
     
@@ -171,10 +525,70 @@ def run_loading(data_dict):
     load.create_index(conn, "dim_employees", "department_id")
     load.create_index(conn, "fact_performance_reviews", "employee_id")
     load.create_index(conn, "fact_project_assignments", "employee_id")
+    load.create_index(conn, "fact_over_allocation", "employee_id")
+    load.create_index(conn, "summary_review_cube", "grouping_id")
 
     conn.close()
     duration = time.time() - start
     logger.info(f"Loading completed in {duration:.2f}s")
+    return duration, {t: digest for t, digest in output_hashes.items() if t not in failed}
+
+def run_delta_refresh(delta_dir):
+    """ Intraday refresh: applies a delta feed to the saved summary state and reloads only the affected rows """
+    logger.info(">>> DELTA REFRESH STARTED")
+    start = time.time()
+
+    as_of = configured_as_of()
+    previous = manifest.load_manifest(manifest_path)
+    state = incremental.load_state(summary_state_path)
+    if state is not None and state.as_of != as_of:
+        # A state from an earlier date still holds when the department summary is the same on both dates
+        if manifest.as_of_unchanged(previous, 'summary_dept_metrics', as_of, since=state.as_of):
+            state.as_of = as_of
+        else:
+            state = None
+    if state is None:
+        raise RuntimeError(f"No summary state for {as_of}; run the full pipeline first")
+
+    deltas = incremental.read_delta_feed(delta_dir)
+    if not deltas:
+        logger.info(f"No delta files in {delta_dir}")
+        return time.time() - start
+    affected = state.apply(deltas)
+    logger.info(f"Delta rows: { {t: len(df) for t, df in deltas.items()} }, affected "
+                f"{len(affected['departments'])} departments and {len(affected['employees'])} employees")
+
+    conn = load.create_db_connection("localhost", "root", "root", "employee_analytics")
+    if not conn: raise ConnectionError("DB Connection Failed")
+    key_columns = {'summary_dept_metrics': ('department_id', affected['departments']),
+                   'summary_emp_performance': ('employee_id', affected['employees'])}
+    try:
+        for table, (key, keys) in key_columns.items():
+            df = state.summaries[table]
+            load.export_to_csv(df, f"{table}.csv")
+            load.upsert_rows(conn, df[df[key].isin(keys)], table, key, keys)
+    finally:
+        conn.close()
+
+    # Only a refresh that reached the database is kept: a failed one can be rerun with the same feed
+    incremental.save_state(state, summary_state_path)
+
+    # The next pipeline run compares against what is loaded now (hashed as a full run hashes its tables)
+    if previous:
+        refreshed = {t: state.summaries[t] for t in key_columns}
+        if PIPELINE_CONFIG['compact_tables']:
+            refreshed, _ = transform.compact_tables(refreshed)
+        outputs = dict(previous['outputs'])
+        outputs.update({t: manifest.table_hash(df) for t, df in refreshed.items()})
+        # The delta may have added hire / project dates
+        end = transform.as_of_horizons(as_of, state.tables['employees'], state.tables['projects'])['summary_dept_metrics']
+        ranges = dict(previous.get('as_of_ranges', {}))
+        ranges['summary_dept_metrics'] = [as_of, None if end is None else end.strftime('%Y-%m-%d')]
+        manifest.save_manifest(manifest_path, previous['inputs'], previous['as_of'], outputs, previous['volume_stats'],
+                               previous.get('snapshot_dates'), ranges)
+
+    duration = time.time() - start
+    logger.info(f"Delta refresh completed in {duration:.2f}s")
     return duration
 
 # ==========================================
@@ -182,6 +596,18 @@ def run_loading(data_dict):
 # ==========================================
 
 if __name__ == "__main__":
+    # `python main.py --delta <dir>`: refresh the summaries from a delta feed instead of a full run
+    if len(sys.argv) == 3 and sys.argv[1] == '--delta':
+        try:
+            run_delta_refresh(sys.argv[2])
+        except Exception as e:
+            logger.critical(f"DELTA REFRESH FAILED: {e}")
+            sys.exit(1)
+        sys.exit(0)
+    # `python main.py --as-of <YYYY-MM-DD>`: full run as of a past date
+    if len(sys.argv) == 3 and sys.argv[1] == '--as-of':
+        PIPELINE_CONFIG['as_of'] = pd.Timestamp(sys.argv[2]).strftime('%Y-%m-%d')
+
     total_start = time.time()
     logger.info("=== ETL PIPELINE STARTED ===")
     
@@ -194,26 +620,45 @@ if __name__ == "__main__":
     
     try:
         # 1. Extract
-        raw_path, dur_ext, volume_stats = run_extraction()
+        frame_cache, dur_ext, volume_stats, run_plan = run_extraction()
         exec_stats["phases"]["Extraction"] = dur_ext
         
         # 2. Transform
-        processed_data, dur_trans = run_transformation(raw_path, volume_stats)
+        processed_data, dur_trans, key_index, hierarchy = run_transformation(frame_cache, volume_stats, run_plan['as_of'],
+                                                                  snapshot_dates=run_plan['snapshot_dates'])
         exec_stats["phases"]["Transformation"] = dur_trans
         
         # 3. Validate
-        dq_stats, dur_val = run_validation(processed_data)
+        sink = quarantine.QuarantineSink(quarantine_path) if PIPELINE_CONFIG['quarantine'] else None
+        dq_stats, dur_val, failed_rows = run_validation(processed_data, key_index, hierarchy, sink)
         exec_stats["phases"]["Validation"] = dur_val
         
+        profile_alerts = None
+        if PIPELINE_CONFIG['profiling']:
+            profile_alerts, dur_prof = run_profiling(processed_data)
+            exec_stats["phases"]["Profiling"] = dur_prof
+        
         # 4. Load
-        dur_load = run_loading(processed_data)
+        load_data = processed_data
+        if PIPELINE_CONFIG['load_clean_rows_only']:
+            load_data = {t: quarantine.clean_rows(df, failed_rows[t]) if t in failed_rows else df
+                         for t, df in processed_data.items()}
+        dur_load, output_hashes = run_loading(load_data, run_plan)
         exec_stats["phases"]["Loading"] = dur_load
         
+        # Remember what this run saw and produced, for the next incremental run
+        if PIPELINE_CONFIG['incremental']:
+            # Tables this run tried to load but could not lose their old hash as well
+            outputs = {t: digest for t, digest in run_plan['previous'].get('outputs', {}).items() if t not in load_data}
+            outputs.update(output_hashes)
+            manifest.save_manifest(run_plan['manifest_path'], run_plan['inputs'], run_plan['as_of'], outputs, volume_stats,
+                                   run_plan['snapshot_dates'], as_of_ranges(processed_data, run_plan))
+        
         # 5. Generate Report
         exec_stats["end_time"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         exec_stats["total_duration"] = round(time.time() - total_start, 2)
         
-        reporting.generate_summary_report(exec_stats, volume_stats, dq_stats, processed_data)
+        reporting.generate_summary_report(exec_stats, volume_stats, dq_stats, processed_data, profile_alerts)
         
         logger.info("=== ETL PIPELINE COMPLETED ===")
         
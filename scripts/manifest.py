@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from datetime import datetime
+
+import extract
+
+# ==========================================
+#      DEPENDENCIES BETWEEN INPUTS & OUTPUTS
+# ==========================================
+
+# Raw inputs each output table is built from.
+# '@as_of' stands for the reference date: tenure and "active project" figures change with it, but
+# only on some dates, so a new date only counts for a table outside its saved as-of range.
+# '@snapshot_dates' stands for the configured snapshot dates (the snapshot table is only built with some).
+TABLE_INPUTS = {
+    'dim_departments': ['departments'],
+    'dim_employees': ['employees', '@as_of'],
+    'fact_performance_reviews': ['performance_reviews'],
+    'fact_project_assignments': ['project_assignments'],
+    'summary_dept_metrics': ['employees', 'projects', 'departments', '@as_of'],
+    'summary_emp_performance': ['employees', 'performance_reviews', 'departments'],
+    'fact_over_allocation': ['project_assignments'],
+    'summary_emp_allocation': ['project_assignments'],
+    'summary_manager_rollup': ['employees', 'performance_reviews', 'project_assignments', '@as_of'],
+    'summary_review_cube': ['employees', 'performance_reviews'],
+    'summary_dept_snapshots': ['employees', 'projects', 'project_assignments', 'departments', '@snapshot_dates'],
+}
+
+# Extra inputs needed to validate an output (foreign key parents)
+VALIDATION_INPUTS = {
+    'dim_employees': ['departments'],
+    'fact_performance_reviews': ['employees'],
+    'fact_project_assignments': ['projects', 'employees'],
+}
+
+MANIFEST_VERSION = 1
+
+# ==========================================
+#      FINGERPRINTS
+# ==========================================
+
+def fingerprint_inputs(raw_dir, cache_dir=None):
+    """ Size, mtime and content hash of every expected raw file """
+    fingerprints = {}
+    for file_name in extract.EXPECTED_FILES:
+        path = os.path.join(raw_dir, file_name)
+        if not os.path.exists(path):
+            continue
+        stat = os.stat(path)
+        fingerprints[file_name.replace('.csv', '')] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': extract.file_fingerprint(path, cache_dir),
+        }
+    return fingerprints
+
+def table_hash(df):
+    """ Hash of a table's column names, dtypes and row values (row order matters) """
+    digest = hashlib.sha256()
+    digest.update("|".join(f"{c}:{t}" for c, t in df.dtypes.astype(str).items()).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+# ==========================================
+#      MANIFEST FILE
+# ==========================================
+
+def load_manifest(path):
+    """ Previous run's manifest, or an empty one if missing/unreadable/outdated """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+def save_manifest(path, inputs, as_of, outputs, volume_stats, snapshot_dates=None, as_of_ranges=None):
+    """ as_of_ranges: {table: [first date, end date or None]} over which the loaded table stays the same """
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'saved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'as_of': as_of,
+        'as_of_ranges': as_of_ranges or {},
+        'snapshot_dates': list(snapshot_dates or []),
+        'inputs': inputs,
+        'outputs': outputs,
+        'volume_stats': volume_stats,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+# ==========================================
+#      RUN PLANNING
+# ==========================================
+
+def as_of_unchanged(previous, table, as_of, since=None):
+    """
+    True when the table as built for `since` (default: the previous run's as-of date) is the same
+    as of as_of: both dates fall in the table's saved as-of range (end date excluded).
+    """
+    since = previous.get('as_of') if since is None else since
+    if since == as_of:
+        return True
+    first, end = previous.get('as_of_ranges', {}).get(table, (None, None))
+    if first is None:
+        return False
+    dates = [pd.Timestamp(since), pd.Timestamp(as_of)]
+    return all(pd.Timestamp(first) <= d and (end is None or d < pd.Timestamp(end)) for d in dates)
+
+def plan_run(previous, inputs, as_of, processed_dir=None, snapshot_dates=None):
+    """
+    Decides what this run has to do, given the previous manifest.
+    summary_dept_snapshots is only planned when snapshot_dates are given.
+
+    Returns a dict with:
+      - changed_inputs: raw tables whose content hash differs (plus '@as_of' / '@snapshot_dates' if they moved)
+      - stale_tables: outputs depending on a changed input (for '@as_of': a date outside the table's
+        as-of range, as_of_unchanged), or never produced
+      - read_inputs: raw tables to extract (to rebuild and validate the stale outputs)
+    An empty previous manifest means a full run.
+    """
+    old_inputs = previous.get('inputs', {})
+    changed = {name for name, fp in inputs.items()
+               if old_inputs.get(name, {}).get('sha256') != fp['sha256']}
+    if previous.get('as_of') != as_of:
+        changed.add('@as_of')
+    if previous.get('snapshot_dates', []) != list(snapshot_dates or []):
+        changed.add('@snapshot_dates')
+
+    old_outputs = previous.get('outputs', {})
+    stale = []
+    for table, deps in TABLE_INPUTS.items():
+        if table == 'summary_dept_snapshots' and not snapshot_dates:
+            continue
+        missing_file = processed_dir is not None and \
+            not os.path.exists(os.path.join(processed_dir, f"{table}.csv"))
+        date_moved = '@as_of' in deps and not as_of_unchanged(previous, table, as_of)
+        if table not in old_outputs or missing_file or changed.intersection(deps).difference(['@as_of']) \
+                or date_moved:
+            stale.append(table)
+
+    read_inputs = set()
+    for table in stale:
+        read_inputs.update(d for d in TABLE_INPUTS[table] if not d.startswith('@'))
+        read_inputs.update(VALIDATION_INPUTS.get(table, []))
+
+    return {
+        'changed_inputs': sorted(changed),
+        'stale_tables': stale,
+        'read_inputs': [name for name in inputs if name in read_inputs],
+    }
+
+def tables_to_reload(previous, output_hashes):
+    """ Built tables whose content differs from what the previous run loaded """
+    old_outputs = previous.get('outputs', {})
+    return [table for table, digest in output_hashes.items() if old_outputs.get(table) != digest]
@@ -0,0 +1,325 @@
+import os
+import glob
+import json
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# ==========================================
+#      PROFILE SETTINGS
+# ==========================================
+
+# Columns with quantiles / top categories (in any profiled table that has them)
+QUANTILE_COLUMNS = ['salary', 'rating', 'allocation_percentage', 'budget']
+CATEGORY_COLUMNS = ['status', 'role', 'performance_category', 'salary_bucket']
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+TOP_CATEGORIES = 5
+
+# A column drifts when, against the previous run's profile:
+DRIFT_THRESHOLDS = {
+    'rows': 0.5,          # row count changes by more than 50%
+    'null_rate': 0.05,    # null rate moves by more than 5 points
+    'distinct': 0.25,     # distinct count changes by more than 25%
+    'quantile': 0.10,     # the median or the 95th percentile moves by more than 10%
+    'category_share': 0.10,  # a top category's share of the rows moves by more than 10 points
+}
+
+# Saved profiles kept in the profile directory (the newest; older ones are deleted)
+KEEP_PROFILES = 10
+
+# ==========================================
+#      SKETCHES
+# ==========================================
+
+def _hashes(values):
+    """ 64-bit hashes of the non-missing values of a Series """
+    return pd.util.hash_pandas_object(values.dropna(), index=False).to_numpy()
+
+def _bit_length(values):
+    """ Bit length of every uint64 (exact: each 32-bit half converts to float64 without rounding) """
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+class HyperLogLog:
+    """
+    Distinct count in 2**p one-byte registers (p=12: 4 KB, about 1.6% error).
+    Register i keeps the longest run of leading zeros seen among the hashes starting with i.
+    Two sketches merge by taking the register-wise maximum.
+    """
+
+    def __init__(self, p=12):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        rest_bits = 64 - self.p
+        buckets = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        ranks = (rest_bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        empty = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and empty:
+            estimate = m * np.log(m / empty)  # small counts: linear counting
+        return int(round(estimate))
+
+class QuantileSketch:
+    """
+    KLL-style quantile sketch. Level h holds sampled values that each stand for 2**h rows.
+    A level over its capacity is sorted and every other value (random offset) moves up a level,
+    so memory stays around 3k values whatever the row count; rank error is about 1/k.
+    Sketches of different chunks merge level by level.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        return max(int(np.ceil(self.k * (2 / 3) ** (len(self.levels) - 1 - level))), 8)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, values in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compact()
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            values = np.sort(self.levels[level])
+            kept = values[:len(values) % 2]  # an odd value out stays on this level
+            pairs = values[len(kept):]
+            self.levels[level] = kept
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], pairs[self._rng.integers(2)::2]])
+            level = 0  # capacities shrink as the sketch grows a level
+
+    def quantiles(self, qs):
+        if self.n == 0:
+            return [None] * len(qs)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(v), 2.0 ** h) for h, v in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, cumulative = values[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1], side='left')
+        result = values[np.minimum(positions, len(values) - 1)]
+        # The extremes are known exactly
+        return [float(self.min) if q <= 0 else float(self.max) if q >= 1 else float(v) for q, v in zip(qs, result)]
+
+class CountMinSketch:
+    """
+    Approximate counts per value in depth x width counters (never under the true count; over it
+    by at most 2/width of the rows with probability 1 - 2**-depth). Merges by adding the tables.
+    """
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _cells(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        low = hashes & np.uint64(0xFFFFFFFF)
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.table.shape[0], dtype=np.uint64)
+        return ((low[None, :] + rows[:, None] * high[None, :]) % np.uint64(self.width)).astype(np.intp)
+
+    def add(self, hashes, counts):
+        cells = self._cells(hashes)
+        for row in range(self.table.shape[0]):
+            np.add.at(self.table[row], cells[row], counts)
+
+    def estimate(self, hashes):
+        cells = self._cells(hashes)
+        return np.min([self.table[row, cells[row]] for row in range(self.table.shape[0])], axis=0)
+
+    def merge(self, other):
+        self.table += other.table
+
+def _value_hashes(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+# ==========================================
+#      COLUMN & TABLE PROFILES
+# ==========================================
+
+class ColumnProfile:
+    """ Rows, nulls and distinct values of one column; quantiles and top categories when asked for """
+
+    def __init__(self, quantiles=False, categories=False):
+        self.rows = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        self.quantile_sketch = QuantileSketch() if quantiles else None
+        self.category_counts = CountMinSketch() if categories else None
+        self.candidates = []  # likely top categories (as text), re-ranked with every chunk
+
+    def update(self, values):
+        self.rows += len(values)
+        self.nulls += int(values.isna().sum())
+        self.distinct.add(_hashes(values))
+        if self.quantile_sketch is not None:
+            self.quantile_sketch.add(pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan))
+        if self.category_counts is not None:
+            counts = values.dropna().astype(str).value_counts()
+            self.category_counts.add(_value_hashes(counts.index), counts.to_numpy())
+            self._rank_candidates(list(counts.index[:2 * TOP_CATEGORIES]))
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        if self.quantile_sketch is not None:
+            self.quantile_sketch.merge(other.quantile_sketch)
+        if self.category_counts is not None:
+            self.category_counts.merge(other.category_counts)
+            self._rank_candidates(other.candidates)
+
+    def _rank_candidates(self, new_values):
+        candidates = list(dict.fromkeys(self.candidates + list(new_values)))
+        if candidates:
+            estimates = self.category_counts.estimate(_value_hashes(candidates))
+            order = np.argsort(-estimates, kind='stable')[:2 * TOP_CATEGORIES]
+            candidates = [candidates[i] for i in order]
+        self.candidates = candidates
+
+    def summary(self):
+        result = {
+            'rows': self.rows,
+            'null_rate': self.nulls / self.rows if self.rows else 0.0,
+            'distinct': self.distinct.count() if self.rows > self.nulls else 0,
+        }
+        if self.quantile_sketch is not None:
+            result['quantiles'] = dict(zip([f"p{round(q * 100):02d}" for q in QUANTILES],
+                                           self.quantile_sketch.quantiles(QUANTILES)))
+        if self.category_counts is not None and self.candidates:
+            estimates = self.category_counts.estimate(_value_hashes(self.candidates))
+            result['top'] = [[value, int(count)] for value, count in zip(self.candidates, estimates)][:TOP_CATEGORIES]
+        return result
+
+class TableProfile:
+    """ Column profiles of one table, built chunk by chunk (update) or from the profiles of parts (merge) """
+
+    def __init__(self):
+        self.columns = {}
+
+    def update(self, chunk):
+        for name, values in chunk.items():
+            if name not in self.columns:
+                self.columns[name] = ColumnProfile(quantiles=name in QUANTILE_COLUMNS,
+                                                   categories=name in CATEGORY_COLUMNS)
+            self.columns[name].update(values)
+        return self
+
+    def merge(self, other):
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        return self
+
+    def summary(self):
+        return {name: column.summary() for name, column in self.columns.items()}
+
+def profile_chunks(chunks):
+    """ Profile of a table read chunk by chunk (e.g. extract.stream_table) """
+    profile = TableProfile()
+    for chunk in chunks:
+        profile.update(chunk)
+    return profile
+
+def profile_frame(df, chunk_rows=100_000):
+    """ Profile of an in-memory table, sketched chunk_rows rows at a time """
+    return profile_chunks(df.iloc[i:i + chunk_rows] for i in range(0, max(len(df), 1), chunk_rows))
+
+# ==========================================
+#      PERSISTENCE & DRIFT
+# ==========================================
+
+def save_profile(profile_dir, summaries, run_time=None, keep=KEEP_PROFILES):
+    """
+    Writes one run's profile summaries ({table: {column: summary}}) as profile_<run time>.json
+    and deletes all but the newest `keep` profiles.
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    run_time = run_time or datetime.now()
+    path = os.path.join(profile_dir, f"profile_{run_time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump({'run_time': run_time.strftime('%Y-%m-%d %H:%M:%S'), 'tables': summaries}, f, indent=2)
+    for old in sorted(glob.glob(os.path.join(profile_dir, 'profile_*.json')))[:-max(keep, 1)]:
+        os.remove(old)
+    return path
+
+def load_latest_profile(profile_dir):
+    """ The tables of the most recent saved profile ({} when there is none) """
+    paths = sorted(glob.glob(os.path.join(profile_dir, 'profile_*.json')))
+    if not paths:
+        return {}
+    with open(paths[-1]) as f:
+        return json.load(f)['tables']
+
+def _relative_change(old, new):
+    if old is None or new is None:
+        return 0.0
+    if old == 0:
+        return 0.0 if new == 0 else float('inf')
+    return abs(new - old) / abs(old)
+
+def drift_alerts(previous, current, thresholds=DRIFT_THRESHOLDS):
+    """ Drift messages for the columns of `current` that also are in `previous` (both {table: {column: summary}}) """
+    alerts = []
+    for table, columns in current.items():
+        for column, now in columns.items():
+            before = previous.get(table, {}).get(column)
+            if before is None:
+                continue
+            name = f"[{table}.{column}]"
+            if _relative_change(before['rows'], now['rows']) > thresholds['rows']:
+                alerts.append(f"{name} row count {before['rows']} -> {now['rows']}")
+            if abs(now['null_rate'] - before['null_rate']) > thresholds['null_rate']:
+                alerts.append(f"{name} null rate {before['null_rate']:.1%} -> {now['null_rate']:.1%}")
+            if _relative_change(before['distinct'], now['distinct']) > thresholds['distinct']:
+                alerts.append(f"{name} distinct values ~{before['distinct']} -> ~{now['distinct']}")
+            for q in ['p50', 'p95']:
+                old, new = before.get('quantiles', {}).get(q), now.get('quantiles', {}).get(q)
+                if _relative_change(old, new) > thresholds['quantile']:
+                    alerts.append(f"{name} {q} {old:,.2f} -> {new:,.2f}")
+            if 'top' in now and 'top' in before:
+                old_share = {v: c / max(before['rows'], 1) for v, c in before['top']}
+                for value, count in now['top']:
+                    share = count / max(now['rows'], 1)
+                    if abs(share - old_share.get(value, 0.0)) > thresholds['category_share']:
+                        alerts.append(f"{name} share of '{value}' {old_share.get(value, 0.0):.1%} -> {share:.1%}")
+    return alerts
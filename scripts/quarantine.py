@@ -0,0 +1,122 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+import validation
+
+# ==========================================
+#      QUARANTINE RECORDS
+# ==========================================
+
+# One line per (row, failed rule)
+QUARANTINE_COLUMNS = ['quarantined_at', 'table', 'rule_id', 'row_key', 'value', 'reason']
+
+def rule_reason(rule):
+    """ Why a row fails a declared rule, in words (from the rule definition) """
+    column = rule['column']
+    kind = rule['kind']
+    if kind == 'not_null':
+        reason = f"{column} is missing"
+    elif kind == 'unique':
+        reason = f"duplicate {column}"
+    elif kind == 'in_set':
+        reason = f"{column} is not one of {rule['values']}"
+    elif kind == 'range':
+        low = ('[' if rule.get('min_inclusive', True) else '(') + str(rule.get('min', '-inf'))
+        high = str(rule.get('max', 'inf')) + (']' if rule.get('max_inclusive', True) else ')')
+        reason = f"{column} outside {low}, {high}"
+    elif kind == 'foreign_key':
+        reason = f"{column} not found in {rule['parent']}.{rule['parent_column']}"
+    else:
+        reason = rule['id']
+    conditions = ', '.join(f"{col} = {value}" for col, value in rule.get('when', {}).items())
+    return f"{reason} (where {conditions})" if conditions else reason
+
+def _row_keys(df, key_columns):
+    """ Row key text per row: the key column value(s), joined with '|' for composite keys; the row label otherwise """
+    key_columns = [c for c in key_columns if c in df.columns]
+    if not key_columns:
+        return pd.Series(df.index.astype(str), index=df.index)
+    keys = df[key_columns[0]].astype(str)
+    for col in key_columns[1:]:
+        keys = keys + '|' + df[col].astype(str)
+    return keys
+
+def quarantine_records(table_name, df, failed_rows, rules=None, key_columns=None, quarantined_at=None):
+    """
+    The failing rows of one validated table as quarantine records (QUARANTINE_COLUMNS).
+    failed_rows: the boolean frame from validation.evaluate_rules (one column per rule id).
+    key_columns: columns identifying a row (default validation.TABLE_KEYS[table_name]).
+    """
+    rules = {r['id']: r for r in (validation.TABLE_RULES.get(table_name, []) if rules is None else rules)}
+    key_columns = validation.TABLE_KEYS.get(table_name, []) if key_columns is None else key_columns
+    rows, rule_numbers = np.nonzero(failed_rows.to_numpy(dtype=bool))
+    if len(rows) == 0:
+        return pd.DataFrame(columns=QUARANTINE_COLUMNS)
+
+    rule_ids = failed_rows.columns.to_numpy()[rule_numbers]
+    columns = [rules[r]['column'] if r in rules else None for r in rule_ids]
+    values = [df[col].iloc[row] if col in df.columns else None for row, col in zip(rows, columns)]
+    return pd.DataFrame({
+        'quarantined_at': quarantined_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'table': table_name,
+        'rule_id': rule_ids,
+        'row_key': _row_keys(df, key_columns).to_numpy()[rows],
+        'value': ['' if pd.isna(v) else str(v) for v in values],
+        'reason': [rule_reason(rules[r]) if r in rules else r for r in rule_ids],
+    }, columns=QUARANTINE_COLUMNS)
+
+def clean_rows(df, failed_rows):
+    """ The rows of df that passed every rule """
+    if failed_rows.shape[1] == 0:
+        return df
+    return df[~failed_rows.to_numpy(dtype=bool).any(axis=1)]
+
+# ==========================================
+#      QUARANTINE SINK
+# ==========================================
+
+class QuarantineSink:
+    """
+    Append-only CSV of quarantined rows (data/quarantine/quarantine.csv in the pipeline).
+    Every write appends (the header only goes into a new file), so whole tables and the
+    chunks of a streamed table can be written as they are validated. Writes are serialized,
+    so concurrent validations can share one sink.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.quarantined_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def write(self, table_name, df, failed_rows, rules=None, key_columns=None):
+        """ Appends the failing rows of df; returns the number of records written """
+        records = quarantine_records(table_name, df, failed_rows, rules, key_columns, self.quarantined_at)
+        if records.empty:
+            return 0
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            records.to_csv(self.path, mode='a', header=new_file, index=False)
+            self.counts[table_name] = self.counts.get(table_name, 0) + len(records)
+        return len(records)
+
+    def read(self):
+        """ Everything quarantined so far (all runs) """
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=QUARANTINE_COLUMNS)
+        return pd.read_csv(self.path, dtype=str, keep_default_na=False)
+
+def validate_chunks(table_name, chunks, sink, parents=None, key_index=None):
+    """
+    Validates a table chunk by chunk (e.g. extract.stream_table), quarantining the failing rows
+    of each chunk as it goes; yields the clean rows of every chunk.
+    Note: 'unique' rules only see duplicates within a chunk.
+    """
+    for chunk in chunks:
+        _, _, failed_rows = validation.evaluate_rules(table_name, chunk, parents, key_index)
+        sink.write(table_name, chunk, failed_rows)
+        yield clean_rows(chunk, failed_rows)
@@ -2,9 +2,12 @@ import os
 import pandas as pd
 from datetime import datetime
 
-def generate_summary_report(exec_stats, volume_stats, dq_stats, data_dfs):
+import transform
+
+def generate_summary_report(exec_stats, volume_stats, dq_stats, data_dfs, profile_alerts=None):
     """
     Generates a text report in reports/etl_summary_report.txt
+    profile_alerts: drift alerts of the profiling stage (None = profiling did not run)
     """
     # 1. Setup Output Path
     base_dir = os.path.dirname(os.path.dirname(__file__))
@@ -58,6 +61,14 @@ def generate_summary_report(exec_stats, volume_stats, dq_stats, data_dfs):
     lines.append(f"Total Checks Performed: {dq_stats.get('total_checks', 0)}")
     lines.append(f"Passed: {dq_stats.get('passed', 0)}")
     lines.append(f"Failed/Issues: {dq_stats.get('failed', 0)}")
+    if dq_stats.get('quarantined'):
+        lines.append(f"Quarantine Records: {sum(dq_stats['quarantined'].values())} {dq_stats['quarantined']}")
+    
+    # Per-rule row counts and timings, most expensive rules first
+    if dq_stats.get('rules'):
+        lines.append(f"\n{'Rule':<38} | {'Checked':<8} | {'Failed':<7} | {'ms':<7}")
+        for rule in sorted(dq_stats['rules'], key=lambda r: r['seconds'], reverse=True):
+            lines.append(f"{rule['rule']:<38} | {rule['checked']:<8} | {rule['failed']:<7} | {rule['seconds'] * 1000:<7.2f}")
     
     if dq_stats.get('critical_issues'):
         lines.append("\nCritical Issues Found:")
@@ -65,6 +76,14 @@ def generate_summary_report(exec_stats, volume_stats, dq_stats, data_dfs):
             lines.append(f"  [!] {issue}")
     else:
         lines.append("\nNo Critical Issues Found.")
+    
+    if profile_alerts is not None:
+        if profile_alerts:
+            lines.append("\nProfile Drift Alerts (vs previous run):")
+            for alert in profile_alerts:
+                lines.append(f"  [~] {alert}")
+        else:
+            lines.append("\nNo Profile Drift Against the Previous Run.")
     lines.append("\n")
 
     # ---------------------------------------
@@ -79,6 +98,8 @@ def generate_summary_report(exec_stats, volume_stats, dq_stats, data_dfs):
     dim_emp = data_dfs.get('dim_employees', pd.DataFrame())
     # Note: 'raw_proj' was passed in data_dfs in main.py, helpful for duration
     raw_proj = data_dfs.get('raw_proj', pd.DataFrame()) 
+    emp_alloc = data_dfs.get('summary_emp_allocation', pd.DataFrame())
+    review_cube = data_dfs.get('summary_review_cube', pd.DataFrame())
 
     try:
         # Insight A: Department with Highest Avg Salary
@@ -109,6 +130,18 @@ def generate_summary_report(exec_stats, volume_stats, dq_stats, data_dfs):
             avg_dur = raw_proj['project_duration_days'].mean()
             lines.append(f"Avg Project Duration:      {avg_dur:.1f} days")
 
+        # Insight F: Over-allocated Employees (overlapping assignments above 100%)
+        if not emp_alloc.empty and 'over_allocated_periods' in emp_alloc.columns:
+            over = emp_alloc[emp_alloc['over_allocated_periods'] > 0]
+            lines.append(f"Over-allocated Employees:  {len(over)} (peak {emp_alloc['peak_allocation'].max():.0f}%)")
+
+        # Insight G: Best-rated Salary Bucket (read from the review cube, not the review facts)
+        if not review_cube.empty and 'grouping_id' in review_cube.columns:
+            buckets = transform.cube_level(review_cube, ['salary_bucket']).dropna(subset=['salary_bucket'])
+            if not buckets.empty:
+                best = buckets.sort_values('avg_rating', ascending=False).iloc[0]
+                lines.append(f"Best-rated Salary Bucket:  {best['salary_bucket']} (avg rating {best['avg_rating']:.2f})")
+
     except Exception as e:
         lines.append(f"Could not calculate all insights: {e}")
 
@@ -0,0 +1,98 @@
+import pandas as pd
+
+# ==========================================
+#      RAW TABLE SCHEMAS
+# ==========================================
+
+# Bump when a schema changes, so typed copies cached from the old schema are rebuilt
+SCHEMA_VERSION = 1
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# Per raw table: explicit column types (nullable ints for ids and counts, categoricals for
+# low-cardinality labels) and the date columns with their format.
+# Columns not listed here are left to pandas' type inference.
+TABLE_SCHEMAS = {
+    'departments': {
+        'dtypes': {
+            'department_id': 'Int64',
+            'department_name': 'str',
+            'location': 'category',
+            'budget': 'float64',
+            'manager_id': 'Int64',
+        },
+        'dates': {},
+    },
+    'employees': {
+        'dtypes': {
+            'employee_id': 'Int64',
+            'name': 'str',
+            'department_id': 'Int64',
+            'salary': 'Int64',
+            'manager_id': 'Int64',
+            'bonus_eligible': 'str',
+            'status': 'category',
+        },
+        'dates': {'hire_date': DATE_FORMAT},
+    },
+    'performance_reviews': {
+        'dtypes': {
+            'review_id': 'Int64',
+            'employee_id': 'Int64',
+            'rating': 'float64',
+            'reviewer_id': 'Int64',
+        },
+        'dates': {'review_date': DATE_FORMAT},
+    },
+    'projects': {
+        'dtypes': {
+            'project_id': 'Int64',
+            'project_name': 'str',
+            'department_id': 'Int64',
+            'budget': 'float64',
+            'status': 'category',
+        },
+        'dates': {'start_date': DATE_FORMAT, 'end_date': DATE_FORMAT},
+    },
+    'project_assignments': {
+        'dtypes': {
+            'assignment_id': 'Int64',
+            'employee_id': 'Int64',
+            'project_id': 'Int64',
+            'role': 'category',
+            'allocation_percentage': 'Int64',
+        },
+        'dates': {'start_date': DATE_FORMAT, 'end_date': DATE_FORMAT},
+    },
+}
+
+# ==========================================
+#      HELPERS
+# ==========================================
+
+def read_csv_kwargs(table_name, header, usecols=None):
+    """
+    pd.read_csv arguments (dtype, parse_dates, date_format) for the columns of a raw table
+    that are actually present in the file header (and selected by usecols, if given).
+    """
+    table_schema = TABLE_SCHEMAS.get(table_name)
+    if table_schema is None:
+        return {}
+    present = [c for c in header if usecols is None or c in usecols]
+    dates = {c: fmt for c, fmt in table_schema['dates'].items() if c in present}
+    kwargs = {'dtype': {c: t for c, t in table_schema['dtypes'].items() if c in present}}
+    if dates:
+        kwargs['parse_dates'] = list(dates.keys())
+        kwargs['date_format'] = dates
+        kwargs['cache_dates'] = True
+    return kwargs
+
+def to_datetime(series, table_name):
+    """
+    Parses a date column with the format registered for it.
+    Columns already parsed at read time are returned as they are.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    fmt = TABLE_SCHEMAS.get(table_name, {}).get('dates', {}).get(series.name)
+    return pd.to_datetime(series, format=fmt, cache=True)
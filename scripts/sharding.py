@@ -0,0 +1,211 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+import transform
+
+# ==========================================
+#      FRAMES AS MEMORY-MAPPED COLUMNS
+# ==========================================
+
+# Frames cross the process boundary as one .npy file per column (plus a null mask or a
+# dictionary of distinct values where needed). Workers memory-map the files, so a large
+# table is written once and read by every worker without being pickled.
+_MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+def _save(directory, name, values):
+    path = os.path.join(directory, f"{name}.npy")
+    np.save(path, values, allow_pickle=False)
+    return path
+
+def _dictionary(values):
+    """ Distinct values as a fixed-width unicode array when they are all strings (memory-mappable) """
+    if all(isinstance(v, str) for v in values):
+        return np.asarray(values, dtype=str)
+    return None
+
+def write_frame(df, directory):
+    """ Writes df column by column into directory; returns the (small, picklable) spec to read it back """
+    os.makedirs(directory, exist_ok=True)
+    spec = {'index': _save(directory, '_index', df.index.to_numpy()), 'columns': []}
+    for i, (name, series) in enumerate(df.items()):
+        array = series.array
+        column = {'name': name, 'dtype': series.dtype}
+        if isinstance(array, _MASKED_ARRAYS):
+            column['kind'] = 'masked'
+            column['values'] = _save(directory, f"{i}_values", array.to_numpy(
+                dtype=series.dtype.numpy_dtype, na_value=series.dtype.numpy_dtype.type(0)))
+            column['mask'] = _save(directory, f"{i}_mask", array.isna())
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            column['kind'] = 'category'
+            column['codes'] = _save(directory, f"{i}_codes", series.cat.codes.to_numpy())
+        elif isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufmM':
+            column['kind'] = 'numpy'
+            column['values'] = _save(directory, f"{i}_values", series.to_numpy())
+        else:
+            # Strings and other objects: integer codes into the distinct values
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            dictionary = _dictionary(list(uniques))
+            column['kind'] = 'dictionary'
+            column['codes'] = _save(directory, f"{i}_codes", codes)
+            if dictionary is not None:
+                column['uniques'] = _save(directory, f"{i}_uniques", dictionary)
+            else:
+                column['uniques_list'] = list(uniques)
+        spec['columns'].append(column)
+    return spec
+
+def read_frame(spec, rows=None):
+    """ Rebuilds a frame written by write_frame (only the given row positions, if any) """
+    def load(path):
+        values = np.load(path, mmap_mode='r')
+        return np.asarray(values[rows]) if rows is not None else np.array(values)
+
+    index = load(spec['index'])
+    data = {}
+    for column in spec['columns']:
+        dtype = column['dtype']
+        if column['kind'] == 'masked':
+            data[column['name']] = pd.array(type(pd.array([], dtype=dtype))(load(column['values']), load(column['mask'])))
+        elif column['kind'] == 'category':
+            data[column['name']] = pd.Categorical.from_codes(load(column['codes']), dtype=dtype)
+        elif column['kind'] == 'numpy':
+            data[column['name']] = load(column['values'])
+        else:
+            uniques = np.load(column['uniques']) if 'uniques' in column else column['uniques_list']
+            uniques = pd.array(list(uniques), dtype=dtype) if len(uniques) else pd.array([], dtype=dtype)
+            data[column['name']] = pd.api.extensions.take(uniques, load(column['codes']), allow_fill=True)
+    return pd.DataFrame(data, index=pd.Index(index))
+
+# ==========================================
+#      SHARD ASSIGNMENT
+# ==========================================
+
+def assign_shards(emp_df, rev_df, proj_df, ass_df, dept_ids, n_shards):
+    """
+    Department -> shard, balancing the rows each department brings (employees, their reviews and
+    assignments, projects). Reviews and assignments follow their employee's department.
+    Departments without rows (dept_ids) still get a shard. Rows of unknown departments share one.
+    Returns {table: shard number per row} plus the department -> shard map.
+    """
+    emp_dept = emp_df['department_id'].fillna(-1).astype('int64').to_numpy()
+    first_dept = pd.Series(emp_dept, index=emp_df['employee_id'].to_numpy())
+    first_dept = first_dept[~first_dept.index.duplicated()]
+
+    def dept_of_employee(df):
+        return first_dept.reindex(df['employee_id'].to_numpy()).fillna(-1).astype('int64').to_numpy()
+
+    depts = {
+        'employees': emp_dept,
+        'performance_reviews': dept_of_employee(rev_df),
+        'projects': proj_df['department_id'].fillna(-1).astype('int64').to_numpy(),
+    }
+    if ass_df is not None:
+        depts['project_assignments'] = dept_of_employee(ass_df)
+
+    # Largest departments first, each to the currently lightest shard (ties by department id)
+    weights = pd.Series(np.concatenate(list(depts.values()))).value_counts()
+    weights = weights.reindex(weights.index.union(pd.Index(dept_ids)), fill_value=0)
+    weights = weights.sort_index().sort_values(ascending=False, kind='stable')
+    loads = [0] * n_shards
+    dept_shard = {}
+    for dept, weight in weights.items():
+        shard = loads.index(min(loads))
+        dept_shard[dept] = shard
+        loads[shard] += weight
+
+    shard_of = {table: pd.Series(d).map(dept_shard).to_numpy() for table, d in depts.items()}
+    return shard_of, dept_shard
+
+# ==========================================
+#      SHARD WORKER
+# ==========================================
+
+def _transform_shard(shard, specs, row_files, out_dir, as_of):
+    """ Cleans and aggregates one shard (runs in a worker process); returns the specs of its outputs """
+    rows = {name: np.load(path) for name, path in row_files.items()}
+    emp = transform.clean_employee_data(read_frame(specs['employees'], rows['employees']), as_of=as_of)
+    rev = transform.clean_review_data(read_frame(specs['performance_reviews'], rows['performance_reviews']))
+    proj = transform.clean_project_data(read_frame(specs['projects'], rows['projects']), as_of=as_of)
+    all_depts = read_frame(specs['departments'])
+    dept = all_depts.iloc[rows['departments']]
+
+    outputs = {
+        'clean_employees': emp,
+        'clean_reviews': rev,
+        'clean_projects': proj,
+        # Summary rows keep the row labels of the departments / employees they describe
+        'summary_dept_metrics': transform.create_dept_summary(emp, proj, dept, as_of=as_of).set_axis(dept.index, axis=0),
+        'summary_emp_performance': transform.create_emp_performance(emp, rev, all_depts).set_axis(emp.index, axis=0),
+    }
+    if 'project_assignments' in specs:
+        outputs['clean_assignments'] = transform.clean_assignment_data(
+            read_frame(specs['project_assignments'], rows['project_assignments']))
+    return {name: write_frame(df, os.path.join(out_dir, f"shard{shard}", name)) for name, df in outputs.items()}
+
+# ==========================================
+#      SHARDED TRANSFORM
+# ==========================================
+
+def transform_sharded(emp_df, rev_df, proj_df, dept_df, ass_df=None, workers=None, as_of=None):
+    """
+    Cleans employees/reviews/projects/assignments and builds the department and employee
+    summaries in a process pool, one shard of departments per task.
+    dept_df is the cleaned departments table, as_of the reference date (None = today).
+    The results equal the single-process ones, rows in the same order. Returns {node name: DataFrame}.
+    """
+    workers = workers or os.cpu_count() or 1
+    n_shards = max(1, min(workers, dept_df['department_id'].nunique() + 1))
+    dept_ids = dept_df['department_id'].fillna(-1).astype('int64')
+    shard_of, dept_shard = assign_shards(emp_df, rev_df, proj_df, ass_df, dept_ids.to_numpy(), n_shards)
+    shard_of['departments'] = dept_ids.map(dept_shard).to_numpy()
+
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    work_dir = tempfile.mkdtemp(prefix='etl_shards_', dir=base)
+    try:
+        tables = {'employees': emp_df, 'performance_reviews': rev_df, 'projects': proj_df, 'departments': dept_df}
+        if ass_df is not None:
+            tables['project_assignments'] = ass_df
+        specs = {name: write_frame(df, os.path.join(work_dir, 'in', name)) for name, df in tables.items()}
+
+        # Row positions of every shard go to the workers as files as well
+        tasks = []
+        for shard in range(n_shards):
+            rows_dir = os.path.join(work_dir, 'rows', f"shard{shard}")
+            os.makedirs(rows_dir)
+            rows = {name: _save(rows_dir, name, np.flatnonzero(shard_of[name] == shard)) for name in tables}
+            tasks.append((shard, specs, rows, os.path.join(work_dir, 'out'), as_of))
+
+        # Called from a table graph worker thread: forking a multi-threaded process can copy
+        # held locks into the children, so workers start from a clean forkserver process
+        context = multiprocessing.get_context('forkserver')
+        with ProcessPoolExecutor(max_workers=min(workers, n_shards), mp_context=context) as pool:
+            shard_outputs = list(pool.map(_transform_shard, *zip(*tasks)))
+
+        # Shard order, then the single-process row order
+        results = {}
+        for name in shard_outputs[0]:
+            parts = [read_frame(out[name]) for out in shard_outputs]
+            combined = pd.concat(parts)
+            if name == 'clean_reviews':
+                combined = combined.sort_values(['employee_id', 'review_date'], kind='stable')
+            else:
+                combined = combined.sort_index(kind='stable')
+            if name.startswith('summary_'):
+                combined = combined.reset_index(drop=True)
+            results[name] = _restore_dtypes(combined, parts)
+        results['clean_departments'] = dept_df
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _restore_dtypes(combined, parts):
+    """ Categoricals from different shards concatenate to object; bring the category dtype back """
+    for col, dtype in parts[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not isinstance(combined[col].dtype, pd.CategoricalDtype):
+            combined[col] = combined[col].astype('category')
+    return combined
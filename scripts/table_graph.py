@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# ==========================================
+#      LAZY TABLE DEPENDENCY GRAPH
+# ==========================================
+
+class TableGraph:
+    """
+    Tables of a run declared as nodes with explicit inputs (raw -> clean -> dim/fact -> summary).
+
+    run() computes only the nodes the requested targets need, each once per run, submits
+    every node to a thread pool as soon as its inputs are ready (so independent branches
+    run concurrently) and drops intermediate results once no pending node reads them.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name, func, inputs=(), optional=()):
+        """
+        Declares a node: func(*inputs, *optional) -> value.
+        Optional inputs are passed when the run computes them anyway, otherwise None;
+        they never cause extra work.
+        """
+        if name in self.nodes:
+            raise ValueError(f"Node '{name}' is already declared")
+        self.nodes[name] = (func, list(inputs), list(optional))
+
+    # --- Planning ---
+
+    def buildable(self, name, sources, _memo=None):
+        """ True when name is a source or every required input can be built from the sources """
+        memo = {} if _memo is None else _memo
+        if name in sources:
+            return True
+        if name not in self.nodes:
+            return False
+        if name not in memo:
+            memo[name] = False  # guards against cycles
+            memo[name] = all(self.buildable(i, sources, memo) for i in self.nodes[name][1])
+        return memo[name]
+
+    def plan(self, targets, sources):
+        """
+        Nodes to compute for the buildable targets, with the inputs each one waits for.
+        Returns (targets that can be built, {node: [inputs in this plan]}).
+        """
+        memo = {}
+        targets = [t for t in targets if self.buildable(t, sources, memo)]
+
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in needed:
+                continue
+            needed.add(name)
+            if name not in sources:
+                stack.extend(self.nodes[name][1])
+
+        deps = {}
+        for name in needed:
+            if name in sources:
+                continue
+            _, inputs, optional = self.nodes[name]
+            deps[name] = list(dict.fromkeys(inputs + [o for o in optional if o in needed]))
+        return targets, deps
+
+    # --- Execution ---
+
+    def run(self, targets, sources, max_workers=None, on_result=None):
+        """
+        Computes the buildable targets from the given source values ({name: value}).
+        The run takes the sources over: the dict is emptied, so each source value is only held
+        until its last reader finishes (or, for a source the plan does not read, not at all).
+        on_result(name, value) is called as each node finishes. Returns {target: value}.
+        """
+        targets, deps = self.plan(targets, sources)
+        needed = set(targets).union(*deps.values())
+        results = {name: value for name, value in sources.items() if name in needed}
+        sources.clear()
+
+        waiting_on = {name: sum(1 for i in d if i not in results) for name, d in deps.items()}
+        readers = {}
+        for name, inputs in deps.items():
+            for i in inputs:
+                readers.setdefault(i, []).append(name)
+        pending_readers = {name: len(r) for name, r in readers.items()}
+
+        def call(name):
+            func, inputs, optional = self.nodes[name]
+            args = [results[i] for i in inputs] + [results.get(o) if o in deps[name] else None for o in optional]
+            return func(*args)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            running = {}
+            def submit_ready(names):
+                for name in names:
+                    if waiting_on[name] == 0:
+                        running[pool.submit(call, name)] = name
+
+            submit_ready(list(deps))
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    if on_result is not None:
+                        on_result(name, results[name])
+
+                    # Free inputs nobody else is waiting for
+                    for i in deps[name]:
+                        pending_readers[i] -= 1
+                        if pending_readers[i] == 0 and i not in targets:
+                            results.pop(i, None)
+
+                    for reader in readers.get(name, []):
+                        waiting_on[reader] -= 1
+                    submit_ready(readers.get(name, []))
+
+        return {t: results[t] for t in targets}
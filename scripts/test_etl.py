@@ -1,7 +1,24 @@
+import os
+import tempfile
 import unittest
 import pandas as pd
+import extract
 import transform
+import temporal
 import validation
+import load
+import manifest
+import features
+import incremental
+import sharding
+import integrity
+import quarantine
+import profiling
+from cache import FrameCache
+from key_index import KeyIndex, KeySpace
+from aggregates import PartialAggregate
+from table_graph import TableGraph
+from hierarchy import OrgHierarchy
 
 class TestETLPipeline(unittest.TestCase):
 
@@ -66,5 +83,699 @@ class TestETLPipeline(unittest.TestCase):
         self.assertEqual(hr_row['total_employees'], 1)
         self.assertEqual(hr_row['avg_salary'], 40000)
 
+        # Without an as-of date the summary is as of today: future hires and projects not started yet are left out
+        future = pd.Timestamp.today().normalize() + pd.Timedelta(days=365)
+        hired_later = clean_emp.assign(hire_date=[clean_emp['hire_date'].iloc[0], future])
+        projects = pd.DataFrame({'project_id': [7, 8], 'department_id': [101, 101], 'budget': [10.0, 20.0],
+                                 'start_date': pd.to_datetime(['2022-01-01', future]),
+                                 'end_date': pd.to_datetime([None, None])})
+        summary = transform.create_dept_summary(hired_later, projects, self.raw_depts).set_index('department_id')
+        self.assertEqual(summary['total_employees'].tolist(), [1, 0])
+        self.assertEqual((summary.loc[101, 'active_projects'], summary.loc[101, 'total_budget']), (1, 10.0))
+
+    def test_frame_cache_eviction(self):
+        """ Test if the run cache tracks memory and evicts after the last consumer """
+        cache = FrameCache(evict_after_use=True)
+        cache.put('employees', self.raw_employees, consumers=['transformation', 'validation'])
+        self.assertGreater(cache.total_bytes(), 0)
+
+        # Still needed by validation
+        cache.release('employees', 'transformation')
+        self.assertIn('employees', cache)
+
+        # Last consumer done -> dropped, but the peak is remembered
+        cache.release('employees', 'validation')
+        self.assertNotIn('employees', cache)
+        self.assertEqual(cache.total_bytes(), 0)
+        self.assertGreater(cache.memory_report()['_peak'], 0)
+
+    def test_chunked_extraction_matches_full_read(self):
+        """ Test if cleaning a streamed file chunk by chunk gives the same rows as a full read """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'employees.csv')
+            self.raw_employees.to_csv(path, index=False)
+
+            chunks = list(extract.stream_table(path, chunk_rows=2))
+            self.assertEqual([len(c) for c in chunks], [2, 1])
+
+            streamed = transform.concat_chunks(transform.clean_in_chunks('employees', chunks))
+            full = transform.clean_employee_data(extract.read_raw_csv(path))
+            # Each chunk infers its own categories; the concatenated frame is typed like the full read
+            pd.testing.assert_frame_equal(streamed, full)
+            # The streamed cleaners use the run's as-of date too
+            streamed = transform.concat_chunks(transform.clean_in_chunks('employees', chunks, as_of='2023-06-30'))
+            full = transform.clean_employee_data(extract.read_raw_csv(path), as_of='2023-06-30')
+            self.assertEqual(streamed['tenure_years'].tolist(), full['tenure_years'].tolist())
+            # Column projection, as in the pipeline's streamed extraction
+            columns = ['employee_id', 'hire_date']
+            projected = pd.concat(extract.stream_table(path, chunk_rows=2, columns=columns))
+            pd.testing.assert_frame_equal(projected, extract.read_raw_csv(path, usecols=columns))
+
+            # A byte budget is turned into a row count
+            self.assertGreaterEqual(extract.estimate_chunk_rows(path, chunk_bytes=10**6), 1)
+
+    def test_parallel_extraction(self):
+        """ Test if concurrent extraction returns the same tables as a sequential read """
+        with tempfile.TemporaryDirectory() as tmp:
+            self.raw_employees.to_csv(os.path.join(tmp, 'employees.csv'), index=False)
+            self.raw_depts.to_csv(os.path.join(tmp, 'departments.csv'), index=False)
+
+            parallel = extract.extract_data(tmp, max_workers=4)
+            sequential = extract.extract_data(tmp, max_workers=1)
+
+            # Missing files are reported and skipped, order follows the expected file list
+            self.assertEqual(list(parallel.keys()), ['departments', 'employees'])
+            for table in sequential:
+                pd.testing.assert_frame_equal(parallel[table], sequential[table])
+
+    @unittest.skipIf(extract.pq is None, "pyarrow not installed")
+    def test_columnar_cache_roundtrip(self):
+        """ Test if an unchanged CSV is served from its Parquet copy, with column projection """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'employees.csv')
+            cache_dir = os.path.join(tmp, 'cache')
+            self.raw_employees.to_csv(path, index=False)
+
+            first = extract.read_table(path, cache_dir)
+            cached_files = [f for f in os.listdir(cache_dir) if f.endswith('.parquet')]
+            self.assertEqual(len(cached_files), 1)
+
+            projected = extract.read_table(path, cache_dir, columns=['employee_id', 'salary'])
+            self.assertEqual(list(projected.columns), ['employee_id', 'salary'])
+            pd.testing.assert_frame_equal(projected, first[['employee_id', 'salary']])
+
+            # Changing the source invalidates the old copy
+            self.raw_employees.head(2).to_csv(path, index=False)
+            self.assertEqual(len(extract.read_table(path, cache_dir)), 2)
+            self.assertEqual(len([f for f in os.listdir(cache_dir) if f.endswith('.parquet')]), 1)
+
+    def test_manifest_plans_incremental_run(self):
+        """ Test if only tables depending on a changed input are rebuilt """
+        inputs = {t: {'size': 1, 'mtime_ns': 1, 'sha256': t} for t in
+                  ['departments', 'employees', 'performance_reviews', 'projects', 'project_assignments']}
+        previous = {'inputs': inputs, 'as_of': '2024-01-01',
+                    'outputs': {t: 'hash' for t in manifest.TABLE_INPUTS}}
+
+        # Nothing changed -> nothing to do
+        plan = manifest.plan_run(previous, inputs, '2024-01-01')
+        self.assertEqual(plan['stale_tables'], [])
+        self.assertEqual(plan['read_inputs'], [])
+
+        # Only reviews changed -> reviews fact + employee summary, not the department summary
+        changed = dict(inputs, performance_reviews={'size': 2, 'mtime_ns': 2, 'sha256': 'new'})
+        plan = manifest.plan_run(previous, changed, '2024-01-01')
+        self.assertEqual(plan['stale_tables'], ['fact_performance_reviews', 'summary_emp_performance',
+                                                'summary_manager_rollup', 'summary_review_cube'])
+        self.assertNotIn('projects', plan['read_inputs'])
+
+        # Next day, only reviews changed: the new date only counts for tables it changes (saved as-of ranges)
+        ranges = {'dim_employees': ['2024-01-01', '2024-01-03'], 'summary_dept_metrics': ['2024-01-01', '2024-02-01'],
+                  'summary_manager_rollup': ['2024-01-01', None]}
+        plan = manifest.plan_run(dict(previous, as_of_ranges=ranges), changed, '2024-01-02')
+        self.assertEqual(plan['stale_tables'], ['fact_performance_reviews', 'summary_emp_performance',
+                                                'summary_manager_rollup', 'summary_review_cube'])
+        self.assertNotIn('projects', plan['read_inputs'])
+        plan = manifest.plan_run(dict(previous, as_of_ranges=ranges), inputs, '2024-01-03')
+        self.assertEqual(plan['stale_tables'], ['dim_employees'])
+        # Without saved ranges every date-dependent table is stale on a new date
+        plan = manifest.plan_run(previous, inputs, '2024-01-02')
+        self.assertEqual(plan['stale_tables'], ['dim_employees', 'summary_dept_metrics', 'summary_manager_rollup'])
+
+        # No previous manifest -> full run
+        full = manifest.plan_run({}, inputs, '2024-01-01', snapshot_dates=['2023-12-31'])
+        self.assertEqual(len(full['stale_tables']), len(manifest.TABLE_INPUTS))
+
+    def test_schema_applied_at_read_time(self):
+        """ Test if raw files come back with registered dtypes and parsed dates """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'employees.csv')
+            raw = self.raw_employees.copy()
+            raw['department_id'] = [101.0, None, 102.0]  # ids come as floats when a value is missing
+            raw.to_csv(path, index=False)
+
+            df = extract.read_raw_csv(path)
+            self.assertEqual(str(df['department_id'].dtype), 'Int64')
+            self.assertEqual(str(df['status'].dtype), 'category')
+            self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['hire_date']))
+
+            # Cleaning accepts the typed frame as-is
+            cleaned = transform.clean_employee_data(df)
+            self.assertEqual(len(cleaned), 2)
+
+    def test_vectorized_feature_rules(self):
+        """ Test if the rule engine keeps the bucket boundaries and ratio guard of the old lambdas """
+        salaries = pd.DataFrame({'salary': [49999, 50000, 80000, 80001]})
+        self.assertEqual(features.apply_bucket(salaries, 'salary_bucket').tolist(), ['Low', 'Medium', 'Medium', 'High'])
+
+        ratings = pd.DataFrame({'rating': [4.5, 4.4, 3.5, 1.0]})
+        self.assertEqual(features.apply_bucket(ratings, 'performance_category').tolist(),
+                         ['Excellent', 'Good', 'Good', 'Needs Improvement'])
+
+        projects = pd.DataFrame({'budget': [1000.0, 500.0, 300.0], 'project_duration_days': [3, 0, None]})
+        self.assertEqual(features.apply_ratio(projects, 'daily_budget_alloc').tolist(), [333.33, 0.0, 0.0])
+
+    def test_compaction_keeps_values(self):
+        """ Test if compaction shrinks dtypes without changing any value """
+        df = pd.DataFrame({
+            'employee_id': range(1000),
+            'manager_id': [float(i % 7) if i % 3 else None for i in range(1000)],
+            'status': ['active', 'leave'] * 500,
+            'rating': [3.5] * 1000,
+        })
+        compact = transform.compact_frame(df)
+
+        self.assertEqual(str(compact['employee_id'].dtype), 'int16')
+        self.assertEqual(str(compact['manager_id'].dtype), 'Int8')
+        self.assertEqual(str(compact['status'].dtype), 'category')
+        self.assertEqual(str(compact['rating'].dtype), 'float64')
+        pd.testing.assert_frame_equal(compact, df, check_dtype=False, check_categorical=False)
+
+        _, report = transform.compact_tables({'t': df})
+        self.assertLess(report['t'][1], report['t'][0])
+
+    def test_review_stats_single_pass(self):
+        """ Test if the review statistics engine gives first/previous/latest ratings per employee """
+        reviews = pd.DataFrame({
+            'review_id': [1, 2, 3, 4],
+            'employee_id': [1, 3, 1, 1],
+            'review_date': ['2023-06-01', '2023-01-01', '2022-06-01', '2023-01-01'],
+            'rating': [4.0, 3.0, 2.0, 5.0],
+            'reviewer_id': [9, 9, 9, 9]
+        })
+        clean, stats = transform.clean_reviews_with_stats(reviews)
+        alice = stats.set_index('employee_id').loc[1]
+
+        self.assertEqual(alice['review_count'], 3)
+        self.assertEqual(alice['first_rating'], 2.0)
+        self.assertEqual(alice['previous_rating'], 5.0)
+        self.assertEqual(alice['latest_rating'], 4.0)
+        self.assertEqual(alice['rating_trend'], -1.0)
+        self.assertEqual(alice['latest_review_date'], pd.Timestamp('2023-06-01'))
+        self.assertTrue((clean.loc[clean['employee_id'] == 1, 'latest_rating'] == 4.0).all())
+
+        # The summary gives the same figures with or without precomputed stats
+        clean_emp = transform.clean_employee_data(self.raw_employees)
+        pd.testing.assert_frame_equal(
+            transform.create_emp_performance(clean_emp, clean, self.raw_depts, stats),
+            transform.create_emp_performance(clean_emp, clean, self.raw_depts)
+        )
+
+    def test_key_index_lookups(self):
+        """ Test if the dense key index lines up stats, finds missing keys and names ghost departments """
+        space = KeySpace(pd.Series([30, 10, 20], dtype='Int64'))
+        stats = pd.DataFrame({'total': [1.5, 3.0]}, index=[20, 30])
+        lined_up = space.take(stats, [30, 10, 99, 20])
+        self.assertEqual(lined_up['total'].tolist()[0], 3.0)
+        self.assertTrue(pd.isna(lined_up['total'].tolist()[1]))
+        self.assertTrue(pd.isna(lined_up['total'].tolist()[2]))
+        self.assertEqual(lined_up['total'].tolist()[3], 1.5)
+        self.assertEqual(sorted(space.missing_keys(pd.Series([10, -1, 40, 40]))), [40])
+
+        index = KeyIndex(dept_df=self.raw_depts)
+        names = index.department_name(pd.Series([101, 999]))
+        self.assertEqual(names.tolist(), ['HR', 'Unknown'])
+        errors = validation.validate_employees(self.raw_employees.assign(department_id=[101, 999, 101]), self.raw_depts, index)
+        self.assertTrue(any('Consistency Error: 1 department_id' in e for e in errors))
+
+    def test_partial_aggregates_merge(self):
+        """ Test if aggregates built from chunks (or merged partitions) equal the whole-table ones """
+        reviews = pd.DataFrame({
+            'employee_id': [1, 2, 1, 1, 2],
+            'review_date': pd.to_datetime(['2023-01-01', '2023-02-01', '2022-01-01', '2023-01-01', None]),
+            'rating': [4.0, 3.0, 2.0, 5.0, 1.0]
+        })
+        measures = {'total': ('rating', 'sum'), 'spread': ('rating', 'std'), 'low': ('rating', 'min'),
+                    'latest': ('rating', 'last'), 'raters': ('rating', 'distinct')}
+        whole = PartialAggregate('employee_id', measures, order_by='review_date').update(reviews).result()
+        left = PartialAggregate('employee_id', measures, order_by='review_date').update(reviews.iloc[:2])
+        right = PartialAggregate('employee_id', measures, order_by='review_date').update(reviews.iloc[2:])
+        merged = left.merge(right).result()
+
+        pd.testing.assert_frame_equal(whole, merged)
+        self.assertEqual(merged.loc[1, 'latest'], 5.0)  # same-day tie: the later row wins
+        self.assertEqual(merged.loc[2, 'latest'], 1.0)  # undated review sorts last
+        self.assertAlmostEqual(merged.loc[1, 'spread'], reviews[reviews['employee_id'] == 1]['rating'].std())
+
+        # Summaries accept chunked fact tables
+        clean_emp = transform.clean_employee_data(self.raw_employees)
+        chunks = [clean_emp.iloc[:1], clean_emp.iloc[1:]]
+        proj = pd.DataFrame({'project_id': [7], 'department_id': [101], 'budget': [10.0], 'end_date': [pd.NaT]})
+        pd.testing.assert_frame_equal(
+            transform.create_dept_summary(chunks, [proj], self.raw_depts),
+            transform.create_dept_summary(clean_emp, proj, self.raw_depts)
+        )
+
+    def test_incremental_summary_refresh(self):
+        """ Test if applying a delta feed to the summary state gives the same summaries as a full recompute """
+        reviews = pd.DataFrame({
+            'review_id': [1, 2, 3],
+            'employee_id': [1, 1, 3],
+            'review_date': ['2023-01-01', '2023-06-01', '2023-03-01'],
+            'rating': [3.0, 4.0, 5.0],
+            'reviewer_id': [9, 9, 9]
+        })
+        projects = pd.DataFrame({
+            'project_id': [7, 8], 'project_name': ['A', 'B'], 'department_id': [101, 102],
+            'start_date': ['2023-01-01', '2023-01-01'], 'end_date': [None, None], 'budget': [10.0, 20.0]
+        })
+        state = incremental.SummaryState(transform.clean_employee_data(self.raw_employees),
+                                         transform.clean_review_data(reviews),
+                                         transform.clean_project_data(projects), self.raw_depts, '2024-01-01')
+
+        new_hire = self.raw_employees.iloc[[0]].assign(employee_id=4, name='Dana', department_id=102, op='insert')
+        raise_ = self.raw_employees.iloc[[2]].assign(salary=120000, op='update')
+        deltas = {
+            'employees': pd.concat([new_hire, raise_, self.raw_employees.iloc[[0]][['employee_id']].assign(op='delete')]),
+            'performance_reviews': pd.concat([
+                reviews.iloc[[1]][['review_id']].assign(op='delete'),  # Alice's latest review
+                pd.DataFrame({'review_id': [4], 'employee_id': [4], 'review_date': ['2023-09-01'],
+                              'rating': [4.5], 'reviewer_id': [9], 'op': ['insert']})
+            ]),
+            'projects': projects.iloc[[0]][['project_id']].assign(op='delete'),
+        }
+        affected = state.apply(deltas)
+        self.assertEqual(affected['departments'], [101, 102])
+
+        tables = state.tables
+        pd.testing.assert_frame_equal(
+            state.summaries['summary_dept_metrics'],
+            transform.create_dept_summary(tables['employees'], tables['projects'], self.raw_depts))
+        pd.testing.assert_frame_equal(
+            state.summaries['summary_emp_performance'],
+            transform.create_emp_performance(tables['employees'], tables['performance_reviews'], self.raw_depts))
+        self.assertEqual(state.summaries['summary_emp_performance']['employee_id'].tolist(), [3, 4])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'summary_state.pkl')
+            incremental.save_state(state, path)
+            self.assertIsNotNone(incremental.load_state(path, '2024-01-01'))
+            self.assertIsNone(incremental.load_state(path, '2024-01-02'))
+
+    def test_table_graph_is_lazy(self):
+        """ Test if the table graph builds only what the targets need, once each, and frees intermediates """
+        calls = []
+        def node(name, func):
+            def run(*args):
+                calls.append(name)
+                return func(*args)
+            return run
+
+        graph = TableGraph()
+        graph.add('clean', node('clean', lambda raw: raw * 2), ['raw'])
+        graph.add('dim', node('dim', lambda clean: clean + 1), ['clean'])
+        graph.add('summary', node('summary', lambda clean, dim: clean + dim), ['clean', 'dim'])
+        graph.add('workload', node('workload', lambda clean, other: clean), ['clean', 'other_raw'])
+        graph.add('report', node('report', lambda summary, extra: (summary, extra)), ['summary'], optional=['dim'])
+
+        done = []
+        sources = {'raw': 5, 'unused': 1}
+        results = graph.run(['summary', 'workload'], sources, on_result=lambda n, v: done.append(n))
+        self.assertEqual(results, {'summary': 21})  # workload needs a source that was not given
+        self.assertEqual(sources, {})  # the run took the sources over
+        self.assertEqual(sorted(calls), ['clean', 'dim', 'summary'])
+        self.assertEqual(done[-1], 'summary')
+
+        # Optional inputs are only passed when the run computes them anyway
+        self.assertEqual(graph.run(['report'], {'raw': 5})['report'], (21, 11))
+        self.assertEqual(graph.plan(['report'], {'summary': 1})[1], {'report': ['summary']})
+
+    def test_sharded_transform_matches_single_process(self):
+        """ Test if the department-sharded process pool gives the same tables as the single-process transform """
+        with tempfile.TemporaryDirectory() as tmp:
+            frame = pd.DataFrame({
+                'id': pd.array([1, None, 3], dtype='Int64'),
+                'label': pd.Series(['a', None, 'c'], dtype='str'),
+                'kind': pd.Categorical(['x', 'y', 'x']),
+                'when': pd.to_datetime(['2023-01-01', None, '2023-03-01']),
+                'value': [1.5, float('nan'), 3.0],
+            }, index=[10, 11, 12])
+            spec = sharding.write_frame(frame, tmp)
+            pd.testing.assert_frame_equal(sharding.read_frame(spec), frame)
+            pd.testing.assert_frame_equal(sharding.read_frame(spec, [0, 2]), frame.iloc[[0, 2]])
+
+        reviews = pd.DataFrame({
+            'review_id': [1, 2, 3],
+            'employee_id': [3, 1, 1],
+            'review_date': pd.to_datetime(['2023-03-01', '2023-06-01', '2023-01-01']),
+            'rating': [5.0, 4.0, 3.0],
+            'reviewer_id': [9, 9, 9]
+        })
+        projects = pd.DataFrame({
+            'project_id': [7, 8], 'department_id': [101, 102], 'budget': [10.0, 20.0],
+            'start_date': pd.to_datetime(['2023-01-01', '2023-01-01']), 'end_date': pd.to_datetime([None, None])
+        })
+        raw_emp = self.raw_employees.assign(hire_date=pd.to_datetime(self.raw_employees['hire_date']))
+        shards = sharding.transform_sharded(raw_emp, reviews, projects, self.raw_depts, workers=2)
+
+        clean_emp = transform.clean_employee_data(raw_emp)
+        clean_rev = transform.clean_review_data(reviews)
+        clean_proj = transform.clean_project_data(projects)
+        pd.testing.assert_frame_equal(shards['clean_employees'], clean_emp)
+        pd.testing.assert_frame_equal(shards['clean_reviews'], clean_rev)
+        pd.testing.assert_frame_equal(shards['summary_dept_metrics'],
+                                      transform.create_dept_summary(clean_emp, clean_proj, self.raw_depts))
+        pd.testing.assert_frame_equal(shards['summary_emp_performance'],
+                                      transform.create_emp_performance(clean_emp, clean_rev, self.raw_depts))
+
+    def test_copy_free_cleaning(self):
+        """ Test if copy-free cleaning gives the same tables, leaves the input alone and reports step peaks """
+        raw = self.raw_employees.assign(salary=[40000, 70000, 0])
+        before = raw.copy()
+        memory = {}
+        pd.testing.assert_frame_equal(transform.clean_employee_data(raw, copy_free=True, memory=memory),
+                                      transform.clean_employee_data(raw))
+        pd.testing.assert_frame_equal(raw, before)
+        self.assertEqual(set(memory), {'employees.filter', 'employees.columns', 'employees.features'})
+        self.assertTrue(all(peak > 0 for peak in memory.values()))
+
+        reviews = pd.DataFrame({
+            'review_id': [1, 2, 3, 4],
+            'employee_id': [3, 1, 1, 1],
+            'review_date': ['2023-03-01', '2023-06-01', '2023-06-01', '2023-01-01'],
+            'rating': [5.0, 4.0, 2.0, 7.0],
+            'reviewer_id': [9, 9, 1, 9]
+        })
+        pd.testing.assert_frame_equal(transform.clean_review_data(reviews, copy_free=True),
+                                      transform.clean_review_data(reviews))
+
+        # Rows for the database: every kind of missing value becomes None, batch by batch
+        frame = pd.DataFrame({'a': pd.array([1, None], dtype='Int64'), 'b': [1.5, float('nan')],
+                              'c': pd.to_datetime(['2023-01-01', None])})
+        batches = list(load.sql_rows(frame, batch_rows=1))
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(batches[1], [(None, None, None)])
+
+    def test_allocation_timeline_sweep(self):
+        """ Test if overlapping assignments give the right allocation segments, over-allocated periods and peaks """
+        assignments = pd.DataFrame({
+            'employee_id': [1, 1, 1, 2, 2],
+            'project_id': [1, 2, 3, 1, 2],
+            'allocation_percentage': [100, 80, 50, 60, 70],
+            'start_date': pd.to_datetime(['2023-01-01', '2023-03-01', '2023-04-01', '2023-01-01', '2023-02-01']),
+            'end_date': pd.to_datetime(['2023-03-31', '2023-05-31', None, '2023-01-31', '2023-02-28'])
+        })
+        timeline = transform.allocation_timeline(assignments)
+        emp1 = timeline[timeline['employee_id'] == 1]
+        self.assertEqual(emp1['allocation'].tolist(), [100.0, 180.0, 130.0, 50.0])
+        self.assertEqual(emp1['segment_end'].iloc[1], pd.Timestamp('2023-03-31'))
+        self.assertTrue(pd.isna(emp1['segment_end'].iloc[-1]))  # open-ended assignment
+        # Back-to-back assignments of employee 2 never overlap
+        self.assertEqual(timeline.loc[timeline['employee_id'] == 2, 'allocation'].tolist(), [60.0, 70.0])
+
+        periods = transform.create_over_allocation(timeline)
+        self.assertEqual(len(periods), 1)
+        self.assertEqual(periods.iloc[0]['period_start'], pd.Timestamp('2023-03-01'))
+        self.assertEqual(periods.iloc[0]['period_end'], pd.Timestamp('2023-05-31'))
+        self.assertEqual(periods.iloc[0]['peak_allocation'], 180.0)
+        self.assertEqual(periods.iloc[0]['days'], 92)
+
+        summary = transform.create_allocation_summary(timeline).set_index('employee_id')
+        self.assertEqual(summary.loc[1, 'peak_allocation'], 180.0)
+        self.assertEqual(summary.loc[1, 'over_allocated_periods'], 1)
+        self.assertEqual(summary.loc[2, 'peak_start_date'], pd.Timestamp('2023-02-01'))
+        self.assertEqual(summary.loc[2, 'over_allocated_periods'], 0)
+
+    def test_as_of_snapshots(self):
+        """ Test if the interval index answers a batch of dates and each snapshot equals an as-of run """
+        index = temporal.TemporalIndex(
+            pd.to_datetime(['2023-01-01', '2023-02-01', None]), pd.to_datetime(['2023-01-31', None, '2023-01-15']),
+            [1, 1, 2], weights={'budget': [10.0, 20.0, 5.0]})
+        active = index.active(['2023-01-15', '2023-01-31', '2023-02-01'])
+        self.assertEqual(active['count'].tolist(), [1, 1, 1, 0, 1, 0])
+        self.assertEqual(active.loc[(pd.Timestamp('2023-02-01'), 1), 'budget'], 20.0)
+
+        employees = transform.clean_employee_data(self.raw_employees, as_of='2023-06-30')
+        self.assertEqual(employees['tenure_years'].tolist(), [3.5, 4.5])
+        # dim_employees as of a past date: no negative tenure for employees hired after it
+        before_hire = transform.clean_employee_data(self.raw_employees, as_of='2019-06-30')
+        self.assertTrue(pd.isna(before_hire['tenure_years'].iloc[0]))
+        self.assertEqual(before_hire['tenure_years'].iloc[1], 0.5)
+        projects = pd.DataFrame({
+            'project_id': [7, 8, 9], 'department_id': [101, 101, 102], 'budget': [10.0, 20.0, 30.0],
+            'start_date': pd.to_datetime(['2022-01-01', '2023-03-01', '2021-01-01']),
+            'end_date': pd.to_datetime([None, '2023-06-30', '2022-12-31'])
+        })
+        assignments = pd.DataFrame({
+            'employee_id': [1, 3], 'project_id': [7, 8], 'allocation_percentage': [50, 50],
+            'start_date': pd.to_datetime(['2022-01-01', '2023-03-01']),
+            'end_date': pd.to_datetime([None, '2023-06-30'])
+        })
+        dates = ['2020-06-30', '2022-06-30', '2023-06-30']
+        snapshots = transform.create_dept_snapshots(employees, projects, self.raw_depts, dates, assignments)
+        self.assertEqual(len(snapshots), len(dates) * len(self.raw_depts))
+        for date in dates:
+            rows = snapshots[snapshots['as_of'] == date].reset_index(drop=True)
+            expected = transform.create_dept_summary(employees, projects, self.raw_depts, as_of=date)
+            pd.testing.assert_frame_equal(rows[expected.columns], expected)
+        # First date on which each date-dependent table would change
+        horizons = transform.as_of_horizons('2023-06-30', employees, projects, assignments)
+        tenure = lambda d: transform.clean_employee_data(self.raw_employees, as_of=d)['tenure_years'].tolist()
+        self.assertEqual(tenure(horizons['dim_employees'] - pd.Timedelta(days=1)), tenure('2023-06-30'))
+        self.assertNotEqual(tenure(horizons['dim_employees']), tenure('2023-06-30'))
+        self.assertIsNone(horizons['summary_dept_metrics'])  # no later hire, project start or end
+        self.assertEqual(horizons['summary_manager_rollup'], pd.Timestamp('2023-07-01'))  # assignment ended
+        self.assertEqual(transform.as_of_horizons('2023-06-29', employees, projects)['summary_dept_metrics'],
+                         pd.Timestamp('2023-06-30'))
+        last = snapshots[snapshots['as_of'] == '2023-06-30'].set_index('department_id')
+        self.assertEqual(last.loc[101, 'active_projects'], 1)  # project 8 ended on that day
+        self.assertEqual(last.loc[102, 'active_assignments'], 1)  # assignments include their end date
+
+    def test_manager_hierarchy_rollups(self):
+        """ Test if subtree rollups, cycles and orphan managers come out of the Euler-tour hierarchy """
+        employees = pd.DataFrame({
+            'employee_id': [1, 2, 3, 4, 5, 6, 7],
+            'name': ['A', 'B', 'C', 'D', 'E', 'F', 'G'],
+            'department_id': [101] * 7,
+            'salary': [100.0, 50.0, 40.0, 30.0, 20.0, 10.0, 10.0],
+            'manager_id': pd.array([None, 1, 1, 2, 99, 7, 6], dtype='Int64')
+        })
+        hierarchy = OrgHierarchy(employees, pd.DataFrame({'department_id': [101], 'manager_id': [1]}))
+        self.assertEqual(hierarchy.orphan_managers, [99])
+        self.assertEqual(hierarchy.orphan_reports, [5])
+        self.assertEqual(hierarchy.cycles, [[6, 7]])
+        # Every subtree is one contiguous range of the tour
+        self.assertEqual(hierarchy.subtree_sum(employees['salary']).tolist(), [220.0, 80.0, 40.0, 30.0, 20.0, 20.0, 10.0])
+
+        perf = pd.DataFrame({'employee_id': [2, 3, 4], 'avg_rating': [4.0, 3.0, None]})
+        assignments = pd.DataFrame({
+            'employee_id': [2, 4], 'allocation_percentage': [50, 80],
+            'start_date': pd.to_datetime(['2023-01-01', '2023-01-01']), 'end_date': pd.to_datetime([None, '2023-03-31'])
+        })
+        rollup = transform.create_manager_rollup(employees, perf, assignments, hierarchy, as_of='2023-02-01')
+        rollup = rollup.set_index('manager_id')
+        self.assertEqual(list(rollup.index), [1, 2, 6])
+        self.assertEqual(rollup.loc[1, 'team_headcount'], 3)
+        self.assertEqual(rollup.loc[1, 'direct_reports'], 2)
+        self.assertEqual(rollup.loc[1, 'team_salary_total'], 120.0)
+        self.assertEqual(rollup.loc[1, 'team_avg_rating'], 3.5)
+        self.assertEqual(rollup.loc[1, 'team_allocation'], 130.0)
+        self.assertEqual(rollup.loc[2, 'level'], 1)
+
+        issues, results = validation.evaluate_hierarchy(hierarchy)
+        self.assertEqual(len(issues), 2)
+        # Both rules count employee rows
+        self.assertEqual([(r['passed'], r['failed']) for r in results], [(6, 1), (5, 2)])
+
+    def test_review_cube_levels(self):
+        """ Test if the review cube holds every grouping set and each level adds up to the reviews """
+        employees = transform.clean_employee_data(self.raw_employees)
+        reviews = transform.clean_review_data(pd.DataFrame({
+            'review_id': [1, 2, 3, 4],
+            'employee_id': [1, 1, 3, 99],
+            'review_date': ['2023-01-10', '2023-02-10', '2023-01-20', '2023-01-05'],
+            'rating': [4.0, 3.0, 5.0, 2.0],
+            'reviewer_id': [3, 3, 1, 1]
+        }))
+        cube = transform.create_review_cube(employees, reviews)
+        self.assertEqual(cube['grouping_id'].nunique(), 16)
+        for _, level in cube.groupby('grouping_id'):
+            self.assertEqual(level['review_count'].sum(), 4)
+
+        total = transform.cube_level(cube, []).iloc[0]
+        self.assertEqual(total['employee_count'], 3)
+        self.assertEqual(total['avg_rating'], 3.5)
+        per_dept = transform.cube_level(cube, ['department_id']).set_index('department_id')
+        self.assertEqual(per_dept.loc[101, 'review_count'], 2)
+        self.assertEqual(per_dept.loc[101, 'employee_count'], 1)  # two months, one employee
+        self.assertEqual(per_dept.loc[101, 'avg_salary'], 40000.0)
+        self.assertTrue(per_dept.index.isna().any())  # review of an unknown employee keeps its own cell
+
+    def test_referential_integrity_engine(self):
+        """ Test if FK violations come back as row positions and keys, composite and streamed parents included """
+        parent = pd.DataFrame({'project_id': [1, 1, 2, 3], 'employee_id': [10, 11, 10, 12]})
+        child = pd.DataFrame({
+            'project_id': pd.array([1, 2, 2, None, 3, -1], dtype='Int64'),
+            'employee_id': [10.0, 10.0, 11.0, 10.0, 12.0, 5.0]
+        })
+        exact = integrity.find_violations(child, ['project_id', 'employee_id'], parent)
+        self.assertEqual(list(exact.positions), [2, 3])  # unknown pair and missing key; -1 is unassigned
+        self.assertEqual(exact.keys['employee_id'].tolist(), [11.0, 10.0])
+
+        # Streaming the parent in chunks (Bloom prefilter + confirmation) finds the same rows
+        chunks = lambda: (parent.iloc[i:i + 2] for i in range(0, len(parent), 2))
+        streamed = integrity.find_violations(child, ['project_id', 'employee_id'], chunks, bloom_capacity=4)
+        self.assertEqual(list(streamed.positions), [2, 3])
+
+        # A tiny filter lets through false positives; the confirmation pass removes them
+        ids = pd.DataFrame({'employee_id': range(0, 2000, 2)})
+        probe = pd.DataFrame({'employee_id': range(2000)})
+        lossy = integrity.find_violations(probe, 'employee_id', ids, max_exact_keys=100, bloom_capacity=10)
+        self.assertEqual(list(lossy.positions), list(range(1, 2000, 2)))
+
+        found = {}
+        errors = validation.check_consistency(child, 'project_id', parent, 'project_id', 'Assignments', 'Projects',
+                                              violations=found)
+        self.assertEqual(list(found['Assignments'].positions), [3])
+        self.assertTrue(any('1 project_id values' in e and '(1 rows' in e for e in errors))
+
+    def test_validation_rules_single_pass(self):
+        """ Test if the declared rules report per-rule row counts, failing rows and timings """
+        employees = self.raw_employees.assign(
+            employee_id=[1, 1, 3], status=['active', 'unknown', 'active'], salary=[0, 0, 100000])
+        reviews = pd.DataFrame({'review_id': [1, 2], 'employee_id': [1, 3], 'rating': [4.0, 6.0],
+                                'review_date': ['2023-01-01', '2023-02-01']})
+        validated = validation.validate_tables({
+            'Employees': (employees, {'Departments': self.raw_depts}),
+            'Reviews': (reviews, {'Employees': employees}),
+        })
+        self.assertEqual(list(validated), ['Employees', 'Reviews'])
+
+        issues, results, failed_rows = validated['Employees']
+        by_rule = {r['rule']: r for r in results}
+        self.assertEqual(by_rule['employees.pk_unique']['failed'], 1)
+        self.assertEqual(by_rule['employees.status_valid']['failed'], 1)
+        # Only active rows are checked for a positive salary (the 'unknown' one has 0 as well)
+        self.assertEqual((by_rule['employees.active_salary_positive']['checked'],
+                          by_rule['employees.active_salary_positive']['failed']), (2, 1))
+        self.assertEqual(by_rule['employees.department_fk']['passed'], 3)
+        self.assertEqual(failed_rows['employees.status_valid'].tolist(), [False, True, False])
+        self.assertTrue(all(r['seconds'] >= 0 for r in results))
+        self.assertIn("[Employees] Found DUPLICATE values in Primary Key: employee_id", issues)
+        self.assertEqual(len(issues), 3)
+
+        issues, results, _ = validated['Reviews']
+        self.assertEqual(issues, ["[Reviews] Accuracy Error: 1 rows failed check: Rating must be between 1.0 and 5.0"])
+        # Missing required columns fail every row
+        issues, _, failed_rows = validation.evaluate_rules('Projects', pd.DataFrame({'project_id': [1, 2]}))
+        self.assertIn("[Projects] Missing required column: project_name", issues)
+        self.assertTrue(failed_rows['projects.start_date_not_null'].all())
+
+    def test_quarantine_sink(self):
+        """ Test if failing rows are appended to the quarantine file and only clean rows remain """
+        employees = self.raw_employees.assign(department_id=[101, 999, 101], status=['active', 'active', 'gone'])
+        parents = {'Departments': self.raw_depts}
+        _, _, failed_rows = validation.evaluate_rules('Employees', employees, parents)
+        self.assertEqual(quarantine.clean_rows(employees, failed_rows)['employee_id'].tolist(), [1])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            sink = quarantine.QuarantineSink(os.path.join(tmp, 'quarantine', 'quarantine.csv'))
+            self.assertEqual(sink.write('Employees', employees, failed_rows), 2)
+            # Chunked input appends to the same file
+            chunks = [employees.iloc[:2], employees.iloc[2:]]
+            clean = pd.concat(quarantine.validate_chunks('Employees', chunks, sink, parents))
+            self.assertEqual(clean['employee_id'].tolist(), [1])
+
+            records = sink.read()
+            self.assertEqual(list(records.columns), quarantine.QUARANTINE_COLUMNS)
+            self.assertEqual(len(records), 4)
+            self.assertEqual(sink.counts, {'Employees': 4})
+            fk = records[records['rule_id'] == 'employees.department_fk'].iloc[0]
+            self.assertEqual((fk['row_key'], fk['value']), ('2', '999'))
+            self.assertEqual(fk['reason'], 'department_id not found in Departments.department_id')
+            self.assertIn("status is not one of", records[records['row_key'] == '3']['reason'].iloc[0])
+
+    def test_profile_sketches_and_drift(self):
+        """ Test if chunked sketch profiles approximate the exact figures and flag drift between runs """
+        n = 20000
+        df = pd.DataFrame({
+            'employee_id': range(n),
+            'salary': [float(i % 1000) * 100 for i in range(n)],
+            'status': ['active' if i % 4 else 'leave' for i in range(n)],
+        })
+        summary = profiling.profile_frame(df, chunk_rows=3000).summary()
+        self.assertLess(abs(summary['employee_id']['distinct'] - n) / n, 0.05)
+        self.assertLess(abs(summary['salary']['distinct'] - 1000), 20)
+        self.assertLess(abs(summary['salary']['quantiles']['p50'] - 50000) / 50000, 0.03)
+        self.assertEqual(summary['status']['top'][0], ['active', 15000])
+
+        # Profiles of parts merge into the profile of the whole
+        halves = profiling.profile_frame(df.iloc[:n // 2]).merge(profiling.profile_frame(df.iloc[n // 2:])).summary()
+        self.assertEqual(halves['status']['top'], summary['status']['top'])
+        self.assertEqual(halves['salary']['distinct'], summary['salary']['distinct'])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for day in range(1, 4):  # only the newest two are kept
+                profiling.save_profile(tmp, {'dim_employees': {}}, pd.Timestamp(2026, 1, day), keep=2)
+            profiling.save_profile(tmp, {'dim_employees': summary}, keep=2)
+            self.assertEqual(len(os.listdir(tmp)), 2)
+            previous = profiling.load_latest_profile(tmp)
+        self.assertEqual(profiling.drift_alerts(previous, {'dim_employees': summary}), [])
+        drifted = df.assign(salary=df['salary'] * 1.5, status='leave')
+        drifted.loc[:3000, 'salary'] = None
+        alerts = profiling.drift_alerts(previous, {'dim_employees': profiling.profile_frame(drifted).summary()})
+        self.assertTrue(any('[dim_employees.salary] null rate' in a for a in alerts))
+        self.assertTrue(any('[dim_employees.salary] p50' in a for a in alerts))
+        self.assertTrue(any("share of 'leave'" in a for a in alerts))
+
+    def test_bulk_load_with_fallback(self):
+        """ Test if the bulk loader maps empty fields / booleans and falls back to inserts when refused """
+        class Connection:
+            """ Records the statements; refuses LOAD DATA when local files are disabled """
+            def __init__(self, local_infile):
+                self.local_infile, self.statements, self.params, self.rowcount, self.commits = local_infile, [], [], 0, 0
+            def cursor(self, prepared=False):
+                return self
+            def execute(self, sql, params=None):
+                if 'LOAD DATA' in sql and not self.local_infile:
+                    raise load.Error("Loading local data is disabled")
+                self.statements.append(sql)
+                if params is not None:
+                    self.params.append(params)
+            def commit(self):
+                self.commits += 1
+            def rollback(self):
+                pass
+
+        frame = pd.DataFrame({'review_id': [1, 2], 'rating': [4.5, None],
+                              'is_self_review': pd.array([True, None], dtype='boolean')})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'fact_performance_reviews.csv')
+            frame.to_csv(path, index=False)
+            conn = Connection(local_infile=True)
+            method, _ = load.load_table(conn, frame, 'fact_performance_reviews', path, 'bulk')
+            self.assertEqual(method, 'bulk')
+            self.assertEqual(conn.statements[0], "DELETE FROM fact_performance_reviews")  # no implicit commit
+            sql = conn.statements[-1]
+            self.assertIn("LOAD DATA LOCAL INFILE", sql)
+            self.assertIn("rating = NULLIF(@c1, '')", sql)
+            self.assertIn("is_self_review = CASE @c2 WHEN 'True' THEN 1", sql)
+            self.assertEqual(conn.params, [])
+
+            refused = Connection(local_infile=False)
+            method, _ = load.load_table(refused, frame, 'fact_performance_reviews', path, 'bulk')
+            self.assertEqual(method, 'insert')
+            self.assertEqual(refused.params, [[1, 4.5, True, 2, None, None]])
+
+            # A failed fallback is an error, not a load
+            class Broken(Connection):
+                def execute(self, sql, params=None):
+                    if 'INSERT' in sql:
+                        raise load.Error("Lost connection")
+                    super().execute(sql, params)
+            broken = Broken(local_infile=False)
+            with self.assertRaises(load.Error):
+                load.load_table(broken, frame, 'fact_performance_reviews', path, 'bulk')
+
+        # Batched inserts: fixed-size multi-row statements, a commit every rows_per_commit rows
+        conn = Connection(local_infile=False)
+        big = pd.DataFrame({'a': range(25), 'b': [None] * 25})
+        stats = load.insert_rows(conn, big, 't', rows_per_statement=10, rows_per_commit=20)
+        self.assertEqual((stats['rows'], stats['statements'], stats['commits']), (25, 3, 2))
+        self.assertEqual(conn.statements[0].count('(%s,%s)'), 10)
+        self.assertEqual(conn.statements[2].count('(%s,%s)'), 5)
+        self.assertEqual(conn.params[2], [20, None, 21, None, 22, None, 23, None, 24, None])
+        # Statements shrink to fit the packet size
+        self.assertEqual(load.statement_rows(big, 1000, max_packet_bytes=200), 10)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
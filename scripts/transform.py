@@ -1,100 +1,354 @@
 import pandas as pd
+import numpy as np
+from pandas.api.types import union_categoricals
 import os
 import validation  # <--- LINKING THE NEW MODULE
+import schema
+import features
+from cache import frame_memory_bytes, traced_peak
+from key_index import KeyIndex, KeySpace
+from aggregates import PartialAggregate
+from temporal import TemporalIndex, reference_date
+
+# Raw columns the cleaners actually use. Extraction only reads these (tables not listed are read whole).
+SOURCE_COLUMNS = {
+    'employees': ['employee_id', 'name', 'department_id', 'salary', 'hire_date', 'manager_id', 'bonus_eligible',
+                  'status'],
+    'projects': ['project_id', 'project_name', 'department_id', 'start_date', 'end_date', 'budget'],
+    'project_assignments': ['employee_id', 'project_id', 'allocation_percentage', 'start_date', 'end_date'],
+}
 
 # ==========================================
 #      PART 1: CLEANING & FEATURES
 # ==========================================
 
-def clean_employee_data(df):
-    """ EMPLOYEES: Clean + Tenure + Salary Bucket """
-    df = df.copy()
-    if 'status' in df.columns:
-        df = df[df['status'] != 'inactive']
-    if 'salary' in df.columns:
-        df = df[df['salary'] != 0]
-    if 'department_id' in df.columns:
-        df['department_id'] = df['department_id'].fillna(-1).astype(int)
-    if 'hire_date' in df.columns:
-        df['hire_date'] = pd.to_datetime(df['hire_date'])
-    if 'bonus_eligible' in df.columns:
-        df['bonus_eligible'] = df['bonus_eligible'].map({'Y': 1, 'N': 0})
+def _filter_rows(df, rules, copy_free=False):
+    """
+    Applies row filters [(column, mask function)], skipping rules whose column is missing.
+    Default: copy the input, then filter one rule at a time.
+    copy_free: evaluate every rule on the input, AND them into one mask and select once
+    (a shallow copy when nothing is dropped), so the input is never duplicated.
+    """
+    rules = [(col, rule) for col, rule in rules if col in df.columns]
+    if not copy_free:
+        df = df.copy()
+        for _, rule in rules:
+            df = df[rule(df)]
+        return df
+
+    mask = np.ones(len(df), dtype=bool)
+    for _, rule in rules:
+        mask &= rule(df).to_numpy(dtype=bool, na_value=False)
+    return df.copy(deep=False) if mask.all() else df[mask]
+
+def clean_employee_data(df, copy_free=False, memory=None, as_of=None):
+    """
+    EMPLOYEES: Clean + Tenure + Salary Bucket (memory: dict receiving each step's peak bytes)
+    as_of: reference date for tenure (None = today); employees hired after it have no tenure
+    """
+    with traced_peak(memory, 'employees.filter'):
+        df = _filter_rows(df, [
+            ('status', lambda d: d['status'] != 'inactive'),
+            ('salary', lambda d: (d['salary'] != 0).fillna(True)),
+        ], copy_free)
+    with traced_peak(memory, 'employees.columns'):
+        if 'department_id' in df.columns:
+            df['department_id'] = df['department_id'].fillna(-1).astype(int)
+        if 'hire_date' in df.columns:
+            df['hire_date'] = schema.to_datetime(df['hire_date'], 'employees')
+        if 'bonus_eligible' in df.columns:
+            df['bonus_eligible'] = df['bonus_eligible'].map({'Y': 1, 'N': 0})
 
     # Features
-    if 'hire_date' in df.columns:
-        today = pd.Timestamp.today()
-        df['tenure_years'] = ((today - df['hire_date']).dt.days / 365.25).round(1)
-    if 'salary' in df.columns:
-        df['salary_bucket'] = df['salary'].apply(
-            lambda x: 'Low' if x < 50000 else ('Medium' if x <= 80000 else 'High')
-        )
+    with traced_peak(memory, 'employees.features'):
+        if 'hire_date' in df.columns:
+            today = reference_date(as_of)
+            tenure = ((today - df['hire_date']).dt.days / 365.25).round(1)
+            df['tenure_years'] = tenure.where(df['hire_date'] <= today)
+        if 'salary' in df.columns:
+            df['salary_bucket'] = features.apply_bucket(df, 'salary_bucket')
     return df
 
-def clean_review_data(df):
+def clean_review_data(df, copy_free=False, memory=None):
     """ REVIEWS: Clean + Category + Latest Rating """
-    df = df.copy()
-    if 'review_date' in df.columns:
-        df['review_date'] = pd.to_datetime(df['review_date'])
-    if 'employee_id' in df.columns and 'review_date' in df.columns:
-        df = df.sort_values(by=['employee_id', 'review_date'])
-        df = df.drop_duplicates(subset=['employee_id', 'review_date'])
+    return clean_reviews_with_stats(df, copy_free, memory)[0]
+
+def _review_rows(df):
+    """
+    Copy-free review filter: positions of the rows kept by sort -> drop duplicates -> rating range,
+    in (employee_id, review_date) order, computed from the key columns only.
+    """
+    keys = df[['employee_id', 'review_date']].reset_index(drop=True)
+    order = keys.sort_values(by=['employee_id', 'review_date']).index.to_numpy()
+    keep = ~keys.take(order).duplicated().to_numpy()
     if 'rating' in df.columns:
-        df = df[(df['rating'] >= 1.0) & (df['rating'] <= 5.0)]
-    if 'reviewer_id' in df.columns and 'employee_id' in df.columns:
-        df['is_self_review'] = df['reviewer_id'] == df['employee_id']
+        rating = df['rating'].to_numpy(dtype=float, na_value=np.nan)[order]
+        with np.errstate(invalid='ignore'):
+            keep &= (rating >= 1.0) & (rating <= 5.0)
+    return order[keep]
+
+def clean_reviews_with_stats(df, copy_free=False, memory=None):
+    """ REVIEWS: Same as clean_review_data, also returning the per-employee review stats (or None) """
+    with traced_peak(memory, 'reviews.filter'):
+        if copy_free and 'employee_id' in df.columns and 'review_date' in df.columns:
+            df = df.copy(deep=False)
+            df['review_date'] = schema.to_datetime(df['review_date'], 'performance_reviews')
+            df = df.take(_review_rows(df))
+        else:
+            df = df.copy()
+            if 'review_date' in df.columns:
+                df['review_date'] = schema.to_datetime(df['review_date'], 'performance_reviews')
+            if 'employee_id' in df.columns and 'review_date' in df.columns:
+                df = df.sort_values(by=['employee_id', 'review_date'])
+                df = df.drop_duplicates(subset=['employee_id', 'review_date'])
+            if 'rating' in df.columns:
+                df = df[(df['rating'] >= 1.0) & (df['rating'] <= 5.0)]
+    with traced_peak(memory, 'reviews.columns'):
+        if 'reviewer_id' in df.columns and 'employee_id' in df.columns:
+            df['is_self_review'] = df['reviewer_id'] == df['employee_id']
 
     # Features
-    if 'rating' in df.columns:
-        df['performance_category'] = df['rating'].apply(
-            lambda x: 'Excellent' if x >= 4.5 else ('Good' if x >= 3.5 else 'Needs Improvement')
-        )
-    if 'employee_id' in df.columns and 'rating' in df.columns:
-        df['latest_rating'] = df.groupby('employee_id')['rating'].transform('last')
-    return df
-
-def clean_project_data(df):
-    """ PROJECTS: Clean + Duration + Budget Stats """
-    df = df.copy()
-    if 'budget' in df.columns:
-        df = df.dropna(subset=['budget'])
-        df = df[df['budget'] > 0]
-    if 'start_date' in df.columns:
-        df['start_date'] = pd.to_datetime(df['start_date'])
-    if 'end_date' in df.columns:
-        df['end_date'] = pd.to_datetime(df['end_date'])
+    with traced_peak(memory, 'reviews.features'):
+        if 'rating' in df.columns:
+            df['performance_category'] = features.apply_bucket(df, 'performance_category')
+        stats = None
+        if 'employee_id' in df.columns and 'rating' in df.columns and 'review_date' in df.columns:
+            # Already sorted by (employee_id, review_date) above, so this does not sort again
+            stats = compute_review_stats(df)
+            df['latest_rating'] = df['employee_id'].map(stats.set_index('employee_id')['latest_rating'])
+        elif 'employee_id' in df.columns and 'rating' in df.columns:
+            df['latest_rating'] = df.groupby('employee_id')['rating'].transform('last')
+    return df, stats
+
+def clean_project_data(df, copy_free=False, memory=None, as_of=None):
+    """ PROJECTS: Clean + Duration + Budget Stats (as_of: end of open-ended projects, None = today) """
+    with traced_peak(memory, 'projects.filter'):
+        df = _filter_rows(df, [
+            ('budget', lambda d: d['budget'].notna()),
+            ('budget', lambda d: d['budget'] > 0),
+        ], copy_free)
+    with traced_peak(memory, 'projects.columns'):
+        if 'start_date' in df.columns:
+            df['start_date'] = schema.to_datetime(df['start_date'], 'projects')
+        if 'end_date' in df.columns:
+            df['end_date'] = schema.to_datetime(df['end_date'], 'projects')
     
     # Features
-    today = pd.Timestamp.today()
-    temp_end_date = df['end_date'].fillna(today)
-    df['project_duration_days'] = (temp_end_date - df['start_date']).dt.days
-
-    if 'budget' in df.columns and 'project_duration_days' in df.columns:
-        df['daily_budget_alloc'] = df.apply(
-            lambda x: x['budget'] / x['project_duration_days'] if x['project_duration_days'] > 0 else 0, 
-            axis=1
-        ).round(2)
+    with traced_peak(memory, 'projects.features'):
+        today = reference_date(as_of)
+        temp_end_date = df['end_date'].fillna(today)
+        df['project_duration_days'] = (temp_end_date - df['start_date']).dt.days
+
+        if 'budget' in df.columns and 'project_duration_days' in df.columns:
+            df['daily_budget_alloc'] = features.apply_ratio(df, 'daily_budget_alloc')
     return df
 
-def clean_assignment_data(df):
+def clean_assignment_data(df, copy_free=False, memory=None):
     """ ASSIGNMENTS: Clean """
-    df = df.copy()
-    if 'allocation_percentage' in df.columns:
-        df = df[df['allocation_percentage'] <= 100]
-    if 'start_date' in df.columns:
-        df['start_date'] = pd.to_datetime(df['start_date'])
-    if 'end_date' in df.columns:
-        df['end_date'] = pd.to_datetime(df['end_date'])
-    if 'start_date' in df.columns and 'end_date' in df.columns:
-        valid_dates = (df['end_date'].isna()) | (df['start_date'] <= df['end_date'])
-        df = df[valid_dates]
+    def allocation_ok(d):
+        return (d['allocation_percentage'] <= 100).fillna(False)
+
+    def dates_ok(d):
+        start = schema.to_datetime(d['start_date'], 'project_assignments')
+        end = schema.to_datetime(d['end_date'], 'project_assignments')
+        return end.isna() | (start <= end)
+
+    with traced_peak(memory, 'assignments.filter'):
+        rules = [('allocation_percentage', allocation_ok)]
+        if copy_free and 'end_date' in df.columns:
+            rules.append(('start_date', dates_ok))  # one mask; dates are parsed at read time
+        df = _filter_rows(df, rules, copy_free)
+    with traced_peak(memory, 'assignments.columns'):
+        if 'start_date' in df.columns:
+            df['start_date'] = schema.to_datetime(df['start_date'], 'project_assignments')
+        if 'end_date' in df.columns:
+            df['end_date'] = schema.to_datetime(df['end_date'], 'project_assignments')
+        if not copy_free and 'start_date' in df.columns and 'end_date' in df.columns:
+            valid_dates = (df['end_date'].isna()) | (df['start_date'] <= df['end_date'])
+            df = df[valid_dates]
     return df
 
+# Cleaners whose output for a row depends only on that row, so they can run chunk by chunk.
+# Reviews are not listed: de-duplication and 'latest_rating' need all reviews of an employee.
+CHUNK_CLEANERS = {
+    'employees': clean_employee_data,
+    'projects': clean_project_data,
+    'project_assignments': clean_assignment_data,
+}
+
+# Chunk cleaners with date-dependent features (tenure, project duration)
+DATED_CLEANERS = {'employees', 'projects'}
+
+def clean_in_chunks(table_name, chunks, as_of=None):
+    """
+    STREAMING: Applies the table's cleaner to each chunk and yields the cleaned chunks
+    (as_of: reference date of the dated cleaners, None = today)
+    """
+    if table_name not in CHUNK_CLEANERS:
+        raise ValueError(f"'{table_name}' cannot be cleaned chunk by chunk")
+    cleaner = CHUNK_CLEANERS[table_name]
+    kwargs = {'as_of': as_of} if table_name in DATED_CLEANERS else {}
+    for chunk in chunks:
+        yield cleaner(chunk, **kwargs)
+
+def concat_chunks(chunks):
+    """
+    STREAMING: One frame from cleaned chunks, typed like the table read whole
+    (each chunk infers its own categories; they are widened to their sorted union before concatenating)
+    """
+    chunks = list(chunks)
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([c[col] for c in chunks], sort_categories=True).categories
+            for i, c in enumerate(chunks):
+                chunks[i] = c.assign(**{col: c[col].cat.set_categories(categories)})
+    return pd.concat(chunks)
+
 # ==========================================
 #      PART 2: AGGREGATION LOGIC
 # ==========================================
 
-def create_dept_summary(emp_df, proj_df, dept_df):
-    """ Aggregation 1: Department Summary """
+REVIEW_STATS_COLUMNS = ['employee_id', 'avg_rating', 'review_count', 'first_rating', 'previous_rating',
+                        'latest_rating', 'latest_review_date', 'rating_trend']
+
+def _is_sorted_by(df, columns):
+    """ O(n) check that a frame is already in ascending order of the given columns """
+    return pd.MultiIndex.from_frame(df[columns]).is_monotonic_increasing
+
+def compute_review_stats(rev_df):
+    """
+    Review Statistics: every per-employee figure from one sorted pass over the reviews
+    (avg, count, first / previous / latest rating, latest date, trend = latest - previous).
+    The reviews are only sorted if they are not already in (employee_id, review_date) order.
+    """
+    if rev_df.empty:
+        return pd.DataFrame(columns=REVIEW_STATS_COLUMNS)
+
+    ordered = rev_df
+    if not _is_sorted_by(rev_df, ['employee_id', 'review_date']):
+        ordered = rev_df.sort_values(['employee_id', 'review_date'], kind='stable')
+
+    # Rating of the review before each row, for the same employee
+    same_emp = ordered['employee_id'].eq(ordered['employee_id'].shift())
+    previous = ordered['rating'].shift().where(same_emp)
+
+    stats = ordered[['employee_id', 'rating', 'review_date']].assign(previous_rating=previous) \
+        .groupby('employee_id', sort=False).agg(
+            avg_rating=('rating', 'mean'),
+            review_count=('rating', 'count'),
+            first_rating=('rating', 'first'),
+            previous_rating=('previous_rating', 'last'),
+            latest_rating=('rating', 'last'),
+            latest_review_date=('review_date', 'last')
+        ).reset_index()
+    stats['rating_trend'] = stats['latest_rating'] - stats['previous_rating']
+    return stats[REVIEW_STATS_COLUMNS]
+
+# Summary measures, as mergeable partial aggregates: {column: (source column, kind)}
+DEPT_EMPLOYEE_MEASURES = {
+    'total_employees': ('employee_id', 'count'),
+    'avg_salary': ('salary', 'mean'),
+}
+DEPT_PROJECT_MEASURES = {
+    'active_projects': ('project_id', 'count'),
+    'total_budget': ('budget', 'sum'),
+}
+EMP_REVIEW_MEASURES = {
+    'avg_rating': ('rating', 'mean'),
+    'review_count': ('rating', 'count'),
+    'latest_rating': ('rating', 'last'),
+    'latest_review_date': ('review_date', 'last'),
+}
+PROJECT_ASSIGNMENT_MEASURES = {
+    'total_team_size': ('employee_id', 'distinct'),
+    'total_allocation': ('allocation_percentage', 'sum'),
+    'avg_allocation': ('allocation_percentage', 'mean'),
+}
+
+def _as_chunks(data):
+    """ A table given whole (DataFrame) or as an iterable of row chunks, as a sequence of chunks """
+    return [data] if isinstance(data, pd.DataFrame) else data
+
+def dept_summary_aggregates(emp_df, proj_df, as_of=None):
+    """ Mergeable employee and active-project aggregates per department as of a date (inputs may be chunked) """
+    emp_agg = PartialAggregate('department_id', DEPT_EMPLOYEE_MEASURES)
+    for chunk in _as_chunks(emp_df):
+        emp_agg.update(hired_employees(chunk, as_of))
+
+    proj_agg = PartialAggregate('department_id', DEPT_PROJECT_MEASURES)
+    for chunk in _as_chunks(proj_df):
+        proj_agg.update(active_projects(chunk, as_of))
+    return emp_agg, proj_agg
+
+def hired_employees(emp_df, as_of=None):
+    """ Employees counted by the department summary: hired on or before as_of (None = today) or no hire date """
+    if 'hire_date' not in emp_df.columns:
+        return emp_df
+    return emp_df[(emp_df['hire_date'].isna()) | (emp_df['hire_date'] <= reference_date(as_of))]
+
+def active_projects(proj_df, as_of=None):
+    """ Projects counted by the department summary: started and not ended yet as of as_of (None = today) """
+    if 'department_id' not in proj_df.columns:
+        return proj_df.iloc[0:0]
+    today = reference_date(as_of)
+    active_mask = (proj_df['end_date'].isna()) | (proj_df['end_date'] > today)
+    if 'start_date' in proj_df.columns:
+        active_mask &= (proj_df['start_date'].isna()) | (proj_df['start_date'] <= today)
+    return proj_df[active_mask]
+
+def _next_tenure_change(hire_dates, today):
+    """ First date after today on which a tenure_years value changes (a hire gets one, or a rounded tenure moves) """
+    hires = pd.to_datetime(hire_dates).dropna()
+    if hires.empty:
+        return None
+    days = (today - hires).dt.days.to_numpy()
+    tenure = np.round(days / 365.25, 1)
+    # The rounded tenure moves around (tenure + 0.05) years: the first later day count that rounds differently
+    candidates = np.floor((tenure + 0.05) * 365.25).astype('int64')[:, None] + np.arange(-1, 3)
+    moves = (candidates > days[:, None]) & (np.round(candidates / 365.25, 1) != tenure[:, None])
+    next_days = np.where(days < 0, 0, candidates[np.arange(len(days)), moves.argmax(axis=1)])
+    return (hires + pd.to_timedelta(next_days, unit='D')).min()
+
+def _next_date(*dates):
+    """ Earliest of the given date Series (None when all are empty) """
+    dates = pd.concat([pd.to_datetime(d) for d in dates]).dropna()
+    return dates.min() if not dates.empty else None
+
+def as_of_horizons(as_of, emp_df=None, proj_df=None, assign_df=None):
+    """
+    For the output tables with date-dependent figures, the first date after as_of on which they
+    would change (None = never, for the given rows). Built from the cleaned employees, projects
+    and assignments; a table is left out when its inputs are not given.
+      dim_employees: a tenure_years value changes (rounded to 0.1 year; future hires get one on their hire date)
+      summary_dept_metrics: an employee is hired, a project starts or ends (hired_employees, active_projects)
+      summary_manager_rollup: an assignment starts or has ended (create_manager_rollup)
+    """
+    today = reference_date(as_of)
+    later = lambda dates: dates[dates > today]
+    horizons = {}
+    if emp_df is not None and 'hire_date' in emp_df.columns:
+        horizons['dim_employees'] = _next_tenure_change(emp_df['hire_date'], today)
+    if emp_df is not None and proj_df is not None:
+        columns = [emp_df[c] for c in ['hire_date'] if c in emp_df.columns] + \
+                  [proj_df[c] for c in ['start_date', 'end_date'] if c in proj_df.columns]
+        horizons['summary_dept_metrics'] = _next_date(*[later(pd.to_datetime(c)) for c in columns]) if columns else None
+    if assign_df is not None:
+        ends = pd.to_datetime(assign_df['end_date'])
+        horizons['summary_manager_rollup'] = _next_date(later(pd.to_datetime(assign_df['start_date'])),
+                                                        ends[ends >= today] + pd.Timedelta(days=1))
+    return horizons
+
+def create_dept_summary(emp_df, proj_df, dept_df, key_index=None, as_of=None):
+    """
+    Aggregation 1: Department Summary (key_index: the run's KeyIndex, built from dept_df if not given)
+    emp_df and proj_df may be DataFrames or iterables of chunks.
+    as_of: reference date for headcount and active projects (None = today)
+    """
+    emp_agg, proj_agg = dept_summary_aggregates(emp_df, proj_df, as_of)
+    return finish_dept_summary(dept_df, emp_agg.result(), proj_agg.result(), key_index)
+
+def finish_dept_summary(dept_df, emp_stats, proj_stats, key_index=None):
+    """ Department Summary rows for dept_df from per-department stats (PartialAggregate results) """
     
     # --- FIX START: Smarter Column Handling ---
     # Check what the department name column is actually called in the CSV
@@ -111,26 +365,16 @@ def create_dept_summary(emp_df, proj_df, dept_df):
         summary['department_name'] = 'Unknown'
     # --- FIX END ---
 
-    # Employee Stats
-    emp_stats = emp_df.groupby('department_id').agg(
-        total_employees=('employee_id', 'count'),
-        avg_salary=('salary', 'mean')
-    ).reset_index()
-
-    # Project Stats
-    if 'department_id' in proj_df.columns:
-        today = pd.Timestamp.today()
-        active_mask = (proj_df['end_date'].isna()) | (proj_df['end_date'] > today)
-        proj_stats = proj_df[active_mask].groupby('department_id').agg(
-            active_projects=('project_id', 'count'),
-            total_budget=('budget', 'sum')
-        ).reset_index()
-    else:
-        proj_stats = pd.DataFrame(columns=['department_id', 'active_projects', 'total_budget'])
-
-    # Merge
-    final_df = summary.merge(emp_stats, on='department_id', how='left')
-    final_df = final_df.merge(proj_stats, on='department_id', how='left')
+    # Join by array lookup on the dense department positions
+    if key_index is None or 'department_id' not in key_index:
+        key_index = KeyIndex(dept_df=dept_df)
+    dept_space = key_index.space('department_id')
+    summary = summary.reset_index(drop=True)
+    final_df = pd.concat([
+        summary,
+        dept_space.take(emp_stats, summary['department_id']),
+        dept_space.take(proj_stats, summary['department_id'])
+    ], axis=1)
 
     # FIX: Explicitly infer types before filling to silence FutureWarning
     pd.set_option('future.no_silent_downcasting', True) # Optional safety
@@ -146,36 +390,39 @@ def create_dept_summary(emp_df, proj_df, dept_df):
         
     return final_df
 
-def create_emp_performance(emp_df, rev_df, dept_df):
-    """ Aggregation 2: Employee Performance Summary """
-    base_emp = emp_df[['employee_id', 'name', 'department_id']]
-    
-    # Handle Department Name Column
-    if 'name' in dept_df.columns:
-        depts = dept_df[['department_id', 'name']].rename(columns={'name': 'department_name'})
-    elif 'department_name' in dept_df.columns:
-        depts = dept_df[['department_id', 'department_name']]
+def employee_review_aggregate(rev_df):
+    """ Mergeable review aggregate per employee (rev_df may be chunked, in file order) """
+    rev_agg = PartialAggregate('employee_id', EMP_REVIEW_MEASURES, order_by='review_date')
+    for chunk in _as_chunks(rev_df):
+        rev_agg.update(chunk)
+    return rev_agg
+
+def create_emp_performance(emp_df, rev_df, dept_df, review_stats=None, key_index=None):
+    """
+    Aggregation 2: Employee Performance Summary (review_stats: output of compute_review_stats, if already built)
+    rev_df may be a DataFrame or an iterable of chunks in file order.
+    """
+    # Calculate Review Stats (reused from cleaning when available)
+    if review_stats is not None:
+        rev_stats = review_stats.set_index('employee_id')[list(EMP_REVIEW_MEASURES)]
     else:
-        depts = dept_df[['department_id']]
-        depts['department_name'] = 'Unknown'
-
-    # Merge Departments onto Employees
-    base_emp = base_emp.merge(depts, on='department_id', how='left')
+        rev_stats = employee_review_aggregate(rev_df).result()
+    return finish_emp_performance(emp_df, dept_df, rev_stats, key_index)
 
-    # ### NEW FIX: Fill 'Ghost' Departments with 'Unknown' ###
-    # This catches employees whose department_id does not exist in the departments file
-    base_emp['department_name'] = base_emp['department_name'].fillna('Unknown')
+def finish_emp_performance(emp_df, dept_df, rev_stats, key_index=None):
+    """ Employee Performance rows for emp_df from per-employee review stats """
+    base_emp = emp_df[['employee_id', 'name', 'department_id']].reset_index(drop=True)
+    
+    if key_index is None or 'department_id' not in key_index:
+        key_index = KeyIndex(dept_df=dept_df)
 
-    # Calculate Review Stats
-    rev_stats = rev_df.sort_values('review_date').groupby('employee_id').agg(
-        avg_rating=('rating', 'mean'),
-        review_count=('rating', 'count'),
-        latest_rating=('rating', 'last'),
-        latest_review_date=('review_date', 'max')
-    ).reset_index()
+    # Department name by array lookup
+    # 'Ghost' departments (department_id not in the departments file) come back as 'Unknown'
+    base_emp['department_name'] = key_index.department_name(base_emp['department_id']).to_numpy()
 
-    # Merge Stats onto Employees
-    final_df = base_emp.merge(rev_stats, on='employee_id', how='left')
+    # Line Stats up with Employees
+    emp_space = key_index.space('employee_id') if 'employee_id' in key_index else KeySpace(base_emp['employee_id'])
+    final_df = pd.concat([base_emp, emp_space.take(rev_stats, base_emp['employee_id'])], axis=1)
 
     # Clean up
     final_df['avg_rating'] = final_df['avg_rating'].round(2)
@@ -185,26 +432,315 @@ def create_emp_performance(emp_df, rev_df, dept_df):
     existing_cols = [c for c in cols if c in final_df.columns]
     return final_df[existing_cols]
 
-def create_project_workload(proj_df, assign_df):
-    """ Aggregation 3: Project Workload Summary """
+def create_project_workload(proj_df, assign_df, key_index=None):
+    """ Aggregation 3: Project Workload Summary (assign_df may be a DataFrame or an iterable of chunks) """
     if 'project_name' in proj_df.columns:
         base_proj = proj_df[['project_id', 'project_name']]
     else:
         base_proj = proj_df[['project_id']]
+    base_proj = base_proj.reset_index(drop=True)
 
-    workload_stats = assign_df.groupby('project_id').agg(
-        total_team_size=('employee_id', 'nunique'),
-        total_allocation=('allocation_percentage', 'sum'),
-        avg_allocation=('allocation_percentage', 'mean')
-    ).reset_index()
+    workload_agg = PartialAggregate('project_id', PROJECT_ASSIGNMENT_MEASURES)
+    for chunk in _as_chunks(assign_df):
+        workload_agg.update(chunk)
+    workload_stats = workload_agg.result()
 
-    final_df = base_proj.merge(workload_stats, on='project_id', how='left')
+    proj_space = key_index.space('project_id') if key_index is not None and 'project_id' in key_index \
+        else KeySpace(base_proj['project_id'])
+    final_df = pd.concat([base_proj, proj_space.take(workload_stats, base_proj['project_id'])], axis=1)
     final_df = final_df.fillna({'total_team_size': 0, 'total_allocation': 0, 'avg_allocation': 0})
     final_df['total_team_size'] = final_df['total_team_size'].astype(int)
     final_df['avg_allocation'] = final_df['avg_allocation'].round(1)
 
     return final_df
 
+# Over-allocation threshold for the allocation timeline (percent of one employee)
+MAX_ALLOCATION = 100
+
+def allocation_timeline(assign_df):
+    """
+    Aggregation 4: each employee's allocation over time, by one sweep over the assignment intervals.
+    Every assignment adds its allocation_percentage on start_date and removes it the day after
+    end_date (dates are inclusive; a missing end_date is open-ended). Sorting the events and taking
+    a running sum per employee gives all allocation levels in O(n log n), without comparing
+    assignments pairwise.
+    Returns one row per segment of constant allocation:
+    employee_id, segment_start, segment_end (NaT = open-ended), allocation.
+    """
+    rows = assign_df[assign_df['employee_id'].notna() & assign_df['start_date'].notna()
+                     & assign_df['allocation_percentage'].notna()]
+    allocation = rows['allocation_percentage'].astype('float64')
+    ended = rows['end_date'].notna()
+    events = pd.DataFrame({
+        'employee_id': pd.concat([rows['employee_id'], rows.loc[ended, 'employee_id']], ignore_index=True),
+        'date': pd.concat([rows['start_date'], rows.loc[ended, 'end_date'] + pd.Timedelta(days=1)],
+                          ignore_index=True),
+        'change': pd.concat([allocation, -allocation[ended]], ignore_index=True),
+    })
+
+    # Same-day events net out first; the sort is the only super-linear step
+    events = events.groupby(['employee_id', 'date'], sort=True)['change'].sum().reset_index()
+    by_employee = events.groupby('employee_id', sort=False)
+    timeline = pd.DataFrame({
+        'employee_id': events['employee_id'],
+        'segment_start': events['date'],
+        'segment_end': by_employee['date'].shift(-1) - pd.Timedelta(days=1),
+        'allocation': by_employee['change'].cumsum().round(6),
+    })
+    # Gaps between assignments are not segments
+    return timeline[timeline['allocation'] != 0].reset_index(drop=True)
+
+def _over_allocated(timeline, max_allocation):
+    """ Over-allocated segments, numbered by period (a run of back-to-back over-allocated segments) """
+    over = timeline['allocation'] > max_allocation
+    same_employee = timeline['employee_id'].eq(timeline['employee_id'].shift())
+    back_to_back = timeline['segment_start'].eq(timeline['segment_end'].shift() + pd.Timedelta(days=1))
+    continues = over & over.shift(fill_value=False) & same_employee & back_to_back
+    period = (over & ~continues).cumsum()
+    return timeline[over].assign(period=period[over])
+
+def create_over_allocation(timeline, max_allocation=MAX_ALLOCATION):
+    """
+    Over-allocated periods from allocation_timeline: employee_id, period_start, period_end
+    (NaT = still open), peak_allocation and days (missing while open).
+    """
+    segments = _over_allocated(timeline, max_allocation)
+    periods = segments.groupby('period', sort=True).agg(
+        employee_id=('employee_id', 'first'),
+        period_start=('segment_start', 'first'),
+        period_end=('segment_end', 'last'),
+        peak_allocation=('allocation', 'max'),
+    ).reset_index(drop=True)
+    periods['days'] = ((periods['period_end'] - periods['period_start']).dt.days + 1).astype('Int64')
+    return periods
+
+def create_allocation_summary(timeline, max_allocation=MAX_ALLOCATION):
+    """
+    Employee Allocation Summary from allocation_timeline: peak utilization per employee (first segment
+    at the peak) and the number of over-allocated periods.
+    """
+    peaks = timeline.sort_values(['employee_id', 'allocation'], ascending=[True, False], kind='stable')
+    peaks = peaks.drop_duplicates('employee_id').rename(columns={
+        'allocation': 'peak_allocation', 'segment_start': 'peak_start_date', 'segment_end': 'peak_end_date'})
+    periods = _over_allocated(timeline, max_allocation).groupby('employee_id')['period'].nunique()
+
+    final_df = peaks[['employee_id', 'peak_allocation', 'peak_start_date', 'peak_end_date']].reset_index(drop=True)
+    final_df['over_allocated_periods'] = final_df['employee_id'].map(periods).fillna(0).astype(int)
+    return final_df
+
+def create_dept_snapshots(emp_df, proj_df, dept_df, dates, assign_df=None):
+    """
+    Aggregation 5: Department Summary as of every date in dates, in one batch (one row per date and
+    department). Each date's rows equal create_dept_summary(..., as_of=date), plus avg_tenure_years
+    and, with assign_df, active_assignments (assignments of the department's employees).
+    Employees, projects and assignments go into TemporalIndexes once; each date is then a lookup.
+    """
+    hire_days = (emp_df['hire_date'] - pd.Timestamp(0)).dt.days
+    employees = TemporalIndex(emp_df['hire_date'], pd.Series(pd.NaT, index=emp_df.index), emp_df['department_id'],
+                              weights={'salary': emp_df['salary'], 'salaried': emp_df['salary'].notna(),
+                                       'hire_days': hire_days, 'dated': hire_days.notna()})
+    projects = TemporalIndex(proj_df['start_date'], proj_df['end_date'], proj_df['department_id'],
+                             weights={'budget': proj_df['budget']}, end_inclusive=False)
+    emp_active = employees.active(dates)
+    proj_active = projects.active(dates)
+    if assign_df is not None:
+        emp_dept = emp_df.drop_duplicates('employee_id').set_index('employee_id')['department_id']
+        assignments = TemporalIndex(assign_df['start_date'], assign_df['end_date'],
+                                    emp_dept.reindex(assign_df['employee_id'].to_numpy()).to_numpy())
+        ass_active = assignments.active(dates)
+
+    def on(active, date):
+        return active[active.index.get_level_values('as_of') == date].droplevel('as_of')
+
+    snapshots = []
+    for date in pd.DatetimeIndex(pd.to_datetime(list(dates))).unique():
+        emp = on(emp_active, date)
+        proj = on(proj_active, date)
+        avg_salary = (emp['salary'] / emp['salaried']).where(emp['salaried'] > 0)
+        if isinstance(emp_df['salary'].dtype, pd.api.extensions.ExtensionDtype):
+            avg_salary = avg_salary.astype('Float64')  # nullable salaries average to Float64 in the summary
+        emp_stats = pd.DataFrame({'total_employees': emp['count'], 'avg_salary': avg_salary})
+        proj_stats = pd.DataFrame({'active_projects': proj['count'], 'total_budget': proj['budget']})
+        summary = finish_dept_summary(dept_df, emp_stats, proj_stats)
+
+        # Mean of (date - hire_date) over the employees hired by then
+        date_days = (date - pd.Timestamp(0)).days
+        tenure = ((emp['dated'] * date_days - emp['hire_days']) / emp['dated'] / 365.25).where(emp['dated'] > 0)
+        summary['avg_tenure_years'] = tenure.reindex(summary['department_id']).round(1).to_numpy()
+        if assign_df is not None:
+            active = on(ass_active, date)['count']
+            summary['active_assignments'] = active.reindex(summary['department_id'], fill_value=0).to_numpy()
+        summary.insert(0, 'as_of', date)
+        snapshots.append(summary)
+    return pd.concat(snapshots, ignore_index=True)
+
+def create_manager_rollup(emp_df, ratings, assign_df, hierarchy, as_of=None):
+    """
+    Aggregation 6: Manager Rollup, one row per employee with direct reports (span of control).
+    Team figures cover everyone below the manager: headcount, salary total, average rating
+    (ratings: employee_id + avg_rating, e.g. compute_review_stats or summary_emp_performance;
+    rated members only, each rounded like summary_emp_performance) and the allocation of the
+    assignments active as of as_of (None = today). Each figure is a range sum over the
+    hierarchy's Euler tour, so a manager's rollup costs the same at any depth.
+    """
+    first = emp_df[emp_df['employee_id'].notna()].drop_duplicates('employee_id').reset_index(drop=True)
+    salary = hierarchy.values_of(first['employee_id'], first['salary'])
+    rating = hierarchy.values_of(ratings['employee_id'], ratings['avg_rating'].round(2))
+
+    today = reference_date(as_of)
+    active = assign_df[(assign_df['start_date'] <= today)
+                       & (assign_df['end_date'].isna() | (assign_df['end_date'] >= today))]
+    allocation = active.groupby('employee_id')['allocation_percentage'].sum()
+    allocation = hierarchy.values_of(allocation.index, allocation)
+
+    def team_sum(values):
+        """ Subtree sum without the manager's own value """
+        return hierarchy.subtree_sum(values) - np.nan_to_num(values)
+
+    headcount = hierarchy.size - 1
+    rated = team_sum(~np.isnan(rating))
+    team_allocation = team_sum(allocation)
+    managers = np.flatnonzero(hierarchy.direct_reports > 0)
+
+    final_df = first.iloc[managers][['employee_id', 'name', 'department_id']].reset_index(drop=True)
+    final_df = final_df.rename(columns={'employee_id': 'manager_id'})
+    final_df['level'] = hierarchy.depth[managers]
+    final_df['direct_reports'] = hierarchy.direct_reports[managers]
+    final_df['team_headcount'] = headcount[managers]
+    final_df['team_salary_total'] = team_sum(salary)[managers]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        final_df['team_avg_rating'] = np.round(team_sum(rating)[managers] / rated[managers], 2)
+    final_df['team_allocation'] = team_allocation[managers]
+    final_df['team_avg_allocation'] = np.round(team_allocation[managers] / headcount[managers], 1)
+    return final_df
+
+# Dimensions of the review cube; grouping_id has one bit per dimension (first = highest), like SQL GROUPING_ID
+CUBE_DIMENSIONS = ['department_id', 'salary_bucket', 'performance_category', 'review_month']
+
+def grouping_id(kept_dimensions, dimensions=CUBE_DIMENSIONS):
+    """ grouping_id of the cube level that keeps the given dimensions (the rolled-up ones have their bit set) """
+    return sum(1 << (len(dimensions) - 1 - i) for i, dim in enumerate(dimensions) if dim not in kept_dimensions)
+
+def cube_level(cube, kept_dimensions):
+    """ Rows of one grouping set of a cube, e.g. cube_level(cube, ['department_id']) = per-department totals """
+    return cube[cube['grouping_id'] == grouping_id(kept_dimensions)]
+
+def _group(frame, keys, **aggregations):
+    """ groupby(keys).agg(...) that keeps missing keys; no keys = one grand-total row """
+    if not keys:
+        return frame.assign(_all=0).groupby('_all').agg(**aggregations).reset_index(drop=True)
+    return frame.groupby(keys, dropna=False, observed=True, sort=True).agg(**aggregations).reset_index()
+
+def create_review_cube(emp_df, rev_df, key_index=None):
+    """
+    Aggregation 7: Review Cube. Reviews by department_id x salary_bucket x performance_category x
+    review_month ('YYYY-MM'), with every subtotal level: all 16 grouping sets, a rolled-up
+    dimension being NULL with its bit set in grouping_id.
+    Measures: review_count, rating_sum, avg_rating, employee_count (distinct reviewed employees)
+    and avg_salary (of those employees).
+    Counts and sums roll up from the finest cells; distinct employees from (cell, employee) pairs.
+    """
+    employees = emp_df[emp_df['employee_id'].notna()].drop_duplicates('employee_id')
+    emp_space = key_index.space('employee_id') if key_index is not None and 'employee_id' in key_index \
+        else KeySpace(employees['employee_id'])
+    emp_attrs = employees.set_index('employee_id')[['department_id', 'salary_bucket', 'salary']]
+    rows = emp_space.take(emp_attrs, rev_df['employee_id']).assign(
+        performance_category=rev_df['performance_category'].to_numpy(),
+        review_month=rev_df['review_date'].dt.strftime('%Y-%m').to_numpy(),
+        employee_id=rev_df['employee_id'].to_numpy(),
+        rating=rev_df['rating'].to_numpy(),
+    )
+    finest = _group(rows, CUBE_DIMENSIONS, review_count=('rating', 'count'), rating_sum=('rating', 'sum'))
+    pairs = rows.drop_duplicates(CUBE_DIMENSIONS + ['employee_id'])
+
+    levels = []
+    for gid in range(1 << len(CUBE_DIMENSIONS)):
+        kept = [dim for i, dim in enumerate(CUBE_DIMENSIONS) if not gid & (1 << (len(CUBE_DIMENSIONS) - 1 - i))]
+        additive = _group(finest, kept, review_count=('review_count', 'sum'), rating_sum=('rating_sum', 'sum'))
+        distinct = _group(pairs.drop_duplicates(kept + ['employee_id']), kept,
+                          employee_count=('employee_id', 'count'), avg_salary=('salary', 'mean'))
+        # Same keys in the same (sorted) order on both sides
+        level = pd.concat([additive, distinct.drop(columns=kept)], axis=1)
+        level.insert(0, 'grouping_id', gid)
+        levels.append(level)
+
+    cube = pd.concat(levels, ignore_index=True)
+    cube = cube[['grouping_id'] + CUBE_DIMENSIONS + ['review_count', 'rating_sum', 'employee_count', 'avg_salary']]
+    cube.insert(cube.columns.get_loc('employee_count'), 'avg_rating',
+                (cube['rating_sum'] / cube['review_count']).where(cube['review_count'] > 0).round(2))
+    cube['department_id'] = cube['department_id'].astype('Int64')
+    cube['rating_sum'] = cube['rating_sum'].round(2)
+    cube['avg_salary'] = cube['avg_salary'].astype('float64').round(2)
+    return cube
+
+# ==========================================
+#      PART 3: MEMORY COMPACTION
+# ==========================================
+
+_NULLABLE_INT_TYPES = ['Int8', 'Int16', 'Int32', 'Int64']
+
+# 0/1 indicator columns (float when a value is missing)
+FLAG_COLUMNS = ['bonus_eligible']
+
+def _smallest_nullable_int(values):
+    """ Smallest nullable integer dtype holding all non-null values """
+    non_null = values.dropna()
+    if non_null.empty:
+        return 'Int8'
+    low, high = non_null.min(), non_null.max()
+    for dtype in _NULLABLE_INT_TYPES:
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return dtype
+    return 'Int64'
+
+def compact_frame(df, max_category_ratio=0.5):
+    """
+    Shrinks a cleaned table without changing its values:
+      - low-cardinality strings -> category (only if that actually saves memory)
+      - integer ids, counts and 0/1 flags -> smallest safe integer type
+      - float ids and FLAG_COLUMNS that only hold whole numbers (NaN-promoted) -> nullable integers
+    Floating point measures (salary averages, ratings, budgets) are left alone.
+    """
+    compacted = {}
+    for col in df.columns:
+        series = df[col]
+        dtype = series.dtype
+
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(dtype) \
+                or pd.api.types.is_datetime64_any_dtype(dtype):
+            continue
+
+        if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            if len(series) and series.nunique(dropna=True) <= max_category_ratio * len(series):
+                as_category = series.astype('category')
+                if frame_memory_bytes(as_category.to_frame()) < frame_memory_bytes(series.to_frame()):
+                    compacted[col] = as_category
+
+        elif pd.api.types.is_extension_array_dtype(dtype) and pd.api.types.is_integer_dtype(dtype):
+            compacted[col] = series.astype(_smallest_nullable_int(series))
+
+        elif pd.api.types.is_integer_dtype(dtype):
+            compacted[col] = pd.to_numeric(series, downcast='integer')
+
+        elif pd.api.types.is_float_dtype(dtype):
+            if col.endswith('_id') or col in FLAG_COLUMNS:
+                non_null = series.dropna()
+                if non_null.empty or bool((non_null == np.floor(non_null)).all()):
+                    compacted[col] = series.astype(_smallest_nullable_int(series))
+
+    return df.assign(**compacted) if compacted else df
+
+def compact_tables(data_dict, max_category_ratio=0.5):
+    """ Compacts every table of the run; returns the new tables and {table: (bytes_before, bytes_after)} """
+    compacted = {}
+    report = {}
+    for table, df in data_dict.items():
+        before = frame_memory_bytes(df)
+        compacted[table] = compact_frame(df, max_category_ratio)
+        report[table] = (before, frame_memory_bytes(compacted[table]))
+    return compacted, report
+
 # ==========================================
 #      MAIN EXECUTION
 # ==========================================
@@ -1,4 +1,8 @@
+import time
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from integrity import find_violations
 
 # ==========================================
 #      GENERIC CHECK FUNCTIONS
@@ -25,25 +29,42 @@ def check_completeness(df, table_name, pk, required_cols):
             
     return issues
 
-def check_consistency(child_df, child_fk, parent_df, parent_pk, table_name, parent_name):
-    """ Checks if Foreign Keys exist in the Parent Table """
+def check_consistency(child_df, child_fk, parent_df, parent_pk, table_name, parent_name, key_index=None,
+                      violations=None):
+    """
+    Checks if Foreign Keys exist in the Parent Table.
+    child_fk / parent_pk may be lists of columns (composite keys).
+    violations: optional dict that receives the integrity.Violations (offending rows and keys) under table_name.
+    """
     issues = []
-    if child_fk in child_df.columns and parent_pk in parent_df.columns:
+    fk_cols = [child_fk] if isinstance(child_fk, str) else list(child_fk)
+    pk_cols = [parent_pk] if isinstance(parent_pk, str) else list(parent_pk)
+    if set(fk_cols) <= set(child_df.columns) and set(pk_cols) <= set(parent_df.columns):
         # Find values in child that are NOT in parent
-        # We assume -1 or NaN are "unassigned" and ignore them for this check if desired,
-        # but strict consistency usually demands valid keys.
+        # We assume -1 is "unassigned" and ignore it for this check,
+        # but strict consistency usually demands valid keys (NaN counts as invalid).
+        found = _fk_violations(child_df, fk_cols, parent_df, pk_cols, key_index)
+        if violations is not None:
+            violations[table_name] = found
         
-        # Get unique foreign keys from child (excluding -1 if you used that for nulls)
-        child_keys = child_df[child_df[child_fk] != -1][child_fk].unique()
-        parent_keys = parent_df[parent_pk].unique()
-        
-        # Check for invalid keys
-        invalid_keys = [k for k in child_keys if k not in parent_keys]
-        
-        if invalid_keys:
-            issues.append(f"[{table_name}] Consistency Error: {len(invalid_keys)} {child_fk} values do not exist in {parent_name}.")
+        if len(found) > 0:
+            issues.append(_consistency_issue(table_name, child_fk, parent_name, found))
     return issues
 
+def _fk_violations(child_df, fk_cols, parent_df, pk_cols, key_index=None):
+    """ integrity.Violations of one foreign key (parent ids from the run's shared KeySpace when available) """
+    key_space = None
+    if key_index is not None and len(pk_cols) == 1 and pk_cols[0] in key_index:
+        key_space = key_index.space(pk_cols[0])
+    return find_violations(child_df, fk_cols, parent_df, pk_cols, key_space=key_space)
+
+def _consistency_issue(table_name, child_fk, parent_name, found):
+    invalid_keys = found.distinct_keys()
+    examples = ', '.join(str(tuple(row)) if invalid_keys.shape[1] > 1 else str(row[0])
+                         for row in invalid_keys.head(5).itertuples(index=False))
+    return (f"[{table_name}] Consistency Error: {len(invalid_keys)} {child_fk} values do not exist in {parent_name} "
+            f"({len(found)} rows, e.g. {examples}).")
+
 def check_accuracy(df, table_name, condition, error_msg):
     """ Checks if rows meet a specific logical condition """
     issues = []
@@ -51,85 +72,257 @@ def check_accuracy(df, table_name, condition, error_msg):
     # We pass the condition mask directly.
     # Example: df['salary'] > 0
     
-    failed_rows = df[~condition]
-    if not failed_rows.empty:
-        issues.append(f"[{table_name}] Accuracy Error: {len(failed_rows)} rows failed check: {error_msg}")
+    # Comparisons on nullable columns give <NA>: a missing value does not pass the check
+    condition = condition.fillna(False).astype(bool)
+    n_failed = int((~condition).sum())
+    if n_failed:
+        issues.append(f"[{table_name}] Accuracy Error: {n_failed} rows failed check: {error_msg}")
     return issues
 
+# ==========================================
+#      DECLARATIVE TABLE RULES
+# ==========================================
+
+# The checks of every table, as data. Each rule marks the rows that fail it:
+#   not_null     value is missing ('required': a missing column fails every row)
+#   unique       value repeats an earlier row
+#   in_set       value is not one of 'values' (missing values fail)
+#   range        value outside 'min' / 'max' (inclusive unless 'min_inclusive' / 'max_inclusive' is False)
+#   foreign_key  value has no row in the 'parent' table ('parent_column'); -1 means unassigned
+# 'when' limits a rule to the rows with the given column values; with 'optional', missing values pass.
+# 'message' is the issue text ({failed} = number of failing rows).
+def _primary_key(table, pk):
+    return [
+        {'id': f'{table}.pk_not_null', 'kind': 'not_null', 'column': pk,
+         'message': f"Found NULL values in Primary Key: {pk}"},
+        {'id': f'{table}.pk_unique', 'kind': 'unique', 'column': pk,
+         'message': f"Found DUPLICATE values in Primary Key: {pk}"},
+    ]
+
+def _required(table, columns):
+    return [{'id': f'{table}.{col}_not_null', 'kind': 'not_null', 'column': col, 'required': True,
+             'message': f"Found NULL values in required column: {col}"} for col in columns]
+
+TABLE_RULES = {
+    'Employees': [
+        *_primary_key('employees', 'employee_id'),
+        *_required('employees', ['name', 'salary', 'hire_date']),
+        {'id': 'employees.department_fk', 'kind': 'foreign_key', 'column': 'department_id',
+         'parent': 'Departments', 'parent_column': 'department_id'},
+        {'id': 'employees.status_valid', 'kind': 'in_set', 'column': 'status',
+         'values': ['active', 'inactive', 'terminated', 'leave'],
+         'message': "Validity Error: Found invalid status values."},
+        # Only active employees must be paid (inactive ones may have a 0 salary)
+        {'id': 'employees.active_salary_positive', 'kind': 'range', 'column': 'salary', 'min': 0,
+         'min_inclusive': False, 'optional': True, 'when': {'status': 'active'},
+         'message': "Accuracy Error: Active employees found with Salary <= 0"},
+    ],
+    'Reviews': [
+        *_primary_key('reviews', 'review_id'),
+        *_required('reviews', ['employee_id', 'rating', 'review_date']),
+        {'id': 'reviews.employee_fk', 'kind': 'foreign_key', 'column': 'employee_id',
+         'parent': 'Employees', 'parent_column': 'employee_id'},
+        {'id': 'reviews.rating_range', 'kind': 'range', 'column': 'rating', 'min': 1.0, 'max': 5.0,
+         'message': "Accuracy Error: {failed} rows failed check: Rating must be between 1.0 and 5.0"},
+    ],
+    'Assignments': [
+        {'id': 'assignments.project_fk', 'kind': 'foreign_key', 'column': 'project_id',
+         'parent': 'Projects', 'parent_column': 'project_id'},
+        {'id': 'assignments.employee_fk', 'kind': 'foreign_key', 'column': 'employee_id',
+         'parent': 'Employees', 'parent_column': 'employee_id'},
+        {'id': 'assignments.allocation_range', 'kind': 'range', 'column': 'allocation_percentage', 'min': 0, 'max': 100,
+         'message': "Accuracy Error: {failed} rows failed check: Allocation must be 0-100%"},
+    ],
+    'Projects': [
+        *_primary_key('projects', 'project_id'),
+        *_required('projects', ['project_name', 'start_date']),
+        # Budgets are optional, but positive when given
+        {'id': 'projects.budget_positive', 'kind': 'range', 'column': 'budget', 'min': 0, 'min_inclusive': False,
+         'optional': True, 'message': "Accuracy Error: {failed} rows failed check: Budget must be positive"},
+    ],
+}
+
+# Columns identifying a row of each table (quarantine records, reports)
+TABLE_KEYS = {
+    'Employees': ['employee_id'],
+    'Reviews': ['review_id'],
+    'Assignments': ['employee_id', 'project_id'],
+    'Projects': ['project_id'],
+}
+
+# ==========================================
+#      RULE EVALUATION
+# ==========================================
+
+class _Columns:
+    """
+    Per-column arrays of one table (null mask, float values, duplicate flags, equality masks),
+    computed on first use and shared by every rule on that column, so each column is scanned
+    once however many rules check it.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._arrays = {}
+
+    def get(self, column, what, value=None):
+        key = (column, what, value)
+        if key not in self._arrays:
+            values = self.df[column]
+            if what == 'isna':
+                array = values.isna().to_numpy()
+            elif what == 'float':
+                array = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            elif what == 'duplicated':
+                array = values.duplicated().to_numpy()
+            else:  # 'equals'
+                array = (values == value).fillna(False).to_numpy(dtype=bool)
+            self._arrays[key] = array
+        return self._arrays[key]
+
+def _failures(rule, columns, parents, key_index):
+    """
+    Rows failing one rule (boolean array) and, for foreign keys, the integrity.Violations.
+    None when the rule does not apply to this table (optional column or parent absent).
+    """
+    df = columns.df
+    column = rule['column']
+    if column not in df.columns:
+        return (np.ones(len(df), dtype=bool), None) if rule.get('required') else None
+    if any(col not in df.columns for col in rule.get('when', {})):
+        return None
+
+    kind = rule['kind']
+    found = None
+    if kind == 'not_null':
+        failed = columns.get(column, 'isna')
+    elif kind == 'unique':
+        failed = columns.get(column, 'duplicated')
+    elif kind == 'in_set':
+        failed = ~df[column].isin(rule['values']).to_numpy(dtype=bool)
+    elif kind == 'range':
+        values = columns.get(column, 'float')
+        ok = np.ones(len(df), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            if 'min' in rule:
+                ok &= (values >= rule['min']) if rule.get('min_inclusive', True) else (values > rule['min'])
+            if 'max' in rule:
+                ok &= (values <= rule['max']) if rule.get('max_inclusive', True) else (values < rule['max'])
+        failed = ~ok & ~columns.get(column, 'isna') if rule.get('optional') else ~ok
+    elif kind == 'foreign_key':
+        parent = parents.get(rule['parent'])
+        if parent is None or rule['parent_column'] not in parent.columns:
+            return None
+        found = _fk_violations(df, [column], parent, [rule['parent_column']], key_index)
+        failed = np.zeros(len(df), dtype=bool)
+        failed[found.positions] = True
+    else:
+        raise ValueError(f"Unknown rule kind: {kind}")
+
+    for when_col, value in rule.get('when', {}).items():
+        failed = failed & columns.get(when_col, 'equals', value)
+    return failed, found
+
+def evaluate_rules(table_name, df, parents=None, key_index=None, rules=None):
+    """
+    Runs the rules of one table (TABLE_RULES[table_name] unless given) over shared column arrays.
+    parents: {table name: DataFrame} for the foreign keys; rules without their parent are skipped.
+    Returns (issues, results, failed_rows):
+      issues: the messages of the failed rules
+      results: per rule that ran: table, rule, kind, column, checked / passed / failed row counts, seconds
+      failed_rows: boolean DataFrame (df's index, one column per rule id) of the rows failing each rule
+    """
+    rules = TABLE_RULES.get(table_name, []) if rules is None else rules
+    parents = parents or {}
+    columns = _Columns(df)
+    issues, results, failed_rows = [], [], {}
+
+    for rule in rules:
+        start = time.perf_counter()
+        outcome = _failures(rule, columns, parents, key_index)
+        if outcome is None:
+            continue
+        failed, found = outcome
+        checked = len(df)
+        for when_col, value in rule.get('when', {}).items():
+            checked = int(columns.get(when_col, 'equals', value).sum())
+        n_failed = int(failed.sum())
+
+        if n_failed:
+            if rule['column'] not in df.columns:
+                issues.append(f"[{table_name}] Missing required column: {rule['column']}")
+            elif found is not None:
+                issues.append(_consistency_issue(table_name, rule['column'], rule['parent'], found))
+            else:
+                issues.append(f"[{table_name}] {rule['message'].format(failed=n_failed)}")
+        failed_rows[rule['id']] = failed
+        results.append({'table': table_name, 'rule': rule['id'], 'kind': rule['kind'], 'column': rule['column'],
+                        'checked': checked, 'passed': checked - n_failed, 'failed': n_failed,
+                        'seconds': time.perf_counter() - start})
+
+    return issues, results, pd.DataFrame(failed_rows, index=df.index, dtype=bool)
+
+def validate_tables(tables, key_index=None, max_workers=None):
+    """
+    Validates independent tables concurrently (one thread per table; the rules spend their
+    time in numpy / pandas).
+    tables: {table name: (DataFrame, {parent name: DataFrame})}.
+    Returns {table name: (issues, results, failed_rows)} in the order of `tables`.
+    """
+    workers = max_workers or max(len(tables), 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(_validate_table, name, df, parents, key_index)
+                   for name, (df, parents) in tables.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def _validate_table(table_name, df, parents, key_index):
+    print(f"   Running Validation on {table_name}...")
+    return evaluate_rules(table_name, df, parents, key_index)
+
 # ==========================================
 #      SPECIFIC TABLE VALIDATORS
 # ==========================================
 
-def validate_employees(df, dept_df):
-    errors = []
-    print("   Running Validation on Employees...")
-    
-    # 1. Completeness
-    errors.extend(check_completeness(df, 'Employees', 'employee_id', ['name', 'salary', 'hire_date']))
-    
-    # 2. Consistency (Dept ID must exist in Departments)
-    errors.extend(check_consistency(df, 'department_id', dept_df, 'department_id', 'Employees', 'Departments'))
-    
-    # 3. Validity (Enum check)
-    if 'status' in df.columns:
-        valid_statuses = ['active', 'inactive', 'terminated', 'leave']
-        invalid_mask = ~df['status'].isin(valid_statuses)
-        if invalid_mask.any():
-            errors.append(f"[Employees] Validity Error: Found invalid status values.")
-            
-    # 4. Accuracy (Salary > 0 for active)
-    # Note: We filter for 'active' first to avoid flagging inactive employees with 0 salary if that's allowed
-    if 'salary' in df.columns and 'status' in df.columns:
-        # Check: If status is active, salary must be > 0
-        mask = (df['status'] == 'active') & (df['salary'] <= 0)
-        if mask.any():
-            errors.append("[Employees] Accuracy Error: Active employees found with Salary <= 0")
+def validate_employees(df, dept_df, key_index=None):
+    return _validate_table('Employees', df, {'Departments': dept_df}, key_index)[0]
 
-    return errors
+def validate_reviews(df, emp_df, key_index=None):
+    return _validate_table('Reviews', df, {'Employees': emp_df}, key_index)[0]
+
+def validate_assignments(df, proj_df, emp_df, key_index=None):
+    return _validate_table('Assignments', df, {'Projects': proj_df, 'Employees': emp_df}, key_index)[0]
 
-def validate_reviews(df, emp_df):
+def validate_hierarchy(hierarchy):
+    """ Manager tree problems found while building the run's OrgHierarchy """
     errors = []
-    print("   Running Validation on Reviews...")
+    print("   Running Validation on Manager Hierarchy...")
     
-    # 1. Completeness
-    errors.extend(check_completeness(df, 'Reviews', 'review_id', ['employee_id', 'rating', 'review_date']))
+    # 1. Consistency (every manager must be an employee)
+    if hierarchy.orphan_managers:
+        errors.append(f"[Hierarchy] Consistency Error: {len(hierarchy.orphan_managers)} manager_id values "
+                      f"are not employees: {hierarchy.orphan_managers}")
     
-    # 2. Consistency (Employee ID must exist)
-    errors.extend(check_consistency(df, 'employee_id', emp_df, 'employee_id', 'Reviews', 'Employees'))
-    
-    # 3. Accuracy (Rating 1.0 - 5.0)
-    if 'rating' in df.columns:
-        condition = (df['rating'] >= 1.0) & (df['rating'] <= 5.0)
-        errors.extend(check_accuracy(df, 'Reviews', condition, "Rating must be between 1.0 and 5.0"))
+    # 2. Accuracy (nobody manages themselves, directly or through others)
+    for members in hierarchy.cycles:
+        errors.append(f"[Hierarchy] Accuracy Error: management cycle among employees {members}")
         
     return errors
 
-def validate_assignments(df, proj_df, emp_df):
-    errors = []
-    print("   Running Validation on Assignments...")
-    
-    # 1. Consistency (Project ID AND Employee ID)
-    errors.extend(check_consistency(df, 'project_id', proj_df, 'project_id', 'Assignments', 'Projects'))
-    errors.extend(check_consistency(df, 'employee_id', emp_df, 'employee_id', 'Assignments', 'Employees'))
-    
-    # 2. Accuracy (Allocation 0-100)
-    if 'allocation_percentage' in df.columns:
-        condition = (df['allocation_percentage'] >= 0) & (df['allocation_percentage'] <= 100)
-        errors.extend(check_accuracy(df, 'Assignments', condition, "Allocation must be 0-100%"))
-
-    return errors
+def evaluate_hierarchy(hierarchy):
+    """ validate_hierarchy with per-rule results like evaluate_rules (failed = employees with an orphan manager / in a cycle) """
+    start = time.perf_counter()
+    issues = validate_hierarchy(hierarchy)
+    seconds = time.perf_counter() - start
+    n = len(hierarchy.employee_ids)
+    in_cycles = sum(len(members) for members in hierarchy.cycles)
+    results = [
+        {'table': 'Hierarchy', 'rule': 'hierarchy.manager_exists', 'kind': 'foreign_key', 'column': 'manager_id',
+         'checked': n, 'passed': n - len(hierarchy.orphan_reports), 'failed': len(hierarchy.orphan_reports),
+         'seconds': seconds},
+        {'table': 'Hierarchy', 'rule': 'hierarchy.no_cycles', 'kind': 'hierarchy', 'column': 'manager_id',
+         'checked': n, 'passed': n - in_cycles, 'failed': in_cycles, 'seconds': 0.0},
+    ]
+    return issues, results
 
 def validate_projects(df):
-    errors = []
-    print("   Running Validation on Projects...")
-    
-    # 1. Completeness
-    errors.extend(check_completeness(df, 'Projects', 'project_id', ['project_name', 'start_date']))
-    
-    # 2. Accuracy (Budget > 0)
-    if 'budget' in df.columns:
-        # Ignore NaNs for this check, assuming cleaning handled them or they are optional
-        condition = (df['budget'].isnull()) | (df['budget'] > 0)
-        errors.extend(check_accuracy(df, 'Projects', condition, "Budget must be positive"))
-        
-    return errors
\ No newline at end of file
+    return _validate_table('Projects', df, {}, None)[0]